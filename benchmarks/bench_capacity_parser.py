@@ -0,0 +1,40 @@
+"""Benchmark: parse time of one lane-schedule week page (capacity.py).
+
+    python benchmarks/bench_capacity_parser.py [--repeat 20] [--page PATH]
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+for _var, _value in (
+    ("BOT_NAME", "BenchBot"),
+    ("BOT_VERSION", "1.0"),
+    ("BOT_URL", "https://example.com"),
+    ("BOT_EMAIL", "bench@example.com"),
+):
+    os.environ.setdefault(_var, _value)
+
+from capacity import parse_capacity_html  # noqa: E402
+
+PAGE = ROOT / "tests" / "fixtures" / "pages" / "kravi_hora_rozpis.html"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--page", type=Path, default=PAGE, help="saved rozpis?from=... page")
+    args = parser.parse_args()
+
+    html = args.page.read_text(encoding="utf-8")
+    rows = parse_capacity_html(html)
+    per_page = min(timeit.repeat(lambda: parse_capacity_html(html), number=args.repeat, repeat=3)) / args.repeat
+    print(f"{args.page.name}: {len(html.encode()) / 1024:.1f} kB, {len(rows)} rows, {per_page * 1e3:.2f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
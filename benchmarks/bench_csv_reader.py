@@ -0,0 +1,85 @@
+"""Benchmark: occupancy CSV reading, full parse and resume after one appended row.
+
+Compares the DictReader-based parse pool_aggregation used before with
+read_records(), the checkpointed read_new_records() and read_records()
+through a binary sidecar.
+
+    python benchmarks/bench_csv_reader.py [--csv data/bazeny_luzanky_occupancy.csv]
+"""
+from __future__ import annotations
+import argparse
+import csv
+import shutil
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from pool_aggregation.io.csv_reader import read_new_records, read_records  # noqa: E402
+from pool_aggregation.models.records import OccupancyRecord, RecordStore  # noqa: E402
+
+CSV = ROOT / "data" / "bazeny_luzanky_occupancy.csv"
+
+
+def legacy_read_records(path: Path) -> list[OccupancyRecord]:
+    records = []
+    with path.open(newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                norm = {k.lower(): v for k, v in row.items()}
+                time_str = norm["time"].strip()
+                records.append(OccupancyRecord(
+                    date_str=norm["date"].strip(),
+                    day=norm["day"].strip(),
+                    time_str=time_str,
+                    occupancy=int(norm["occupancy"]),
+                    hour=int(time_str.split(":")[0]),
+                ))
+            except (KeyError, ValueError, AttributeError):
+                pass
+    return records
+
+
+def _best(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--csv", type=Path, default=CSV)
+    args = parser.parse_args()
+
+    assert read_records(args.csv) == legacy_read_records(args.csv)
+    rows = len(read_records(args.csv))
+    print(f"{args.csv.name}: {rows} rows")
+    print(f"  DictReader full parse   {_best(lambda: legacy_read_records(args.csv), 5) * 1e3:9.2f} ms")
+    print(f"  read_records full parse {_best(lambda: read_records(args.csv), 5) * 1e3:9.2f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / args.csv.name
+        shutil.copy(args.csv, path)
+        _, checkpoint, _ = read_new_records(path)
+        print(f"  resume, nothing new     {_best(lambda: read_new_records(path, checkpoint), 2000) * 1e6:9.2f} us")
+        with path.open("ab") as f:
+            f.write(b"10.09.2025,Wednesday,14:35,34\r\n")
+        records, _, _ = read_new_records(path, checkpoint)
+        assert len(records) == 1
+        print(f"  resume, one row appended{_best(lambda: read_new_records(path, checkpoint), 2000) * 1e6:9.2f} us")
+
+        cache_dir = Path(tmp) / "cache"
+        assert read_records(path, cache_dir=cache_dir) == read_records(path)
+        print(f"  sidecar, unchanged CSV  {_best(lambda: read_records(path, cache_dir=cache_dir), 200) * 1e3:9.2f} ms")
+        print(f"  sidecar, one row appended{_best(lambda: _append_and_read(path, cache_dir), 50) * 1e3:8.2f} ms")
+
+
+def _append_and_read(path: Path, cache_dir: Path) -> RecordStore:
+    with path.open("ab") as f:
+        f.write(b"10.09.2025,Wednesday,14:45,36\r\n")
+    return read_records(path, cache_dir=cache_dir)
+
+
+if __name__ == "__main__":
+    main()
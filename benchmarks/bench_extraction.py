@@ -0,0 +1,72 @@
+"""Benchmark: page text extraction, BeautifulSoup vs. tag stripping.
+
+Runs the occupancy + todayClosed patterns of a pool against the recorded
+test pages (and a copy padded to the size of a real pool homepage) the
+way occupancy.py did before (one BeautifulSoup parse per pattern) and the
+way it does now (one DOM-free text pass for all patterns).
+
+    python benchmarks/bench_extraction.py [--repeat 200]
+"""
+from __future__ import annotations
+import argparse
+import os
+import re
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+for _var, _value in (
+    ("BOT_NAME", "BenchBot"),
+    ("BOT_VERSION", "1.0"),
+    ("BOT_URL", "https://example.com"),
+    ("BOT_EMAIL", "bench@example.com"),
+):
+    os.environ.setdefault(_var, _value)
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from occupancy import find_matches  # noqa: E402
+
+PAGES = ROOT / "tests" / "fixtures" / "pages"
+PATTERNS = [r"(\d+)\s*počet\s*návštěvníků", r"(Bazény zavřeny)"]
+# Real pool homepages are 60-150 kB of markup around the counter.
+_FILLER = (
+    '<div class="card"><a href="/aktuality/{i}" title="Aktualita {i}">'
+    "<img src=\"/img/{i}.jpg\" alt=\"\"><h3>Aktualita č. {i}</h3>"
+    "<p>Provoz bazénů&nbsp;&ndash; změna otevírací doby od {i}. 7.</p></a></div>\n"
+)
+
+
+def legacy_find(html: str) -> list:
+    matches = []
+    for pattern in PATTERNS:
+        text = BeautifulSoup(html, "html.parser").get_text()
+        matches.append(re.search(pattern, text, re.IGNORECASE))
+    return matches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    pages = {p.name: p.read_text(encoding="utf-8") for p in sorted(PAGES.glob("*.html"))}
+    base = pages["koupaliste_dobrak.html"]
+    pages["padded 100 kB page"] = base.replace(
+        "<body>", "<body>" + "".join(_FILLER.format(i=i) for i in range(400)), 1
+    )
+
+    print(f"{'page':<32} {'size':>8} {'bs4 x2':>10} {'text pass':>10} {'speedup':>8}")
+    for name, html in pages.items():
+        before = min(timeit.repeat(lambda: legacy_find(html), number=args.repeat, repeat=3)) / args.repeat
+        after = min(timeit.repeat(lambda: find_matches(html, PATTERNS), number=args.repeat, repeat=3)) / args.repeat
+        print(
+            f"{name:<32} {len(html.encode()) / 1024:6.1f}kB "
+            f"{before * 1e3:8.3f}ms {after * 1e3:8.3f}ms {before / after:7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
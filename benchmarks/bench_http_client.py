@@ -0,0 +1,127 @@
+"""Benchmark: pooled keep-alive client vs. one urlopen() per request.
+
+Starts a local HTTP/1.1 stand-in for a pool website (gzip-capable, ~60 kB
+HTML page) and fetches the page repeatedly, first the way http_utils did
+before (a new ``urllib.request.urlopen`` connection per call, no
+compression), then through ``http_utils.fetch_url``.
+
+    python benchmarks/bench_http_client.py [--requests 300]
+"""
+from __future__ import annotations
+import argparse
+import gzip
+import os
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+for _var, _value in (
+    ("BOT_NAME", "BenchBot"),
+    ("BOT_VERSION", "1.0"),
+    ("BOT_URL", "https://example.com"),
+    ("BOT_EMAIL", "bench@example.com"),
+):
+    os.environ.setdefault(_var, _value)
+
+import http_utils  # noqa: E402
+
+_ROW = (
+    '<tr><td class="col-{h:02d}-00 free">Dráha {lane}</td>'
+    '<td class="col-{h:02d}-30 reserved">Plavecký oddíl</td></tr>\n'
+)
+PAGE = (
+    "<html><head><title>Krytá plavecká hala</title></head><body>"
+    "<div class='occupancy'>Aktuální obsazenost: 42 / 135</div><table>"
+    + "".join(_ROW.format(h=h, lane=lane) for h in range(6, 22) for lane in range(1, 7)) * 3
+    + "</table></body></html>"
+).encode("utf-8")
+PAGE_GZ = gzip.compress(PAGE)
+
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.body_bytes = 0
+
+    def reset(self):
+        with self.lock:
+            self.connections = 0
+            self.body_bytes = 0
+
+
+STATS = _Stats()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Send headers and body in one segment, like a real web server would.
+    wbufsize = 1 << 16
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with STATS.lock:
+            STATS.connections += 1
+
+    def do_GET(self):
+        if self.path == "/robots.txt":
+            body, encoding = b"User-agent: *\nAllow: /\n", None
+        elif "gzip" in self.headers.get("Accept-Encoding", ""):
+            body, encoding = PAGE_GZ, "gzip"
+        else:
+            body, encoding = PAGE, None
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        self.wfile.write(body)
+        with STATS.lock:
+            STATS.body_bytes += len(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def legacy_fetch(url: str) -> str:
+    req = urllib.request.Request(url, headers={"User-Agent": http_utils.BOT_USER_AGENT})
+    return urllib.request.urlopen(req, timeout=5).read().decode("utf-8")
+
+
+def run(label: str, fetch, url: str, requests: int) -> None:
+    fetch(url)  # warm up robots.txt caches
+    STATS.reset()
+    start = time.perf_counter()
+    for _ in range(requests):
+        assert fetch(url) == PAGE.decode("utf-8")
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<22} {requests / elapsed:8.0f} req/s  "
+        f"{STATS.body_bytes / requests / 1024:7.1f} kB/req  "
+        f"{STATS.connections:4d} new connections"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/kryta-plavecka-hala"
+    try:
+        run("urlopen per request", legacy_fetch, url, args.requests)
+        run("pooled fetch_url", http_utils.fetch_url, url, args.requests)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
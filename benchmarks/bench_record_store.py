@@ -0,0 +1,73 @@
+"""Benchmark: memory of the parsed occupancy records and full aggregation time.
+
+Reads every occupancy CSV of the config, reports the memory the parsed
+records take (per 100k records, measured with tracemalloc) and the time
+of a full, non-incremental aggregation without writing the JSON files.
+
+    python benchmarks/bench_record_store.py [--repeat 3]
+"""
+from __future__ import annotations
+import argparse
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from pool_aggregation.aggregation.bucketing import available_week_ids  # noqa: E402
+from pool_aggregation.aggregation.current import build_current_occupancy  # noqa: E402
+from pool_aggregation.aggregation.overall import build_overall_map  # noqa: E402
+from pool_aggregation.aggregation.pool_block import build_data_range  # noqa: E402
+from pool_aggregation.aggregation.weekly import build_weekly_map  # noqa: E402
+from pool_aggregation.config import load_pool_config  # noqa: E402
+from pool_aggregation.io.csv_reader import read_records  # noqa: E402
+from pool_aggregation.models.pool import iter_pools  # noqa: E402
+
+DATA = ROOT / "data"
+NOW = datetime(2025, 9, 10, 14, 30, tzinfo=ZoneInfo("Europe/Prague"))
+
+
+def _csv_paths() -> list[tuple[dict, Path]]:
+    cfg = load_pool_config(DATA / "pool_occupancy_config.json")
+    return [(pool_cfg, DATA / pool_cfg["data"]["occupancy"]["raw"]) for _, pool_cfg in iter_pools(cfg)]
+
+
+def aggregate(pool_cfg: dict, path: Path) -> None:
+    records = read_records(path)
+    build_data_range(records)
+    weekly_map = build_weekly_map(records, pool_cfg)
+    available_week_ids(records, weekly_map.keys())
+    overall_map = build_overall_map(weekly_map)
+    build_current_occupancy(records, pool_cfg, overall_map, NOW)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    pools = _csv_paths()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    loaded = [read_records(path) for _, path in pools]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    count = sum(len(records) for records in loaded)
+    print(f"{count} records: {used / 2**20:.1f} MiB, {used / count * 100_000 / 2**20:.1f} MiB per 100k records")
+    del loaded
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        for pool_cfg, path in pools:
+            aggregate(pool_cfg, path)
+        best = min(best, time.perf_counter() - start)
+    print(f"full aggregation of {len(pools)} pools (no JSON output): {best:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Benchmark: per-slot statistics, pure Python vs. the optional NumPy engine.
+
+Checks that both produce identical SlotStats for every occupancy CSV in
+data/ and prints the best-of-N time of each.  Needs NumPy installed.
+
+    python benchmarks/bench_slot_stats.py [--repeat 20]
+"""
+from __future__ import annotations
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from pool_aggregation.aggregation import vectorized  # noqa: E402
+from pool_aggregation.aggregation.bucketing import slot_stats  # noqa: E402
+from pool_aggregation.io.csv_reader import read_records  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    if not vectorized.available():
+        sys.exit("NumPy is not installed")
+
+    total_py = total_np = 0.0
+    for path in sorted((ROOT / "data").glob("*_occupancy.csv")):
+        store = read_records(path)
+        assert list(slot_stats(store).items()) == list(vectorized.slot_stats(store).items()), path
+        t_py = min(timeit.repeat(lambda: slot_stats(store), number=1, repeat=args.repeat))
+        t_np = min(timeit.repeat(lambda: vectorized.slot_stats(store), number=1, repeat=args.repeat))
+        total_py += t_py
+        total_np += t_np
+        print(f"{path.name:40} {len(store):6} rows  python {t_py * 1e3:6.2f} ms  numpy {t_np * 1e3:6.2f} ms")
+    print(f"{'total':40} {'':11} python {total_py * 1e3:6.2f} ms  numpy {total_np * 1e3:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
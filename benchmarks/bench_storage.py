@@ -0,0 +1,99 @@
+"""Benchmark: CSV vs SQLite storage of one pool's occupancy history.
+
+Builds the pool's history at 1x and 50x its size (the real rows repeated,
+each copy shifted back by a whole number of 52-week years so weekdays
+still match) and times, for both backends: a full read, a read of the
+last 7 days, appending one sample, and reading the rows appended since
+a checkpoint.
+
+    python benchmarks/bench_storage.py [--csv data/bazeny_luzanky_occupancy.csv] [--scales 1 50]
+"""
+from __future__ import annotations
+import argparse
+import csv
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from pool_aggregation.io.csv_reader import read_records  # noqa: E402
+from pool_aggregation.io.storage import open_storage  # noqa: E402
+
+CSV = ROOT / "data" / "bazeny_luzanky_occupancy.csv"
+POOL = "pool.csv"
+
+
+def _best(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number
+
+
+def write_history(source: Path, path: Path, scale: int) -> datetime:
+    """Write *scale* copies of *source* to *path*, oldest first; return the last date."""
+    records = read_records(source)
+    last = None
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Day", "Time", "Occupancy"])
+        for copy in range(scale - 1, -1, -1):
+            shift = timedelta(days=364 * copy)
+            for r in records:
+                date = datetime.strptime(r.date_str, "%d.%m.%Y") - shift
+                writer.writerow([date.strftime("%d.%m.%Y"), r.day, r.time_str, r.occupancy])
+                last = max(last, date) if last is not None else date
+    return last
+
+
+def bench(source: Path, scale: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        last_date = write_history(source, data_dir / POOL, scale)
+        week_start = (last_date - timedelta(days=6)).strftime("%Y-%m-%d")
+        csv_storage, db = open_storage(data_dir, "csv"), open_storage(data_dir, "sqlite")
+        db.import_csv_files(data_dir, [POOL], [])
+        rows = len(db.read_occupancy(POOL))
+        assert csv_storage.read_occupancy(POOL) == db.read_occupancy(POOL)
+        assert csv_storage.read_occupancy(POOL, week_start) == db.read_occupancy(POOL, week_start)
+        db_size = sum(path.stat().st_size for path in data_dir.glob("pool_data.sqlite3*"))
+        print(f"{scale}x: {rows} rows, CSV {(data_dir / POOL).stat().st_size >> 10} KiB, SQLite {db_size >> 10} KiB")
+
+        number = max(1, 20 // scale)
+        results = [
+            ("full read", lambda: read_records(data_dir / POOL), lambda: db.read_occupancy(POOL), number),
+            # the CSV backend reads through its sidecar, so only unchanged rows are skipped
+            ("full read, cached", lambda: csv_storage.read_occupancy(POOL), None, number),
+            ("last 7 days", lambda: csv_storage.read_occupancy(POOL, week_start),
+             lambda: db.read_occupancy(POOL, week_start), number),
+        ]
+        for label, on_csv, on_db, n in results:
+            csv_ms = _best(on_csv, n) * 1e3
+            db_ms = f"{_best(on_db, n) * 1e3:9.2f} ms" if on_db is not None else "        -"
+            print(f"  {label:<22} CSV {csv_ms:9.2f} ms   SQLite {db_ms}")
+
+        row = [last_date.strftime("%d.%m.%Y"), last_date.strftime("%A"), "21:59", 1]
+        _, csv_checkpoint, _ = csv_storage.read_new_occupancy(POOL, None)
+        _, row_checkpoint, _ = db.read_new_occupancy(POOL, None)
+        csv_append = _best(lambda: csv_storage.append_occupancy(POOL, row), 200) * 1e6
+        db_append = _best(lambda: db.append_occupancy(POOL, row), 200) * 1e6
+        print(f"  {'append one sample':<22} CSV {csv_append:9.2f} us   SQLite {db_append:9.2f} us")
+        appended = len(db.read_new_occupancy(POOL, row_checkpoint)[0])
+        csv_new = _best(lambda: csv_storage.read_new_occupancy(POOL, csv_checkpoint), 20) * 1e3
+        db_new = _best(lambda: db.read_new_occupancy(POOL, row_checkpoint), 20) * 1e3
+        print(f"  {f'read {appended} new rows':<22} CSV {csv_new:9.2f} ms   SQLite {db_new:9.2f} ms")
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--csv", type=Path, default=CSV)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 50])
+    args = parser.parse_args()
+    for scale in args.scales:
+        bench(args.csv, scale)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark: writing the weekly payload as one dict vs. streamed week by week.
+
+For each pool, builds the weeklyOccupancyMap as a whole and dumps it, then
+streams it through StreamedMap, checks the files are byte-identical and
+prints the best time and tracemalloc peak of both.  The last column is the
+peak of a whole cli.process_pool() run, which streams the weekly map while
+it collects the overall rates.
+
+    python benchmarks/bench_weekly_writer.py
+"""
+from __future__ import annotations
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from pool_aggregation.cli import process_pool  # noqa: E402
+from pool_aggregation.aggregation.weekly import (  # noqa: E402
+    build_weekly_map_from_stats,
+    iter_weekly_map,
+    record_slot_stats,
+    weekly_slots,
+)
+from pool_aggregation.config import load_pool_config  # noqa: E402
+from pool_aggregation.io.csv_reader import read_records  # noqa: E402
+from pool_aggregation.io.json_writer import StreamedMap, write_json  # noqa: E402
+from pool_aggregation.models.pool import iter_pools  # noqa: E402
+from pool_aggregation.utils.timezones import now_prague, to_iso8601  # noqa: E402
+
+
+def _measure(fn) -> tuple[float, int]:
+    """Best-of-3 time without tracing, then the allocation peak of one traced run."""
+    elapsed = min(timeit.repeat(fn, number=1, repeat=3))
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    data = ROOT / "data"
+    with tempfile.TemporaryDirectory() as tmp:
+        whole, streamed = Path(tmp) / "whole.json", Path(tmp) / "streamed.json"
+        for pool_name, pool_cfg in iter_pools(load_pool_config(data / "pool_occupancy_config.json")):
+            stats = record_slot_stats(read_records(data / pool_cfg["data"]["occupancy"]["raw"]))
+            t_whole, m_whole = _measure(
+                lambda: write_json(whole, {"weeklyOccupancyMap": build_weekly_map_from_stats(stats, pool_cfg)})
+            )
+            t_stream, m_stream = _measure(
+                lambda: write_json(
+                    streamed, {"weeklyOccupancyMap": StreamedMap(iter_weekly_map(weekly_slots(stats, pool_cfg), pool_cfg))}
+                )
+            )
+            assert whole.read_bytes() == streamed.read_bytes(), pool_name
+            now = now_prague()
+            with redirect_stdout(StringIO()):
+                _, m_process = _measure(lambda: process_pool(pool_name, pool_cfg, data, Path(tmp), to_iso8601(now), now))
+            print(
+                f"{pool_name:28} {whole.stat().st_size / 2**20:5.2f} MiB"
+                f"  whole {t_whole * 1e3:6.1f} ms {m_whole / 2**20:6.2f} MiB peak"
+                f"  streamed {t_stream * 1e3:6.1f} ms {m_stream / 2**20:6.2f} MiB peak"
+                f"  process_pool {m_process / 2**20:6.2f} MiB peak"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,180 +1,215 @@
-import csv
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-import os
 import re
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
-from http_utils import fetch_url
+from http_utils import fetch_url, fetch_urls
+from pool_aggregation.io.storage import open_storage
+
+# Dictionary to translate Czech day names to English
+DAY_TRANSLATIONS = {
+    'Pondělí': 'Monday',
+    'Úterý': 'Tuesday',
+    'Středa': 'Wednesday',
+    'Čtvrtek': 'Thursday',
+    'Pátek': 'Friday',
+    'Sobota': 'Saturday',
+    'Neděle': 'Sunday'
+}
+
+HOURS = range(6, 22)
+WEEKEND_SKIPPED_HOURS = (6, 7, 21)
+TOTAL_CAPACITY = 135
+LANE_COUNT = 6
+MAX_PARSE_WORKERS = 4
+# A page parses in well under 100 ms; fewer pages are not worth starting processes for
+MIN_PARALLEL_PAGES = 8
+
+def schedule_url(date_str):
+    """URL of the lane schedule week page starting at date_str (YYYY-MM-DD)."""
+    return f"https://www.kravihora-brno.cz/kryta-plavecka-hala/rozpis?from={date_str}"
 
 def get_capacity_data(date_str):
     """Fetch capacity data for a given date."""
     try:
-        url = f"https://www.kravihora-brno.cz/kryta-plavecka-hala/rozpis?from={date_str}"
+        url = schedule_url(date_str)
         html = fetch_url(url)
         if html is None:
             return []
+        return parse_capacity_html(html)
+    except Exception as e:
+        print(f"Error fetching data for {date_str}: {e}")
+        return []
+
+def parse_capacity_html(html):
+    """Parse a week page of the lane schedule into capacity rows.
+
+    Returns [date, day, 'HH:00:00', max_occupancy] rows sorted by date
+    and hour.
+    """
+    # Only the <table> elements (one per day) are needed
+    soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer('table'))
+    
+    results = []
+    
+    for table in soup.find_all('table'):
+        # Extract date from caption
+        caption = table.find('caption')
+        if not caption:
+            continue
         
-        # Use BeautifulSoup to parse the HTML
-        soup = BeautifulSoup(html, 'html.parser')
+        caption_text = caption.get_text().strip()
+        date_match = re.search(r'(\d{1,2})\.\s*(\d{1,2})\.\s*(\d{4})', caption_text)
         
-        # Find all tables - each table represents a day
-        tables = soup.find_all('table')
+        if not date_match:
+            continue
         
-        results = []
+        day, month, year = date_match.groups()
+        # Format day and month with leading zeros
+        formatted_date = f"{int(day):02d}.{int(month):02d}.{year}"
         
-        # Dictionary to translate Czech day names to English
-        day_translations = {
-            'Pondělí': 'Monday',
-            'Úterý': 'Tuesday',
-            'Středa': 'Wednesday',
-            'Čtvrtek': 'Thursday',
-            'Pátek': 'Friday',
-            'Sobota': 'Saturday',
-            'Neděle': 'Sunday'
-        }
+        # Extract day of week
+        day_match = re.search(r'–\s*(\w+)', caption_text)
+        czech_day = day_match.group(1) if day_match else ""
         
-        for table_idx, table in enumerate(tables):
-            # Extract date from caption
-            caption = table.find('caption')
-            if not caption:
-                continue
-            
-            caption_text = caption.get_text().strip()
-            date_match = re.search(r'(\d{1,2})\.\s*(\d{1,2})\.\s*(\d{4})', caption_text)
-            
-            if not date_match:
-                continue
-            
-            day, month, year = date_match.groups()
-            # Format day and month with leading zeros
-            formatted_date = f"{int(day):02d}.{int(month):02d}.{year}"
-            
-            # Extract day of week
-            day_match = re.search(r'–\s*(\w+)', caption_text)
-            czech_day = day_match.group(1) if day_match else ""
-            
-            # Translate day name to English
-            day_of_week = day_translations.get(czech_day, czech_day)
-            
-            # Get all rows for lanes 1-6 (skip header and other equipment rows)
-            rows = table.find_all('tr')
-            if len(rows) < 7:  # Make sure we have at least 7 rows (header + 6 lanes)
-                continue
-                
-            header_row = rows[0]  # Header row with times
-            lane_rows = rows[1:7]  # Only lanes 1-6
-            
-            # Process each hour from 6:00 to 21:00
-            for hour in range(6, 22):
-                hour_str = f"{hour:02d}"
-                
-                # Skip certain hours on weekends
-                if day_of_week in ['Saturday', 'Sunday'] and hour in [6, 7, 21]:
-                    continue
-                
-                time = f"{hour_str}:00:00"
-                
-                # Find cells for this hour across all lanes
-                available_lanes = 0
-                
-                for lane_row in lane_rows:
-                    # Get all cells in this row (skip the lane label cell)
-                    cells = lane_row.find_all('td')[1:]
-                    
-                    # Find cells for this hour
-                    hour_cell = None
-                    next_cell = None
-                    
-                    for i, cell in enumerate(cells):
-                        class_names = cell.get('class', [])
-                        hour_class = next((c for c in class_names if c.startswith(f'col-{hour_str}-')), None)
-                        
-                        if hour_class:
-                            hour_cell = cell
-                            # If we're not at the last cell, get the next cell for half-hour check
-                            if i + 1 < len(cells):
-                                next_cell = cells[i + 1]
-                            break
-                    
-                    if hour_cell:
-                        # Check if the lane is available for this hour
-                        is_available = False
-                        
-                        # Case 1: Full hour reservation (colspan="2")
-                        if 'colspan' in hour_cell.attrs and hour_cell['colspan'] == '2':
-                            cell_classes = hour_cell.get('class', [])
-                            is_available = 'reserved' not in cell_classes and 'closed' not in cell_classes
-                        # Case 2: Two half-hour slots
-                        elif next_cell:
-                            # Both half-hour slots must be unreserved
-                            hour_cell_classes = hour_cell.get('class', [])
-                            next_cell_classes = next_cell.get('class', [])
-                            is_available = (
-                                'reserved' not in hour_cell_classes and 
-                                'closed' not in hour_cell_classes and
-                                'reserved' not in next_cell_classes and
-                                'closed' not in next_cell_classes
-                            )
-                        
-                        if is_available:
-                            available_lanes += 1
-                
-                # Calculate maximum occupancy (135 people total capacity divided by 6 lanes)
-                max_occupancy = (available_lanes * 135) // 6
-                
-                results.append([formatted_date, day_of_week, time, max_occupancy])
+        # Translate day name to English
+        day_of_week = DAY_TRANSLATIONS.get(czech_day, czech_day)
         
-        # Sort results by date and time
-        def sort_key(x):
-            # Parse date from DD.MM.YYYY format
-            day, month, year = map(int, x[0].split('.'))
-            # Parse time from HH:MM:SS format
-            hour = int(x[2].split(':')[0])
-            return datetime(year, month, day, hour)
-            
-        results.sort(key=sort_key)
+        # Get all rows for lanes 1-6 (skip header and other equipment rows)
+        rows = table.find_all('tr')
+        if len(rows) < 7:  # Make sure we have at least 7 rows (header + 6 lanes)
+            continue
+        
+        lane_rows = rows[1:7]  # Only lanes 1-6
         
-        return results
+        # Count available lanes per hour, reading every lane row once
+        available_lanes = dict.fromkeys(HOURS, 0)
+        for lane_row in lane_rows:
+            for hour in available_lane_hours(lane_row):
+                available_lanes[hour] += 1
         
+        # Process each hour from 6:00 to 21:00
+        for hour in HOURS:
+            # Skip certain hours on weekends
+            if day_of_week in ['Saturday', 'Sunday'] and hour in WEEKEND_SKIPPED_HOURS:
+                continue
+            
+            # Calculate maximum occupancy (135 people total capacity divided by 6 lanes)
+            max_occupancy = (available_lanes[hour] * TOTAL_CAPACITY) // LANE_COUNT
+            
+            results.append([formatted_date, day_of_week, f"{hour:02d}:00:00", max_occupancy])
+    
+    # Sort results by date and time
+    results.sort(key=row_sort_key)
+    
+    return results
+
+def row_sort_key(row):
+    """Sort key of a capacity row by date and time."""
+    # Parse date from DD.MM.YYYY format
+    day, month, year = map(int, row[0].split('.'))
+    # Parse time from HH:MM:SS format
+    hour = int(row[2].split(':')[0])
+    return datetime(year, month, day, hour)
+
+def get_forecast_data(start_date, weeks):
+    """Fetch capacity data for `weeks` consecutive weeks from start_date.
+
+    The week pages are fetched concurrently (at most a few requests to the
+    site at once). They are parsed in-process unless there are at least
+    MIN_PARALLEL_PAGES of them, which go to a process pool; never from a
+    daemonic process such as the scheduler's worker, which cannot start
+    children. Returns the merged rows sorted by date and time.
+    """
+    date_strs = [(start_date + timedelta(weeks=i)).strftime('%Y-%m-%d') for i in range(weeks)]
+    urls = [schedule_url(date_str) for date_str in date_strs]
+    pages = fetch_urls(urls)
+
+    htmls = []
+    for date_str, url in zip(date_strs, urls):
+        if pages[url] is None:
+            print(f"No data available for week from {date_str}")
+        else:
+            htmls.append(pages[url])
+
+    if len(htmls) >= MIN_PARALLEL_PAGES and not multiprocessing.current_process().daemon:
+        with ProcessPoolExecutor(max_workers=min(len(htmls), MAX_PARSE_WORKERS)) as pool:
+            parsed = list(pool.map(parse_capacity_page, htmls))
+    else:
+        parsed = [parse_capacity_page(html) for html in htmls]
+
+    # Weeks do not overlap, but keep the first row should a page repeat a day
+    merged = {}
+    for rows in parsed:
+        for row in rows:
+            merged.setdefault((row[0], row[2]), row)
+    return sorted(merged.values(), key=row_sort_key)
+
+def parse_capacity_page(html):
+    """parse_capacity_html() that reports errors instead of raising."""
+    try:
+        return parse_capacity_html(html)
     except Exception as e:
-        print(f"Error fetching data for {date_str}: {e}")
+        print(f"Error parsing capacity page: {e}")
         return []
 
-def write_csv_headers(file):
-    """Write headers to a CSV file."""
-    writer = csv.writer(file)
-    writer.writerow(['Date', 'Day', 'Hour', 'Maximum Occupancy'])
+def index_hour_cells(cells):
+    """Map 'HH' to the position of the first cell with a col-HH-* class."""
+    index = {}
+    for i, cell in enumerate(cells):
+        for class_name in cell.get('class', []):
+            if class_name.startswith('col-') and class_name[6:7] == '-':
+                index.setdefault(class_name[4:6], i)
+    return index
 
-def write_csv_data(file, data):
-    """Write data rows to a CSV file."""
-    writer = csv.writer(file)
-    for row in data:
-        writer.writerow(row)
+def available_lane_hours(lane_row):
+    """Yield the hours from HOURS in which a lane row is free."""
+    # Get all cells in this row (skip the lane label cell)
+    cells = lane_row.find_all('td')[1:]
+    index = index_hour_cells(cells)
+    
+    for hour in HOURS:
+        i = index.get(f"{hour:02d}")
+        if i is None:
+            continue
+        hour_cell = cells[i]
+        hour_cell_classes = hour_cell.get('class', [])
+        
+        # Case 1: Full hour reservation (colspan="2")
+        if hour_cell.get('colspan') == '2':
+            is_available = 'reserved' not in hour_cell_classes and 'closed' not in hour_cell_classes
+        # Case 2: Two half-hour slots, both must be unreserved
+        elif i + 1 < len(cells):
+            next_cell_classes = cells[i + 1].get('class', [])
+            is_available = (
+                'reserved' not in hour_cell_classes and 
+                'closed' not in hour_cell_classes and
+                'reserved' not in next_cell_classes and
+                'closed' not in next_cell_classes
+            )
+        else:
+            is_available = False
+        
+        if is_available:
+            yield hour
 
 def save_csv_data(data, filename, *, append=False):
-    """Save capacity data to a CSV file.
+    """Save capacity data to a CSV file, or to the database with POOL_STORAGE=sqlite.
     
     Args:
         data: List of rows to save
         filename: Name of the file (without path)
         append: If True, append to existing file; if False, overwrite
     """
-    """Ensure the data directory exists."""
-    os.makedirs('data', exist_ok=True)
-    csv_path = f'data/{filename}'
-    mode = 'a' if append else 'w'
-    
     try:
-        # Handle append mode with new file
-        if append and not os.path.exists(csv_path):
-            with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-                write_csv_headers(f)
-        
-        # Write or append data
-        with open(csv_path, mode, newline='', encoding='utf-8') as f:
-            if not append:  # Write headers for new files
-                write_csv_headers(f)
-            write_csv_data(f, data)
+        storage = open_storage('data')
+        if append:
+            storage.append_capacity(filename, data)
+        else:
+            # Replaced atomically, so readers never see a partial file
+            storage.replace_capacity(filename, data)
         return True
     except Exception as e:
         print(f"Error saving data to {filename}: {e}")
@@ -188,18 +223,30 @@ def save_week_capacity_to_csv(data):
     """Save weekly capacity data to CSV file."""
     return save_csv_data(data, 'week_capacity.csv', append=False)
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Record Kraví Hora lane capacity.")
+    parser.add_argument(
+        '--weeks', type=int, default=1,
+        help="number of weeks of schedule to store in week_capacity.csv (default: 1)",
+    )
+    args = parser.parse_args(argv)
+    if args.weeks < 1:
+        parser.error("--weeks must be at least 1")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
     start_date = datetime.now()
     today_str = start_date.strftime('%d.%m.%Y')
     date_str = start_date.strftime('%Y-%m-%d')
 
-    print(f"Fetching data for {date_str}")
-    data = get_capacity_data(date_str)
+    print(f"Fetching data for {date_str} ({args.weeks} week(s))")
+    data = get_forecast_data(start_date, args.weeks)
     
     if data:
-        # Save full week data
+        # Save full forecast data
         save_week_capacity_to_csv(data)
-        print(f"Saved weekly data starting from {date_str}")
+        print(f"Saved forecast data for {args.weeks} week(s) starting from {date_str}")
         
         # Filter and save today's data
         today_data = [row for row in data if row[0] == today_str]
@@ -1,9 +1,20 @@
+import gzip
+import hashlib
+import http.client
+import json
 import os
-import urllib.request
+import random
+import ssl
+import threading
+import time
 import urllib.robotparser
 import logging
+import zlib
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from urllib.parse import urlparse
+from urllib.parse import urljoin, urlparse
 
 from dotenv import load_dotenv
 
@@ -47,53 +58,626 @@ def build_user_agent():
 BOT_USER_AGENT = build_user_agent()
 
 _FETCH_TIMEOUT = 5  # seconds
+_MAX_WORKERS = 8
+_MAX_REQUESTS_PER_HOST = 2
+_MAX_REDIRECTS = 5
 
-_robots_cache: dict[str, urllib.robotparser.RobotFileParser] = {}
+# On-disk caches shared by all runs; data/ is the volume kept between
+# container restarts.
+CACHE_DIR = Path(__file__).parent / "data" / ".cache"
+
+# robots.txt is reused from the disk cache for ROBOTS_TTL seconds; after
+# that a stale copy is still served for up to ROBOTS_STALE_TTL seconds
+# while it is revalidated in the background.
+_ROBOTS_TTL = int(os.getenv("ROBOTS_TTL", 24 * 3600))
+_ROBOTS_STALE_TTL = int(os.getenv("ROBOTS_STALE_TTL", 7 * 24 * 3600))
+
+# Cached pages not requested for _HTTP_CACHE_TTL seconds are deleted, at
+# most once per _HTTP_PRUNE_INTERVAL; URLs with a date in them (the
+# capacity schedule) are never requested again once the day has passed.
+_HTTP_CACHE_TTL = 7 * 24 * 3600
+_HTTP_PRUNE_INTERVAL = 24 * 3600
+
+# Transient failures are retried with jittered exponential backoff, but a
+# host gets at most _RETRIES_PER_TICK retries per _TICK seconds, so one
+# that is down costs a single timeout per request once they are spent.  A
+# host failing _BREAKER_THRESHOLD requests in a row is skipped for a
+# cooldown that doubles on every trip, up to _BREAKER_MAX_COOLDOWN; then a
+# single trial request decides whether it is closed again.
+_RETRIES = 2
+_RETRIES_PER_TICK = 2
+_TICK = 5 * 60  # seconds; shorter than the scheduler's 10 minutes
+_BACKOFF_BASE = 0.5  # seconds
+_BACKOFF_MAX = 4  # seconds
+_BREAKER_THRESHOLD = 3
+_BREAKER_COOLDOWN = 15 * 60  # seconds
+_BREAKER_MAX_COOLDOWN = 4 * 3600  # seconds
+_RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+_LATENCY_SMOOTHING = 0.2
+
+# Errors raised when a kept-alive connection was closed by the server
+# while idle; the request is replayed once on a fresh connection.
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+class HTTPStatusError(Exception):
+    """Raised for responses that are neither successful nor redirects."""
+
+    def __init__(self, url: str, status: int, reason: str):
+        super().__init__(f"HTTP Error {status}: {reason}")
+        self.url = url
+        self.status = status
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of contacting a host whose circuit breaker is open."""
+
+
+@dataclass(frozen=True)
+class Response:
+    url: str
+    status: int
+    reason: str
+    headers: http.client.HTTPMessage
+    body: bytes         # decoded from Content-Encoding
+    wire_bytes: int     # body size as transferred
+
+
+class ConnectionPool:
+    """Thread-safe keep-alive HTTP(S) client.
+
+    Idle connections are kept per ``(scheme, host)`` so repeated requests
+    to one site (robots.txt, then the page; or several pages of one
+    domain) reuse the TCP/TLS session.  Responses are requested with
+    ``Accept-Encoding: gzip`` and decompressed transparently.
+    """
+
+    def __init__(self, timeout: float = _FETCH_TIMEOUT, max_idle_per_host: int = _MAX_REQUESTS_PER_HOST):
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self._idle: dict[tuple[str, str], list[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._ssl_context = ssl.create_default_context()
+
+    def get(self, url: str, headers: dict[str, str] | None = None) -> Response:
+        """GET *url*, following redirects; raise HTTPStatusError on 4xx/5xx."""
+        for _ in range(_MAX_REDIRECTS + 1):
+            response = self._request(url, headers or {})
+            location = response.headers.get("Location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                continue
+            if response.status >= 400:
+                raise HTTPStatusError(url, response.status, response.reason)
+            return response
+        raise HTTPStatusError(url, response.status, "Too many redirects")
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def _request(self, url: str, headers: dict[str, str]) -> Response:
+        parsed = urlparse(url)
+        key = (parsed.scheme, parsed.netloc)
+        target = parsed.path or "/"
+        if parsed.query:
+            target += f"?{parsed.query}"
+        request_headers = {
+            "User-Agent": BOT_USER_AGENT,
+            "Accept-Encoding": "gzip, deflate",
+            **headers,
+        }
+
+        conn, reused = self._acquire(key)
+        try:
+            try:
+                conn.request("GET", target, headers=request_headers)
+                resp = conn.getresponse()
+            except _STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                conn.close()
+                conn, reused = self._connect(key), False
+                conn.request("GET", target, headers=request_headers)
+                resp = conn.getresponse()
+            raw = resp.read()
+        except BaseException:
+            conn.close()
+            raise
+
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(key, conn)
+        return Response(
+            url=url,
+            status=resp.status,
+            reason=resp.reason,
+            headers=resp.headers,
+            body=_decode_body(raw, resp.headers.get("Content-Encoding", "")),
+            wire_bytes=len(raw),
+        )
+
+    def _acquire(self, key: tuple[str, str]) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        return self._connect(key), False
+
+    def _release(self, key: tuple[str, str], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _connect(self, key: tuple[str, str]) -> http.client.HTTPConnection:
+        scheme, netloc = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout, context=self._ssl_context)
+        if scheme == "http":
+            return http.client.HTTPConnection(netloc, timeout=self.timeout)
+        raise ValueError(f"Unsupported URL scheme: {scheme}")
+
+
+def _decode_body(raw: bytes, content_encoding: str) -> bytes:
+    encoding = content_encoding.strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        return gzip.decompress(raw)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(raw)
+        except zlib.error:
+            # Some servers send a raw deflate stream without the zlib header.
+            return zlib.decompress(raw, -zlib.MAX_WBITS)
+    return raw
+
+
+_http = ConnectionPool()
+
+
+def _read_json(path: Path) -> dict | None:
+    try:
+        with path.open(encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json_atomic(path: Path, data: dict) -> None:
+    """Write *data* to a temp file and rename it over *path*.
+
+    Readers in other processes see either the old or the new file, never
+    a partial one.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError as e:
+        logging.warning("Could not write cache file %s: %s", path, e)
+        tmp.unlink(missing_ok=True)
+
+
+def _cache_path(kind: str, key: str) -> Path:
+    return CACHE_DIR / kind / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json"
+
+
+_http_pruned_at: float | None = None    # time.monotonic() of the last _prune_http_cache()
+_http_prune_lock = threading.Lock()
+
+
+def _prune_http_cache() -> None:
+    """Delete cached pages whose file was not touched for _HTTP_CACHE_TTL seconds.
+
+    Does nothing if it already ran in this process within _HTTP_PRUNE_INTERVAL.
+    """
+    global _http_pruned_at
+    with _http_prune_lock:
+        now = time.monotonic()
+        if _http_pruned_at is not None and now - _http_pruned_at < _HTTP_PRUNE_INTERVAL:
+            return
+        _http_pruned_at = now
+    cutoff = time.time() - _HTTP_CACHE_TTL
+    try:
+        entries = list(os.scandir(CACHE_DIR / "http"))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+        except OSError:
+            pass    # removed by another process, or not ours to remove
+
+@dataclass
+class HostHealth:
+    """Circuit breaker state and request statistics of one host.
+
+    Persisted in data/.cache/hosts/ so that a host that was down in the
+    previous runs is skipped without waiting for its timeout.  The file is
+    rewritten when the breaker state changes, and otherwise at most once
+    per tick to update the statistics.
+    """
+    host: str
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    trips: int = 0
+    open_until: float = 0.0
+    latency_ms: float | None = None  # moving average of answered requests
+    last_error: str | None = None
+    # Bookkeeping of this process, not persisted
+    probing: bool = field(default=False, repr=False, compare=False)
+    retries_used: int = field(default=0, repr=False, compare=False)
+    tick_start: float = field(default=float("-inf"), repr=False, compare=False)
+    saved_state: tuple | None = field(default=None, repr=False, compare=False)
+    saved_at: float = field(default=float("-inf"), repr=False, compare=False)
+
+    @property
+    def is_open(self) -> bool:
+        return time.time() < self.open_until
+
+    @property
+    def is_half_open(self) -> bool:
+        """Cooldown is over; the next request is a single trial."""
+        return not self.is_open and self.consecutive_failures >= _BREAKER_THRESHOLD
+
+    @property
+    def breaker_state(self) -> tuple[int, int, float]:
+        return self.consecutive_failures, self.trips, self.open_until
+
+    def take_retry(self) -> bool:
+        """Spend one of this tick's retries; False once they are used up."""
+        now = time.monotonic()
+        if now - self.tick_start >= _TICK:
+            self.tick_start, self.retries_used = now, 0
+        if self.retries_used >= _RETRIES_PER_TICK:
+            return False
+        self.retries_used += 1
+        return True
+
+    def record_success(self, latency_ms: float) -> None:
+        self.requests += 1
+        self.consecutive_failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self.latency_ms = latency_ms if self.latency_ms is None else (
+            _LATENCY_SMOOTHING * latency_ms + (1 - _LATENCY_SMOOTHING) * self.latency_ms
+        )
+
+    def record_failure(self, error: Exception) -> None:
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        if self.consecutive_failures >= _BREAKER_THRESHOLD:
+            self.trips += 1
+            cooldown = min(_BREAKER_COOLDOWN * 2 ** (self.trips - 1), _BREAKER_MAX_COOLDOWN)
+            self.open_until = time.time() + cooldown
+            logging.warning(
+                "Circuit open for %s for %d s after %d failures: %s",
+                self.host, cooldown, self.consecutive_failures, self.last_error,
+            )
+
+    def to_json(self) -> dict:
+        return {
+            "host": self.host,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutiveFailures": self.consecutive_failures,
+            "trips": self.trips,
+            "openUntil": self.open_until,
+            "latencyMs": self.latency_ms,
+            "lastError": self.last_error,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "HostHealth":
+        return cls(
+            host=data["host"],
+            requests=data.get("requests", 0),
+            failures=data.get("failures", 0),
+            consecutive_failures=data.get("consecutiveFailures", 0),
+            trips=data.get("trips", 0),
+            open_until=data.get("openUntil", 0.0),
+            latency_ms=data.get("latencyMs"),
+            last_error=data.get("lastError"),
+        )
+
+
+_host_health: dict[str, HostHealth] = {}
+_host_health_lock = threading.Lock()
+
+
+def get_host_health(host: str) -> HostHealth:
+    """Return the (possibly persisted) health record of *host* (netloc)."""
+    with _host_health_lock:
+        health = _host_health.get(host)
+        if health is None:
+            saved = _read_json(_cache_path("hosts", host))
+            health = HostHealth.from_json(saved) if saved and saved.get("host") == host else HostHealth(host)
+            _host_health[host] = health
+        return health
+
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, HTTPStatusError):
+        return error.status in _RETRYABLE_STATUSES
+    return isinstance(error, (OSError, http.client.HTTPException))
+
+
+def _get(url: str, headers: dict[str, str] | None = None) -> Response:
+    """GET through the shared pool with retries and the host's circuit breaker.
+
+    Raises CircuitOpenError without any network traffic while the host is
+    in its cooldown, and while another thread makes the trial request
+    after it.  Only transient errors (timeouts, connection errors,
+    429/5xx) are retried, within the host's retries for this tick, and
+    count against the host.
+    """
+    host = urlparse(url).netloc
+    health = get_host_health(host)
+    with _host_health_lock:
+        if health.is_open:
+            raise CircuitOpenError(f"{host} is failing, skipped until {time.ctime(health.open_until)}")
+        trial = health.is_half_open
+        if trial:
+            if health.probing:
+                raise CircuitOpenError(f"{host} is failing, a trial request is already running")
+            health.probing = True
+
+    try:
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                response = _http.get(url, headers)
+            except Exception as e:
+                if not trial and attempt < _RETRIES and _is_transient(e) and _take_retry(health):
+                    time.sleep(random.uniform(0, min(_BACKOFF_MAX, _BACKOFF_BASE * 2 ** attempt)))
+                    attempt += 1
+                    continue
+                _record(health, (time.monotonic() - start) * 1000, e)
+                raise
+            _record(health, (time.monotonic() - start) * 1000)
+            return response
+    finally:
+        if trial:
+            health.probing = False
+
+
+def _take_retry(health: HostHealth) -> bool:
+    with _host_health_lock:
+        return health.take_retry()
+
+
+def _record(health: HostHealth, latency_ms: float, error: Exception | None = None) -> None:
+    # A non-transient error (404, ...) still means the host answered.
+    with _host_health_lock:
+        if error is not None and _is_transient(error):
+            health.record_failure(error)
+        else:
+            health.record_success(latency_ms)
+        now = time.monotonic()
+        if health.breaker_state == health.saved_state and now - health.saved_at < _TICK:
+            return
+        health.saved_state, health.saved_at = health.breaker_state, now
+        state = health.to_json()
+    _write_json_atomic(_cache_path("hosts", health.host), state)
+
+
+@dataclass
+class _Robots:
+    parser: urllib.robotparser.RobotFileParser
+    fetched_at: float
+    refreshing: bool = False
+
+    @classmethod
+    def from_lines(cls, domain: str, lines: list[str], fetched_at: float) -> "_Robots":
+        parser = urllib.robotparser.RobotFileParser(f"{domain}/robots.txt")
+        parser.parse(lines)
+        return cls(parser, fetched_at)
+
+
+_robots_cache: dict[str, _Robots] = {}
+_robots_locks: dict[str, threading.Lock] = {}
+_robots_locks_guard = threading.Lock()
 
 
 def can_fetch(url: str) -> bool:
     """Check whether *url* is allowed by the site's robots.txt.
 
-    Parsed robots.txt files are cached per domain so we don't re-fetch
-    on every request.
+    Parsed robots.txt files are cached per domain in memory and on disk
+    (data/.cache/robots/), so the scheduled runs, which each start a new
+    process, don't re-fetch them on every tick.
     """
     parsed = urlparse(url)
     domain = f"{parsed.scheme}://{parsed.netloc}"
 
-    if domain not in _robots_cache:
-        rp = urllib.robotparser.RobotFileParser()
-        rp.set_url(f"{domain}/robots.txt")
-        try:
-            req = urllib.request.Request(
-                f"{domain}/robots.txt",
-                headers={"User-Agent": BOT_USER_AGENT},
-            )
-            resp = urllib.request.urlopen(req, timeout=_FETCH_TIMEOUT)
-            rp.parse(resp.read().decode("utf-8").splitlines())
-        except Exception as e:
-            logging.warning(
-                "Could not fetch robots.txt for %s, assuming allowed: %s", domain, e
-            )
-            return True
-        _robots_cache[domain] = rp
+    # Concurrent fetches of one domain share a single robots.txt download.
+    with _robots_locks_guard:
+        lock = _robots_locks.setdefault(domain, threading.Lock())
+    with lock:
+        robots = _robots_cache.get(domain)
+        if robots is None:
+            robots = _load_robots(domain)
+            if robots is not None:
+                _robots_cache[domain] = robots
+        age = time.time() - robots.fetched_at if robots else None
 
-    return _robots_cache[domain].can_fetch(BOT_USER_AGENT, url)
+        if robots is None or age >= _ROBOTS_TTL + _ROBOTS_STALE_TTL:
+            fresh = _download_robots(domain)
+            if fresh is not None:
+                robots = fresh
+            elif robots is None:
+                logging.warning("No robots.txt for %s, assuming allowed", domain)
+                return True
+            else:
+                logging.warning("Using expired robots.txt for %s", domain)
+        elif age >= _ROBOTS_TTL and not robots.refreshing:
+            # The refresh replaces the cache entry itself; the stale copy
+            # is only used for this call.
+            robots.refreshing = True
+            threading.Thread(
+                target=_refresh_robots, args=(domain, robots), name=f"robots-{parsed.netloc}"
+            ).start()
 
+    return robots.parser.can_fetch(BOT_USER_AGENT, url)
 
-def fetch_url(url: str) -> str | None:
-    """Fetch a URL as an honest bot, respecting robots.txt.
 
-    Returns the decoded HTML content, or *None* if the URL is blocked
-    by robots.txt or the request fails.
+def _refresh_robots(domain: str, stale: _Robots) -> None:
+    """Revalidate *stale* in the background.
+
+    If the download fails the next call past the TTL tries again.
+    """
+    try:
+        _download_robots(domain)
+    finally:
+        stale.refreshing = False
+
+
+def _load_robots(domain: str) -> _Robots | None:
+    entry = _read_json(_cache_path("robots", domain))
+    if not entry or entry.get("domain") != domain:
+        return None
+    return _Robots.from_lines(domain, entry["lines"], entry["fetchedAt"])
+
+
+def _download_robots(domain: str) -> _Robots | None:
+    """Fetch robots.txt for *domain* and store it in both caches.
+
+    A missing robots.txt (404/410) is cached as "everything allowed".
+    Returns *None* if it could not be fetched.
+    """
+    try:
+        lines = _get(f"{domain}/robots.txt").body.decode("utf-8").splitlines()
+    except Exception as e:
+        if not (isinstance(e, HTTPStatusError) and e.status in (404, 410)):
+            logging.warning("Could not fetch robots.txt for %s: %s", domain, e)
+            return None
+        lines = []
+
+    fetched_at = time.time()
+    _write_json_atomic(_cache_path("robots", domain), {
+        "domain": domain,
+        "fetchedAt": fetched_at,
+        "lines": lines,
+    })
+    robots = _Robots.from_lines(domain, lines, fetched_at)
+    _robots_cache[domain] = robots
+    return robots
+
+
+@dataclass(frozen=True)
+class Page:
+    text: str
+    changed: bool   # False when the server answered 304 Not Modified
+
+
+def fetch_page(url: str) -> Page | None:
+    """Fetch a URL as an honest bot with a conditional GET.
+
+    Responses carrying an ETag or Last-Modified header are cached on disk;
+    the next request for the URL sends If-None-Match / If-Modified-Since
+    and a 304 answer is served from the cache with ``changed=False``.
+    Entries not used for _HTTP_CACHE_TTL seconds are pruned.
+
+    Returns *None* if the URL is blocked by robots.txt or the request fails.
     """
     if not can_fetch(url):
         logging.warning("Blocked by robots.txt: %s", url)
         return None
 
+    _prune_http_cache()
+    cache_path = _cache_path("http", url)
+    cached = _read_json(cache_path)
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("lastModified"):
+            headers["If-Modified-Since"] = cached["lastModified"]
+
     try:
-        req = urllib.request.Request(url, headers={"User-Agent": BOT_USER_AGENT})
-        response = urllib.request.urlopen(req, timeout=_FETCH_TIMEOUT)
-        return response.read().decode("utf-8")
+        response = _get(url, headers)
+        if response.status == 304 and cached:
+            try:
+                os.utime(cache_path)     # still in use; keep it from being pruned
+            except OSError:
+                pass
+            return Page(cached["body"], changed=False)
+        text = response.body.decode("utf-8")
     except Exception as e:
         logging.error("Error fetching %s: %s", url, e)
-        return None
\ No newline at end of file
+        return None
+
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        _write_json_atomic(cache_path, {
+            "url": url,
+            "etag": etag,
+            "lastModified": last_modified,
+            "body": text,
+        })
+    elif cached:
+        cache_path.unlink(missing_ok=True)
+    return Page(text, changed=True)
+
+
+def fetch_url(url: str) -> str | None:
+    """Fetch a URL as an honest bot, respecting robots.txt.
+
+    Returns the decoded HTML content, or *None* if the URL is blocked
+    by robots.txt or the request fails.
+    """
+    page = fetch_page(url)
+    return page.text if page else None
+
+
+def fetch_urls(
+    urls: Iterable[str],
+    fetch: Callable[[str], object] | None = None,
+    *,
+    max_workers: int = _MAX_WORKERS,
+    max_per_host: int = _MAX_REQUESTS_PER_HOST,
+) -> dict[str, object]:
+    """Fetch several URLs concurrently; return ``{url: fetch(url)}``.
+
+    All URLs are requested in parallel, but no more than *max_per_host*
+    requests run against one host at a time so that sites serving several
+    pools (Kraví Hora) are not hit with a burst.  Duplicate URLs are only
+    fetched once.  *fetch* defaults to :func:`fetch_url`.
+    """
+    fetch = fetch or fetch_url
+    unique = list(dict.fromkeys(urls))
+    if not unique:
+        return {}
+
+    host_slots = {
+        urlparse(url).netloc: threading.BoundedSemaphore(max_per_host)
+        for url in unique
+    }
+
+    def fetch_politely(url: str):
+        with host_slots[urlparse(url).netloc]:
+            return fetch(url)
+
+    workers = max(1, min(max_workers, len(unique)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch") as pool:
+        results = pool.map(fetch_politely, unique)
+        return dict(zip(unique, results))
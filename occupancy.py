@@ -1,40 +1,62 @@
-from http_utils import fetch_url
+from http_utils import fetch_page, fetch_urls
+from pool_aggregation import config
+from pool_aggregation.io.storage import open_storage
 import re
-import csv
-import json
+from functools import lru_cache
+from html import unescape
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from bs4 import BeautifulSoup
-import os
 
 def load_pool_config():
-    """Load pool configuration from JSON file."""
+    """Load pool configuration from JSON file (read-only, cached until it changes)."""
     try:
-        with open('data/pool_occupancy_config.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return config.load_pool_config('data/pool_occupancy_config.json')
     except Exception as e:
         print(f"Error loading pool configuration: {e}")
         return []
 
-def save_pool_config(pool_configs):
-    """Save pool configuration back to JSON file."""
+def load_pool_state():
+    """Load runtime pool state (observed capacity, todayClosed, last fetch)."""
     try:
-        with open('data/pool_occupancy_config.json', 'w', encoding='utf-8') as f:
-            json.dump(pool_configs, f, ensure_ascii=False, indent=2)
-            f.write('\n') 
-        print("Pool configuration saved successfully.")
+        return config.load_pool_state('data/pool_state.json')
+    except Exception as e:
+        print(f"Error loading pool state: {e}")
+        return {}
+
+def save_pool_state(state, previous):
+    """Save runtime pool state, only if it differs from what was loaded."""
+    try:
+        if config.save_pool_state(state, previous, 'data/pool_state.json'):
+            print("Pool state saved successfully.")
         return True
     except Exception as e:
-        print(f"Error saving pool configuration: {e}")
+        print(f"Error saving pool state: {e}")
         return False
 
+# (url, pattern, todayClosedPattern) -> (occupancy, is_today_closed) of the
+# last parsed page, reused while the server reports it as not modified.
+_parsed_pages = {}
+
 def fetch_html(url):
-    """Fetch HTML content from a given URL, respecting robots.txt."""
-    result = fetch_url(url)
+    """Fetch a page (text + changed flag) from a given URL, respecting robots.txt."""
+    result = fetch_page(url)
     if result is None:
         print(f"Blocked by robots.txt or fetch failed: {url}")
     return result
 
+def should_collect(pool_config):
+    """Return True if the pool is tracked and currently open."""
+    return pool_config.get('collectStats', False) and is_pool_open(pool_config)
+
+def prefetch_pages(pool_configs):
+    """Fetch the pages of all pools due for a sample concurrently.
+
+    Returns {url: page or None}; all samples of one tick are taken within
+    the time of the slowest fetch instead of the sum of all of them.
+    """
+    urls = [pool_config['url'] for pool_config in pool_configs if should_collect(pool_config)]
+    return fetch_urls(urls, fetch_html)
+
 def is_pool_open(pool_type_config):
     def get_opening_hours(hours):
         opening_hour = int(hours.split("-")[0].strip())
@@ -67,13 +89,59 @@ def is_pool_temporarily_closed(pool_type_config):
         return start_date <= today <= end_date
     return False
 
+# Markup removed by html_to_text(). Text inside script/style/template,
+# comments, doctypes and processing instructions is dropped, CDATA content
+# is kept - the same text BeautifulSoup(html, 'html.parser').get_text()
+# returns, without building a tree.
+_MARKUP_RE = re.compile(
+    r"<(script|style|template)\b[^>]*>.*?</\1\s*>"
+    r"|<!--.*?-->"
+    r"|<!\[CDATA\[(.*?)\]\]>"
+    r"|<[!?][^>]*>"
+    r"|</?[a-z][^>\"']*(?:(?:\"[^\"]*\"|'[^']*')[^>\"']*)*>",
+    re.IGNORECASE | re.DOTALL,
+)
+
+_ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+def html_to_text(html_content):
+    """Return the visible text of an HTML page without building a DOM."""
+    parts = []
+    pos = 0
+    for markup in _MARKUP_RE.finditer(html_content):
+        _append_text(parts, unescape(html_content[pos:markup.start()]))
+        _append_text(parts, markup.group(2))
+        pos = markup.end()
+    _append_text(parts, unescape(html_content[pos:]))
+    return "".join(parts)
+
+def _append_text(parts, text):
+    # Like BeautifulSoup, collapse whitespace-only strings to one character.
+    if not text:
+        return
+    if text.strip(_ASCII_SPACES):
+        parts.append(text)
+    else:
+        parts.append("\n" if "\n" in text else " ")
+
+@lru_cache(maxsize=None)
+def compile_pattern(pattern):
+    """Compile a configured pattern once per process."""
+    return re.compile(pattern, re.IGNORECASE)
+
+def find_matches(html_content, patterns):
+    """Find matches of all patterns in content, converting it to text once.
+
+    Returns one match (or None) per pattern; empty patterns never match.
+    """
+    if not html_content:
+        return [None for _ in patterns]
+    text_content = html_to_text(html_content)
+    return [compile_pattern(p).search(text_content) if p else None for p in patterns]
+
 def find_match(html_content, pattern):
     """Find match of pattern in content."""
-    if html_content:
-        text_content = BeautifulSoup(html_content, 'html.parser').get_text()
-        match = re.search(pattern, text_content, re.IGNORECASE)
-        return match
-    return None
+    return find_matches(html_content, [pattern])[0]
 
 def find_occupancy(html_content, pattern):
     """Find occupancy data in content."""
@@ -91,8 +159,25 @@ def find_today_closed_status(html_content, today_closed_pattern):
         return True
     return False
 
+def parse_page(url, page, pattern, today_closed_pattern):
+    """Return (occupancy, is_today_closed) for a fetched page.
+
+    Parsing is skipped when the server answered 304 Not Modified and the
+    page was already parsed with the same patterns.
+    """
+    key = (url, pattern, today_closed_pattern)
+    if not page.changed and key in _parsed_pages:
+        return _parsed_pages[key]
+    occupancy_match, closed_match = find_matches(page.text, [pattern, today_closed_pattern])
+    parsed = (
+        int(occupancy_match.group(1)) if occupancy_match else None,
+        closed_match is not None,
+    )
+    _parsed_pages[key] = parsed
+    return parsed
+
 def save_to_csv(occupancy, file_name, pool_name):
-    """Save occupancy data to CSV file."""
+    """Save occupancy data to the pool's CSV file, or to the database with POOL_STORAGE=sqlite."""
     # Get current Prague time
     now = datetime.now(ZoneInfo("Europe/Prague"))
     
@@ -101,20 +186,9 @@ def save_to_csv(occupancy, file_name, pool_name):
     day_of_week = now.strftime('%A')
     time_str = now.strftime('%H:%M')
     
-    # Ensure we're using the correct path in GitHub Actions
-    csv_path = f'data/{file_name}'
-    os.makedirs('data', exist_ok=True)
-    
-    # Check if file exists and create with headers if needed
-    if not os.path.exists(csv_path):
-        with open(csv_path, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Date', 'Day', 'Time', 'Occupancy'])
-    
     try:
-        with open(csv_path, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([date_str, day_of_week, time_str, occupancy])
+        # Relative to the working directory, as in GitHub Actions
+        open_storage('data').append_occupancy(file_name, [date_str, day_of_week, time_str, occupancy])
         print(f"Recorded occupancy for '{pool_name}': {date_str} {day_of_week} {time_str} - {occupancy}")
         return True
     except Exception as e:
@@ -133,11 +207,16 @@ def update_maximum_capacity(pool_cfg, occupancy, pool_name):
 
 def update_today_closed(pool_cfg, is_today_closed, pool_name):
     """Update todayClosed in config for a given pool."""
-    pool_cfg['todayClosed'] = is_today_closed
-    print(f"Updated todayClosed for '{pool_name}': {pool_cfg['todayClosed']}")
+    if pool_cfg.get('todayClosed') != is_today_closed:
+        pool_cfg['todayClosed'] = is_today_closed
+        print(f"Updated todayClosed for '{pool_name}': {pool_cfg['todayClosed']}")
 
-def process_pool(pool_config, pool_name):
-    """Process a pool from the flattened config."""
+def process_pool(pool_config, pool_name, pages=None):
+    """Process a pool from the flattened config.
+
+    *pages* holds pages prefetched by prefetch_pages(); the page is fetched
+    on demand when it is missing there.
+    """
     # Check if we should collect stats for this pool
     if not pool_config.get('collectStats', False):
         print(f"Skipping {pool_name} - collectStats is false")
@@ -151,24 +230,30 @@ def process_pool(pool_config, pool_name):
     pattern = pool_config['pattern']
     csv_file = pool_config.get("data", {}).get("occupancy", {}).get("raw", "")
     
-    html_content = fetch_html(url)
-    if html_content is None:
+    if pages is not None and url in pages:
+        page = pages[url]
+    else:
+        page = fetch_html(url)
+    if page is None:
+        pool_config['lastFetch'] = 'failed'
         print(f"Failed to get occupancy data for {pool_name}")
         return False
 
-    occupancy = find_occupancy(html_content, pattern)
     today_closed_pattern = pool_config.get('todayClosedPattern', False)
-    is_today_closed = find_today_closed_status(html_content, today_closed_pattern)
+    occupancy, is_today_closed = parse_page(url, page, pattern, today_closed_pattern)
     update_today_closed(pool_config, is_today_closed, pool_name)
     
     if is_today_closed:
+        pool_config['lastFetch'] = 'ok'
         print(f"{pool_name} is closed today, skipping occupancy check")
         return True
     
     if occupancy is not None:
+        pool_config['lastFetch'] = 'ok'
         update_maximum_capacity(pool_config, occupancy, pool_name)
         return save_to_csv(occupancy, csv_file, pool_name)
     else:
+        pool_config['lastFetch'] = 'no match'
         print(f"Failed to get occupancy data for {pool_name}")
         return False
 
@@ -181,14 +266,25 @@ def main():
         return False
     
     overall_success = True
+    pages = prefetch_pages(pool_configs)
+    previous_state = load_pool_state()
+    state = {}
     
     for pool_config in pool_configs:
         pool_name = pool_config['name']
-        success = process_pool(pool_config, pool_name)
+        # Work on a copy with the runtime state applied; the config stays read-only
+        pool_state = previous_state.get(pool_name, {})
+        pool_config = config.apply_pool_state(dict(pool_config), pool_state)
+        success = process_pool(pool_config, pool_name, pages)
         overall_success &= success
+        state[pool_name] = {
+            'maximumCapacity': pool_config['maximumCapacity'],
+            'todayClosed': pool_config.get('todayClosed', False),
+            'lastFetch': pool_config.get('lastFetch', pool_state.get('lastFetch')),
+        }
     
-    # Save new pool config if maximum capacity of some pool changed
-    save_pool_config(pool_configs)
+    # Written only when capacity, todayClosed or a fetch status changed
+    save_pool_state(state, previous_state)
     return overall_success
 
 
@@ -1,4 +1,4 @@
 import sys
 from pool_aggregation import cli
 
-sys.exit(cli.main())
+sys.exit(cli.entrypoint())
@@ -1,30 +1,22 @@
 from __future__ import annotations
 from collections import defaultdict
 from collections.abc import Iterable
-from datetime import date, datetime, timedelta
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 
-from pool_aggregation.models.records import OccupancyRecord
+from pool_aggregation.models.records import OccupancyRecord, RecordStore
+from pool_aggregation.utils.dates import date_info
 from pool_aggregation.utils.timezones import PRAGUE
 
-_DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-
 
 def day_name_from_date_str(date_str: str) -> str:
     """Return the English weekday name for a date_str in d.M.yyyy format."""
-    return _DAY_NAMES[_parse_date(date_str).weekday()]
-
-
-def _parse_date(date_str: str) -> date:
-    """Parse d.M.yyyy into a date object."""
-    day, month, year = date_str.split(".")
-    return date(int(year), int(month), int(day))
+    return date_info(date_str).weekday
 
 
 def week_id(date_str: str) -> str:
     """Return the ISO Monday of the week containing date_str as yyyy-MM-dd."""
-    d = _parse_date(date_str)
-    monday = d - timedelta(days=d.weekday())
-    return monday.isoformat()
+    return date_info(date_str).week_id
 
 
 def bucket_records(
@@ -37,6 +29,52 @@ def bucket_records(
     return dict(buckets)
 
 
+@dataclass
+class SlotStats:
+    """Running occupancy statistics of one (weekId, day, hour) slot."""
+    date_str: str   # date of the first record, used for capacity resolution
+    count: int = 0
+    total: int = 0
+    min: int = 0
+    max: int = 0
+
+    def add(self, occupancy: int) -> None:
+        if self.count == 0 or occupancy < self.min:
+            self.min = occupancy
+        if self.count == 0 or occupancy > self.max:
+            self.max = occupancy
+        self.count += 1
+        self.total += occupancy
+
+
+def add_slot_stats(
+    stats: dict[tuple[str, str, int], SlotStats],
+    records: Iterable[OccupancyRecord],
+) -> None:
+    """Fold *records* into *stats*; new slots are appended in first-seen order."""
+    if isinstance(records, RecordStore):
+        rows = records.rows()
+    else:
+        rows = ((r.date_str, r.day, r.hour, r.occupancy) for r in records)
+    week_ids: dict[str, str] = {}
+    for date_str, day, hour, occupancy in rows:
+        wid = week_ids.get(date_str)
+        if wid is None:
+            wid = week_ids[date_str] = week_id(date_str)
+        key = (wid, day, hour)
+        slot = stats.get(key)
+        if slot is None:
+            slot = stats[key] = SlotStats(date_str)
+        slot.add(occupancy)
+
+
+def slot_stats(records: Iterable[OccupancyRecord]) -> dict[tuple[str, str, int], SlotStats]:
+    """Return {(weekId, day, hour): SlotStats} in first-seen order."""
+    stats: dict[tuple[str, str, int], SlotStats] = {}
+    add_slot_stats(stats, records)
+    return stats
+
+
 def available_week_ids(
     records: list[OccupancyRecord],
     extra_week_ids: Iterable[str] = (),
@@ -45,7 +83,8 @@ def available_week_ids(
 
     If both sources are empty, returns only the current Prague week.
     """
-    from_records = {week_id(r.date_str) for r in records}
+    dates = records.dates if isinstance(records, RecordStore) else {r.date_str for r in records}
+    from_records = {week_id(d) for d in dates}
     merged = from_records | set(extra_week_ids)
     if not merged:
         today = datetime.now(tz=PRAGUE).date()
@@ -1,29 +1,107 @@
 from __future__ import annotations
+import re
+from collections.abc import Iterable
 from pathlib import Path
 
-from pool_aggregation.io.capacity_reader import load_hourly_capacity
+from pool_aggregation.io.storage import open_storage
+from pool_aggregation.utils.dates import date_info
 
 _DATA_DIR = Path(__file__).parent.parent.parent / "data"
 
+_HOUR_KEY = re.compile(r"(\d\d):00")
 
-def resolve_max_capacity(pool_cfg: dict, date_str: str, hour: int) -> int:
-    """Return the resolved maximumCapacity for (date_str, hour).
+# (storage, raw source, forecast source, fallback) -> (raw lookup, forecast lookup, table built from them)
+_tables: dict[tuple, tuple[dict | None, dict | None, "CapacityTable"]] = {}
 
-    Looks up the data.capacity.raw first, then the data.capacity.forecast;
-    finally falls back to the pool's static maximumCapacity.
+
+def capacity_files(pool_cfg: dict) -> list[Path]:
+    """Capacity CSVs resolve_max_capacity() reads for *pool_cfg*."""
+    files = pool_cfg.get("data", {}).get("capacity", {})
+    return [_DATA_DIR / files[key] for key in ("raw", "forecast") if files.get(key)]
+
+
+class CapacityTable:
+    """Resolved maximumCapacity of every (date, hour), precomputed for one pool.
+
+    Maps date ordinal * 24 + hour to the capacity of that hour in the raw
+    or forecast capacity CSV, raw values winning; hours in neither get the
+    static fallback.
     """
+    __slots__ = ("fallback", "_values", "forecast_slots")
+
+    def __init__(self, raw: dict | None, forecast: dict | None, fallback: int) -> None:
+        self.fallback = fallback
+        values: dict[int, int] = {}
+        for lookup in (forecast, raw):     # raw second, so it overrides the forecast
+            for (date_str, hour_key), capacity in (lookup or {}).items():
+                index = _slot_index(date_str, hour_key)
+                if index is not None:
+                    values[index] = capacity
+        self._values = values
+        # (date_str, hour) of every forecast row, in (date_str, hour) order; see weekly.py
+        self.forecast_slots: list[tuple[str, int]] = sorted(_date_hours(forecast or {}))
+
+    def get(self, date_str: str, hour: int) -> int:
+        """Resolved capacity at *hour* on *date_str* (d.M.yyyy)."""
+        return self.get_many([(date_str, hour)])[0]
+
+    def get_many(self, slots: Iterable[tuple[str, int]]) -> list[int]:
+        """get() for many (date_str, hour) pairs at once."""
+        values, fallback = self._values, self.fallback
+        if not values:
+            return [fallback for _ in slots]
+        result = []
+        for date_str, hour in slots:
+            try:
+                index = date_info(date_str).ordinal * 24 + hour if 0 <= hour < 24 else None
+            except ValueError:
+                index = None
+            result.append(values.get(index, fallback))
+        return result
+
+
+def _slot_index(date_str: str, hour_key: str) -> int | None:
+    """date ordinal * 24 + hour of a capacity row; None if it can never match a lookup."""
+    match = _HOUR_KEY.fullmatch(hour_key)
+    if match is None or int(match[1]) > 23:
+        return None
+    try:
+        return date_info(date_str).ordinal * 24 + int(match[1])
+    except ValueError:
+        return None
+
+
+def _date_hours(lookup: dict[tuple[str, str], int]) -> set[tuple[str, int]]:
+    pairs: set[tuple[str, int]] = set()
+    for date_str, hour_key in lookup:
+        try:
+            hour = int(hour_key.split(":")[0])
+        except (ValueError, AttributeError):
+            continue
+        pairs.add((date_str, hour))
+    return pairs
+
+
+def capacity_table(pool_cfg: dict) -> CapacityTable:
+    """The CapacityTable of *pool_cfg*, rebuilt when one of its capacity sources changed."""
+    files = pool_cfg.get("data", {}).get("capacity", {})
+    storage = open_storage(_DATA_DIR)
+    sources = tuple(files.get(key) or None for key in ("raw", "forecast"))
+    raw, forecast = (storage.load_capacity(source) if source is not None else None for source in sources)
     fallback: int = pool_cfg.get("maximumCapacity", 0)
+    key = (storage, *sources, fallback)
+    cached = _tables.get(key)
+    if cached is not None and cached[0] is raw and cached[1] is forecast:
+        return cached[2]
+    table = CapacityTable(raw, forecast, fallback)
+    _tables[key] = (raw, forecast, table)
+    return table
 
-    def lookup_in(file_key: str) -> int | None:
-        filename = pool_cfg.get("data", {}).get("capacity", {}).get(file_key)
-        if not filename:
-            return None
-        lookup = load_hourly_capacity(_DATA_DIR / filename)
-        return lookup.get((date_str, f"{hour:02d}:00"))
 
-    for file_key in ("raw", "forecast"):
-        val = lookup_in(file_key)
-        if val is not None:
-            return val
+def resolve_max_capacity(pool_cfg: dict, date_str: str, hour: int) -> int:
+    """Return the resolved maximumCapacity for (date_str, hour).
 
-    return fallback
+    Looks up the data.capacity.raw first, then the data.capacity.forecast;
+    finally falls back to the pool's static maximumCapacity.
+    """
+    return capacity_table(pool_cfg).get(date_str, hour)
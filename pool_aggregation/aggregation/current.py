@@ -3,7 +3,7 @@ from datetime import datetime
 
 from pool_aggregation.aggregation.capacity import resolve_max_capacity
 from pool_aggregation.aggregation.weekly import compute_open_lanes
-from pool_aggregation.models.records import OccupancyRecord
+from pool_aggregation.models.records import OccupancyRecord, RecordStore
 from pool_aggregation.utils.rounding import py_round
 from pool_aggregation.utils.timezones import PRAGUE, hour_start, to_iso8601
 
@@ -17,7 +17,10 @@ def build_current_occupancy(
     """Return currentOccupancy block or None if no records for today."""
     d = now.astimezone(PRAGUE)
     today_str = f"{d.day:02d}.{d.month:02d}.{d.year}"
-    today_records = [r for r in records if r.date_str == today_str]
+    if isinstance(records, RecordStore):
+        today_records = records.on_date(today_str)
+    else:
+        today_records = [r for r in records if r.date_str == today_str]
     if not today_records:
         return None
 
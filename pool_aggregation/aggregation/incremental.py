@@ -0,0 +1,167 @@
+"""Incremental aggregation: running per-slot state plus a CSV checkpoint.
+
+Instead of re-reading a whole occupancy CSV on every run, its aggregation
+state -- SlotStats per (weekId, day, hour), the first and last record and
+the latest record of every day -- is persisted together with the CSV's
+read checkpoint.  A run folds in only the rows appended since, and the
+payloads built from the state are byte-identical to a full rebuild.
+
+If the CSV was replaced, truncated or rewritten (see read_new_records),
+the state is rebuilt from scratch.  With a storage object the rows are
+read through it instead, and the checkpoint is that storage's.
+"""
+from __future__ import annotations
+import json
+import os
+import tempfile
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from pool_aggregation.aggregation.bucketing import SlotStats, add_slot_stats
+from pool_aggregation.aggregation.overall import OverallRates
+from pool_aggregation.io.csv_reader import CsvCheckpoint
+from pool_aggregation.io.storage import CsvStorage, RowCheckpoint
+from pool_aggregation.models.records import OccupancyRecord
+
+_VERSION = 4
+
+# resolved CSV path -> state, kept warm between runs of a long-lived process
+_memory: dict[Path, "PoolAggregate"] = {}
+
+
+def _record_key(r: OccupancyRecord) -> tuple:
+    """Chronological key, the same one build_data_range orders by."""
+    return (r.date_str.split(".")[::-1], r.time_str)
+
+
+@dataclass
+class PoolAggregate:
+    """Running aggregation state of one occupancy CSV."""
+    slots: dict[tuple[str, str, int], SlotStats] = field(default_factory=dict)
+    first: OccupancyRecord | None = None
+    last: OccupancyRecord | None = None
+    latest_by_date: dict[str, OccupancyRecord] = field(default_factory=dict)
+    checkpoint: CsvCheckpoint | RowCheckpoint | None = None     # how many of the rows are folded in
+    # slot -> (signature, hour bucket) of the last build; see build_weekly_map_from_stats
+    rendered: dict = field(default_factory=dict, repr=False, compare=False)
+    # overall rates of the last build, updated by the weeks that changed since
+    overall: OverallRates | None = field(default=None, repr=False, compare=False)
+
+    def add(self, records: list[OccupancyRecord]) -> None:
+        """Fold *records* in, keeping the tie-breaking of min()/max() over all rows."""
+        add_slot_stats(self.slots, records)
+        for r in records:
+            key = _record_key(r)
+            if self.first is None or key < _record_key(self.first):
+                self.first = r
+            if self.last is None or key > _record_key(self.last):
+                self.last = r
+            latest = self.latest_by_date.get(r.date_str)
+            if latest is None or r.time_str > latest.time_str:
+                self.latest_by_date[r.date_str] = r
+
+    def edge_records(self) -> list[OccupancyRecord]:
+        """First and last record; build_data_range() needs nothing else."""
+        return [r for r in (self.first, self.last) if r is not None]
+
+    def to_json(self) -> dict:
+        return {
+            "version": _VERSION,
+            "checkpoint": asdict(self.checkpoint) if self.checkpoint is not None else None,
+            "slots": [[*key, s.date_str, s.count, s.total, s.min, s.max] for key, s in self.slots.items()],
+            "first": _record_to_json(self.first),
+            "last": _record_to_json(self.last),
+            "latestByDate": [_record_to_json(r) for r in self.latest_by_date.values()],
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "PoolAggregate":
+        if data.get("version") != _VERSION:
+            raise ValueError(f"unsupported state version {data.get('version')}")
+        slots = {}
+        for wid, day, hour, date_str, count, total, lo, hi in data["slots"]:
+            slots[(wid, day, hour)] = SlotStats(date_str, count, total, lo, hi)
+        latest = [_record_from_json(r) for r in data["latestByDate"]]
+        checkpoint = data["checkpoint"]
+        if checkpoint is not None and "last_id" in checkpoint:
+            checkpoint = RowCheckpoint(**checkpoint)
+        elif checkpoint is not None:
+            checkpoint = CsvCheckpoint(
+                **{**checkpoint, "header": tuple(checkpoint["header"]), "blocks": tuple(checkpoint["blocks"])}
+            )
+        return cls(
+            slots=slots,
+            first=_record_from_json(data["first"]),
+            last=_record_from_json(data["last"]),
+            latest_by_date={r.date_str: r for r in latest},
+            checkpoint=checkpoint,
+        )
+
+
+def _record_to_json(r: OccupancyRecord | None) -> list | None:
+    return None if r is None else [r.date_str, r.day, r.time_str, r.occupancy, r.hour]
+
+
+def _record_from_json(data: list | None) -> OccupancyRecord | None:
+    return None if data is None else OccupancyRecord(*data)
+
+
+def update_aggregate(agg: PoolAggregate, csv_path: Path, storage=None) -> tuple[PoolAggregate, bool]:
+    """Fold rows appended to *csv_path* into *agg*; return (state, changed).
+
+    With *storage*, the rows of the pool named csv_path.name are read from
+    it instead.  A fresh state replaces *agg* when the rows had to be read
+    from the start.
+    """
+    storage = storage if storage is not None else CsvStorage(csv_path.parent)
+    records, checkpoint, restarted = storage.read_new_occupancy(csv_path.name, agg.checkpoint)
+    if checkpoint == agg.checkpoint:
+        return agg, False
+    if restarted:
+        agg = PoolAggregate()
+    agg.add(records)
+    agg.checkpoint = checkpoint
+    return agg, True
+
+
+def _state_path(csv_path: Path, state_dir: Path) -> Path:
+    return state_dir / f"{csv_path.name}.json"
+
+
+def load_aggregate(csv_path: Path, state_dir: Path) -> PoolAggregate:
+    """Return the last state of *csv_path*: from memory, disk, or empty."""
+    agg = _memory.get(csv_path.resolve())
+    if agg is not None:
+        return agg
+    try:
+        with _state_path(csv_path, state_dir).open(encoding="utf-8") as f:
+            return PoolAggregate.from_json(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        return PoolAggregate()
+
+
+def save_aggregate(agg: PoolAggregate, csv_path: Path, state_dir: Path) -> None:
+    """Persist *agg* atomically, so a crash never leaves a torn state file."""
+    state_dir.mkdir(parents=True, exist_ok=True)
+    path = _state_path(csv_path, state_dir)
+    fd, tmp = tempfile.mkstemp(dir=state_dir, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(agg.to_json(), f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def refresh_aggregate(csv_path: Path, state_dir: Path, storage=None) -> PoolAggregate:
+    """Bring the state of *csv_path* up to date and persist it if it changed."""
+    agg, changed = update_aggregate(load_aggregate(csv_path, state_dir), csv_path, storage)
+    if changed:
+        save_aggregate(agg, csv_path, state_dir)
+    _memory[csv_path.resolve()] = agg
+    return agg
+
+
+def clear_memory() -> None:
+    _memory.clear()
@@ -1,53 +1,205 @@
 from __future__ import annotations
-from collections import defaultdict
+from collections.abc import Iterable
 
-from pool_aggregation.utils.rounding import weighted_average, median_round, py_round
+from pool_aggregation.utils.histogram import RateHistogram
+from pool_aggregation.utils.rounding import py_round, weighted_average
 
 _METRICS = ("averageUtilizationRate", "weightedAverageUtilizationRate", "medianUtilizationRate")
 _DAY_ORDER = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 
 
-def build_overall_map(weekly_map: dict) -> dict:
-    """Build overallOccupancyMap from an already-computed weeklyOccupancyMap."""
-    slot_rates: dict[tuple[str, str], list[int]] = defaultdict(list)
+def build_overall_map(weekly_map: dict, percentiles: Iterable[float] = ()) -> dict:
+    """Build overallOccupancyMap from an already-computed weeklyOccupancyMap.
 
-    for week in weekly_map.values():
-        for day, day_data in week["days"].items():
-            for hour_key, hour_data in day_data["hours"].items():
-                if hour_data["utilizationRate"] is not None:
-                    slot_rates[(day, hour_key)].append(hour_data["utilizationRate"])
+    Each percentile p in *percentiles* adds a "p<p>UtilizationRate" metric.
+    """
+    rates = OverallRates(percentiles)
+    for wid, week in weekly_map.items():
+        rates.set_week(wid, week)
+    return rates.build()
 
-    if not slot_rates:
-        return {}
 
-    days_map: dict[str, dict[str, dict]] = defaultdict(dict)
-    for (day, hour_key), rates in slot_rates.items():
-        float_rates = [float(r) for r in rates]
-        days_map[day][hour_key] = {
-            "averageUtilizationRate": py_round(sum(float_rates) / len(float_rates)),
-            "weightedAverageUtilizationRate": weighted_average(float_rates),
-            "medianUtilizationRate": median_round(float_rates),
-        }
+def percentile_metric(p: float) -> str:
+    return f"p{p:g}UtilizationRate"
 
-    overall_max: dict[str, int] = {m: 0 for m in _METRICS}
-    result_days: dict[str, dict] = {}
-
-    for day in [d for d in _DAY_ORDER if d in days_map]:
-        hours = days_map[day]
-        day_max: dict[str, int] = {m: 0 for m in _METRICS}
-        for hour_stats in hours.values():
-            for m in _METRICS:
-                if hour_stats[m] > day_max[m]:
-                    day_max[m] = hour_stats[m]
-        for m in _METRICS:
-            if day_max[m] > overall_max[m]:
-                overall_max[m] = day_max[m]
-        result_days[day] = {
-            "maxDayValues": day_max,
-            "hours": hours,
-        }
 
-    return {
-        "maxOverallValues": overall_max,
-        "days": result_days,
+def slot_metrics(rates: list[float], histogram: RateHistogram, percentiles: Iterable[float] = ()) -> dict[str, int]:
+    """Overall metrics of one (day, hour) slot.
+
+    *rates* are the slot's weekly rates in weekly map order; the averages
+    are float sums over them in that order, so they round exactly as they
+    always have.  The median and percentiles come from *histogram*.
+    """
+    float_rates = [float(r) for r in rates]
+    median, *values = histogram.percentiles((50, *percentiles))
+    result = {
+        "averageUtilizationRate": py_round(sum(float_rates) / len(float_rates)),
+        "weightedAverageUtilizationRate": weighted_average(float_rates),
+        "medianUtilizationRate": py_round(median),
     }
+    for p, value in zip(percentiles, values):
+        result[percentile_metric(p)] = py_round(value)
+    return result
+
+
+def _contribution(week: dict, keys: dict[tuple[str, str], tuple[str, str]]) -> dict[tuple[str, str], float]:
+    """(day, hour) -> utilization rate of every hour of *week* that has one.
+
+    The (day, hour) tuples are taken from *keys*, so all weeks share one per slot.
+    """
+    contribution = {}
+    for day, day_data in week["days"].items():
+        for hour_key, hour_data in day_data["hours"].items():
+            rate = hour_data["utilizationRate"]
+            if rate is not None:
+                key = (day, hour_key)
+                contribution[keys.setdefault(key, key)] = rate
+    return contribution
+
+
+class OverallRates:
+    """Per-slot rates of the weekly map, kept up to date week by week.
+
+    Every pass over the weekly map calls set_week() for each week in map
+    order and then build().  A changed week has its old rates removed from
+    the slots and its new ones added; weeks not set in a pass are dropped.
+    Only each week's (day, hour) -> rate map is kept, not the week itself,
+    unless *keep_weeks* is set: then a week that is the same object as in
+    the previous pass costs nothing.  That is for the incremental cache,
+    which keeps the week objects alive anyway.  build() recomputes only the
+    slots and days that changed, so a pass that changes one week costs the
+    same however long the history is, apart from collecting the changed
+    slots' rates.  The result is the same as building from scratch.
+    """
+
+    def __init__(self, percentiles: Iterable[float] = (), keep_weeks: bool = False) -> None:
+        self.percentiles = tuple(percentiles)
+        for p in self.percentiles:
+            if not 0 <= p <= 100:
+                raise ValueError(f"percentile must be between 0 and 100, got {p}")
+        self.keep_weeks = keep_weeks
+        self.slots: dict[tuple[str, str], RateHistogram] = {}
+        # weekId -> (week if keep_weeks else None, its contribution), in weekly map order
+        self._weeks: dict[str, tuple[dict | None, dict[tuple[str, str], float]]] = {}
+        self._keys: dict[tuple[str, str], tuple[str, str]] = {}
+        self._seen: list[str] = []          # weeks set in the current pass
+        self._reorder = False               # slot order no longer first-appearance order
+        self._dirty: set[tuple[str, str]] = set()
+        self._metrics: dict[tuple[str, str], dict[str, int]] = {}
+        self._day_max: dict[str, dict[str, int]] = {}
+
+    def set_week(self, wid: str, week: dict) -> None:
+        self._seen.append(wid)
+        previous = self._weeks.get(wid)
+        if previous is not None and previous[0] is week:
+            return
+        old = previous[1] if previous is not None else {}
+        new = _contribution(week, self._keys)
+        self._weeks[wid] = (week if self.keep_weeks else None, new)
+        old_keys, new_keys = list(old), list(new)
+        if old == new and old_keys == new_keys:
+            return
+        for key, rate in old.items():
+            if new.get(key) != rate:
+                self._remove(key, rate)
+        # Slots keep the order of their first rate in the weekly map.  That
+        # order holds if the week's slots are the same, or if the last week
+        # only gained slots at its end; otherwise it is rebuilt in build()
+        if next(reversed(self._weeks)) == wid:
+            new_keys = new_keys[:len(old_keys)]
+        if old_keys != new_keys:
+            self._reorder = True
+        slots, dirty = self.slots, self._dirty
+        for key, rate in new.items():
+            if old and old.get(key) == rate:
+                continue
+            slot = slots.get(key)
+            if slot is None:
+                slot = slots[key] = RateHistogram()
+            slot.add(rate)
+            dirty.add(key)
+
+    def _remove(self, key: tuple[str, str], rate: float) -> None:
+        self.slots[key].add(rate, -1)
+        self._dirty.add(key)
+
+    def _end_pass(self) -> None:
+        """Drop weeks the pass did not set and bring the rest into its order."""
+        seen, self._seen = self._seen, []
+        if seen == list(self._weeks):
+            return
+        for wid in self._weeks.keys() - set(seen):
+            _, contribution = self._weeks.pop(wid)
+            for key, rate in contribution.items():
+                self._remove(key, rate)
+        self._weeks = {wid: self._weeks[wid] for wid in seen}
+        self._reorder = True
+
+    def _rates(self, keys: list[tuple[str, str]]) -> dict[tuple[str, str], list[float]]:
+        """The rates of the slots *keys* in weekly map order."""
+        rates: dict[tuple[str, str], list[float]] = {key: [] for key in keys}
+        if not rates:
+            return rates
+        for _, contribution in self._weeks.values():
+            if len(rates) < len(contribution):
+                for key, slot_rates in rates.items():
+                    rate = contribution.get(key)
+                    if rate is not None:
+                        slot_rates.append(rate)
+            else:
+                for key, rate in contribution.items():
+                    slot_rates = rates.get(key)
+                    if slot_rates is not None:
+                        slot_rates.append(rate)
+        return rates
+
+    def build(self) -> dict:
+        self._end_pass()
+        dirty_days = set()
+        for key in self._dirty:
+            dirty_days.add(key[0])
+            self._metrics.pop(key, None)
+            if not self.slots[key].total:
+                del self.slots[key]
+                self._reorder = True
+        self._dirty.clear()
+        if self._reorder:
+            order = dict.fromkeys(key for _, contribution in self._weeks.values() for key in contribution)
+            self.slots = {key: self.slots[key] for key in order}
+            self._reorder = False
+        if not self.slots:
+            return {}
+
+        metrics = _METRICS + tuple(percentile_metric(p) for p in self.percentiles)
+        slot_rates = self._rates([key for key in self.slots if key not in self._metrics])
+        days_map: dict[str, dict[str, dict]] = {}
+        for key, slot in self.slots.items():
+            hour_stats = self._metrics.get(key)
+            if hour_stats is None:
+                hour_stats = self._metrics[key] = slot_metrics(slot_rates[key], slot, self.percentiles)
+            days_map.setdefault(key[0], {})[key[1]] = hour_stats
+
+        for day in dirty_days:
+            day_max: dict[str, int] = {m: 0 for m in metrics}
+            for hour_stats in days_map.get(day, {}).values():
+                for m in metrics:
+                    if hour_stats[m] > day_max[m]:
+                        day_max[m] = hour_stats[m]
+            self._day_max[day] = day_max
+
+        overall_max: dict[str, int] = {m: 0 for m in metrics}
+        result_days: dict[str, dict] = {}
+        for day in [d for d in _DAY_ORDER if d in days_map]:
+            day_max = self._day_max[day]
+            for m in metrics:
+                if day_max[m] > overall_max[m]:
+                    overall_max[m] = day_max[m]
+            result_days[day] = {
+                "maxDayValues": dict(day_max),
+                "hours": days_map[day],
+            }
+
+        return {
+            "maxOverallValues": overall_max,
+            "days": result_days,
+        }
@@ -0,0 +1,87 @@
+"""Optional NumPy engine for per-slot occupancy statistics.
+
+slot_stats() over a RecordStore groups all rows by an integer
+(week, day, hour) key in a handful of array operations instead of a
+Python loop per record.  The result is the same {(weekId, day, hour):
+SlotStats} mapping, in the same first-seen order, as the pure-Python
+bucketing.slot_stats(); rounding stays in build_weekly_map_from_stats,
+so the round-half-up semantics of py_round are untouched.
+
+NumPy is not a dependency: without it, available() is False and callers
+use the pure-Python path.
+"""
+from __future__ import annotations
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+from pool_aggregation.aggregation.bucketing import SlotStats, week_id
+from pool_aggregation.models.records import RecordStore
+
+# Below this many rows the array setup costs more than the Python loop saves.
+MIN_ROWS = 2000
+
+
+def available() -> bool:
+    return np is not None
+
+
+def usable(records) -> bool:
+    """True if slot_stats() can and should handle *records*."""
+    return np is not None and isinstance(records, RecordStore) and len(records) >= MIN_ROWS
+
+
+def slot_stats(store: RecordStore) -> dict[tuple[str, str, int], SlotStats]:
+    """Return {(weekId, day, hour): SlotStats} of *store* in first-seen order."""
+    if not len(store):
+        return {}
+    date_codes, day_codes, hours, occupancy = (np.frombuffer(a, dtype=a.typecode) for a in store.columns())
+
+    # Week of every distinct date, then of every row
+    week_ids: list[str] = []
+    week_codes: dict[str, int] = {}
+    week_of_date = np.empty(len(store.dates), dtype=np.int64)
+    for i, date_str in enumerate(store.dates):
+        wid = week_id(date_str)
+        if wid not in week_codes:
+            week_codes[wid] = len(week_ids)
+            week_ids.append(wid)
+        week_of_date[i] = week_codes[wid]
+
+    hour_min = int(hours.min())
+    hour_span = int(hours.max()) - hour_min + 1
+    day_span = len(store.days)
+    keys = (week_of_date[date_codes] * day_span + day_codes) * hour_span + (hours.astype(np.int64) - hour_min)
+
+    # Rows grouped by key; a stable sort keeps rows of a slot in file order
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    values = occupancy[order].astype(np.int64)
+    counts = np.diff(np.r_[starts, len(values)])
+    totals = np.add.reduceat(values, starts)
+    mins = np.minimum.reduceat(values, starts)
+    maxs = np.maximum.reduceat(values, starts)
+    first_rows = order[starts]
+
+    # Slots in the order their first row appears, converted to Python values in bulk
+    by_first = np.argsort(first_rows, kind="stable")
+    rows = first_rows[by_first]
+    slot_keys = sorted_keys[starts[by_first]]
+    columns = zip(
+        (slot_keys // hour_span // day_span).tolist(),
+        day_codes[rows].tolist(),
+        (slot_keys % hour_span + hour_min).tolist(),
+        date_codes[rows].tolist(),
+        counts[by_first].tolist(),
+        totals[by_first].tolist(),
+        mins[by_first].tolist(),
+        maxs[by_first].tolist(),
+    )
+    dates, days = store.dates, store.days
+    return {
+        (week_ids[week], days[day], hour): SlotStats(dates[date], count, total, lo, hi)
+        for week, day, hour, date, count, total, lo, hi in columns
+    }
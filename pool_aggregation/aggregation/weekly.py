@@ -1,15 +1,13 @@
 from __future__ import annotations
 from collections import defaultdict
-from pathlib import Path
+from collections.abc import Iterator
 
-from pool_aggregation.aggregation.bucketing import bucket_records, day_name_from_date_str, week_id
-from pool_aggregation.aggregation.capacity import resolve_max_capacity
-from pool_aggregation.io.capacity_reader import load_hourly_capacity
+from pool_aggregation.aggregation import vectorized
+from pool_aggregation.aggregation.bucketing import SlotStats, slot_stats
+from pool_aggregation.aggregation.capacity import capacity_table
 from pool_aggregation.models.records import OccupancyRecord
 from pool_aggregation.utils.rounding import py_round
-from pool_aggregation.utils.timezones import hour_start, to_iso8601
-
-_DATA_DIR = Path(__file__).parent.parent.parent / "data"
+from pool_aggregation.utils.dates import date_info
 
 _DAY_ORDER = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 
@@ -25,21 +23,6 @@ def compute_open_lanes(
     return py_round(resolved_max_cap * total_lanes / static_max_cap)
 
 
-def _capacity_date_hours(pool_cfg: dict) -> set[tuple[str, int]]:
-    """Return all (date_str, hour) pairs present in the forecast capacity CSV."""
-    filename = pool_cfg.get("data", {}).get("capacity", {}).get("forecast")
-    if not filename:
-        return set()
-    pairs: set[tuple[str, int]] = set()
-    for date_str, hour_key in load_hourly_capacity(_DATA_DIR / filename):
-        try:
-            hour = int(hour_key.split(":")[0])
-        except (ValueError, AttributeError):
-            continue
-        pairs.add((date_str, hour))
-    return pairs
-
-
 def build_weekly_map(
     records: list[OccupancyRecord],
     pool_type_cfg: dict,
@@ -49,84 +32,151 @@ def build_weekly_map(
     Hours with real occupancy data include all occupancy fields. Hours that
     only appear in capacity CSV files (future slots) have null occupancy fields.
     """
-    buckets = bucket_records(records)
+    return build_weekly_map_from_stats(record_slot_stats(records), pool_type_cfg)
 
-    static_max_cap: int = pool_type_cfg.get("maximumCapacity", 0)
-    total_lanes: int | None = pool_type_cfg.get("totalLanes")
 
-    # week -> day -> hour -> bucket dict
-    weekly: dict[str, dict[str, dict[str, dict]]] = defaultdict(
-        lambda: defaultdict(dict)
-    )
+def record_slot_stats(records: list[OccupancyRecord]) -> dict[tuple[str, str, int], SlotStats]:
+    """Per-slot statistics of *records*, with NumPy when that pays off."""
+    return vectorized.slot_stats(records) if vectorized.usable(records) else slot_stats(records)
 
-    # --- slots with real occupancy data ---
-    occupied_slots: set[tuple[str, str, int]] = set()
-    for (wid, day, hour), recs in buckets.items():
-        occupancies = [r.occupancy for r in recs]
-        avg_occ = py_round(sum(occupancies) / len(occupancies))
-        min_occ = min(occupancies)
-        max_occ = max(occupancies)
 
-        # Use first record's date for capacity resolution (all share weekId/day/hour).
-        date_str = recs[0].date_str
-        max_cap = resolve_max_capacity(pool_type_cfg, date_str, hour)
-
-        util = py_round(avg_occ / max_cap * 100) if max_cap else 0
-        open_lanes = compute_open_lanes(max_cap, total_lanes, static_max_cap)
-
-        weekly[wid][day][str(hour)] = {
-            "day": day,
-            "hour": hour,
-            "date": to_iso8601(hour_start(date_str, hour)),
-            "minOccupancy": min_occ,
-            "maxOccupancy": max_occ,
-            "averageOccupancy": avg_occ,
-            "maximumCapacity": max_cap,
-            "totalLanes": total_lanes,
-            "openLanes": open_lanes,
-            "utilizationRate": util,
-            "remainingCapacity": py_round(max_cap - avg_occ),
-        }
-        occupied_slots.add((wid, day, hour))
+def build_weekly_map_from_stats(
+    stats: dict[tuple[str, str, int], SlotStats],
+    pool_type_cfg: dict,
+    cache: dict | None = None,
+) -> dict:
+    """Return weeklyOccupancyMap from per-slot statistics (see slot_stats).
+
+    *cache* maps slots to their previously built hour bucket; a bucket is
+    reused as long as neither its statistics nor its capacity changed, so
+    only the affected slots are rebuilt.  A week whose buckets were all
+    reused is returned as the same object as before.
+    """
+    return dict(iter_weekly_map(weekly_slots(stats, pool_type_cfg), pool_type_cfg, cache))
+
+
+def weekly_slots(
+    stats: dict[tuple[str, str, int], SlotStats],
+    pool_type_cfg: dict,
+) -> dict[str, list[tuple[str, int, str, SlotStats | None]]]:
+    """Group the hour slots of the weekly map by week, without building them.
+
+    Returns {weekId: [(day, hour, date_str, stats), ...]} in map order;
+    stats is None for future slots that only have capacity data.
+    """
+    weeks: dict[str, list[tuple[str, int, str, SlotStats | None]]] = defaultdict(list)
+    for (wid, day, hour), slot in stats.items():
+        weeks[wid].append((day, hour, slot.date_str, slot))
 
     # --- future capacity-only slots (no occupancy records yet) ---
-    for date_str, hour in sorted(_capacity_date_hours(pool_type_cfg), key=lambda x: (x[0], x[1])):
-        day = day_name_from_date_str(date_str)
-        wid = week_id(date_str)
-        if (wid, day, hour) in occupied_slots:
+    for date_str, hour in capacity_table(pool_type_cfg).forecast_slots:
+        info = date_info(date_str)
+        day, wid = info.weekday, info.week_id
+        if (wid, day, hour) in stats:
             continue
-        max_cap = resolve_max_capacity(pool_type_cfg, date_str, hour)
-        open_lanes = compute_open_lanes(max_cap, total_lanes, static_max_cap)
-        weekly[wid][day][str(hour)] = {
-            "day": day,
-            "hour": hour,
-            "date": to_iso8601(hour_start(date_str, hour)),
-            "minOccupancy": None,
-            "maxOccupancy": None,
-            "averageOccupancy": None,
-            "maximumCapacity": max_cap,
-            "totalLanes": total_lanes,
-            "openLanes": open_lanes,
-            "utilizationRate": None,
-            "remainingCapacity": None,
-        }
+        weeks[wid].append((day, hour, date_str, None))
+    return weeks
+
+
+def iter_weekly_map(
+    weeks: dict[str, list[tuple[str, int, str, SlotStats | None]]],
+    pool_type_cfg: dict,
+    cache: dict | None = None,
+) -> Iterator[tuple[str, dict]]:
+    """Yield (weekId, week) of the weekly map for *weeks* (see weekly_slots), one week at a time."""
+    static_max_cap: int = pool_type_cfg.get("maximumCapacity", 0)
+    total_lanes: int | None = pool_type_cfg.get("totalLanes")
+    table = capacity_table(pool_type_cfg)
+
+    for wid, slots in weeks.items():
+        # day -> hour -> bucket dict
+        days: dict[str, dict[str, dict]] = defaultdict(dict)
+        # Use first record's date for capacity resolution (all share weekId/day/hour).
+        capacities = table.get_many((date_str, hour) for _, hour, date_str, _ in slots)
+        buckets: list[int] = []
+        for (day, hour, date_str, slot), max_cap in zip(slots, capacities):
+            if slot is None:
+                signature = (None, date_str, max_cap, static_max_cap, total_lanes)
+            else:
+                signature = (slot.count, slot.total, slot.min, slot.max, date_str, max_cap, static_max_cap, total_lanes)
+            slot_key = (wid, day, hour)
+            cached = cache.get(slot_key) if cache is not None else None
+            if cached is not None and cached[0] == signature:
+                bucket = cached[1]
+            else:
+                if slot is None:
+                    bucket = _capacity_only_bucket(day, hour, date_str, max_cap, total_lanes, static_max_cap)
+                else:
+                    bucket = _occupied_bucket(day, hour, date_str, slot, max_cap, total_lanes, static_max_cap)
+                if cache is not None:
+                    cache[slot_key] = (signature, bucket)
+            days[day][str(hour)] = bucket
+            buckets.append(id(bucket))
+        if cache is None:
+            yield wid, _build_week(days)
+            continue
+        # A week made of the very same buckets as last time is the same week
+        # object, which lets consumers such as OverallRates skip it cheaply
+        cached = cache.get(wid)
+        if cached is None or cached[0] != buckets:
+            cached = cache[wid] = (buckets, _build_week(days))
+        yield wid, cached[1]
 
-    result = {}
-    for wid, days in weekly.items():
-        built_days = {}
-        week_max_util: int | None = None
-        for day in [d for d in _DAY_ORDER if d in days]:
-            hours = days[day]
-            util_values = [h["utilizationRate"] for h in hours.values() if h["utilizationRate"] is not None]
-            day_max_util: int | None = max(util_values) if util_values else None
-            if day_max_util is not None:
-                week_max_util = max(week_max_util, day_max_util) if week_max_util is not None else day_max_util
-            built_days[day] = {
-                "maxDayValues": {"utilizationRate": day_max_util},
-                "hours": hours,
-            }
-        result[wid] = {
-            "maxWeekValues": {"utilizationRate": week_max_util},
-            "days": built_days,
+
+def _occupied_bucket(
+    day: str, hour: int, date_str: str, slot: SlotStats, max_cap: int, total_lanes: int | None, static_max_cap: int
+) -> dict:
+    avg_occ = py_round(slot.total / slot.count)
+    util = py_round(avg_occ / max_cap * 100) if max_cap else 0
+    open_lanes = compute_open_lanes(max_cap, total_lanes, static_max_cap)
+    return {
+        "day": day,
+        "hour": hour,
+        "date": date_info(date_str).hour_iso(hour),
+        "minOccupancy": slot.min,
+        "maxOccupancy": slot.max,
+        "averageOccupancy": avg_occ,
+        "maximumCapacity": max_cap,
+        "totalLanes": total_lanes,
+        "openLanes": open_lanes,
+        "utilizationRate": util,
+        "remainingCapacity": py_round(max_cap - avg_occ),
+    }
+
+
+def _capacity_only_bucket(
+    day: str, hour: int, date_str: str, max_cap: int, total_lanes: int | None, static_max_cap: int
+) -> dict:
+    open_lanes = compute_open_lanes(max_cap, total_lanes, static_max_cap)
+    return {
+        "day": day,
+        "hour": hour,
+        "date": date_info(date_str).hour_iso(hour),
+        "minOccupancy": None,
+        "maxOccupancy": None,
+        "averageOccupancy": None,
+        "maximumCapacity": max_cap,
+        "totalLanes": total_lanes,
+        "openLanes": open_lanes,
+        "utilizationRate": None,
+        "remainingCapacity": None,
+    }
+
+
+def _build_week(days: dict[str, dict[str, dict]]) -> dict:
+    built_days = {}
+    week_max_util: int | None = None
+    for day in [d for d in _DAY_ORDER if d in days]:
+        hours = days[day]
+        util_values = [h["utilizationRate"] for h in hours.values() if h["utilizationRate"] is not None]
+        day_max_util: int | None = max(util_values) if util_values else None
+        if day_max_util is not None:
+            week_max_util = max(week_max_util, day_max_util) if week_max_util is not None else day_max_util
+        built_days[day] = {
+            "maxDayValues": {"utilizationRate": day_max_util},
+            "hours": hours,
         }
-    return result
+    return {
+        "maxWeekValues": {"utilizationRate": week_max_util},
+        "days": built_days,
+    }
@@ -1,18 +1,31 @@
 from __future__ import annotations
+import argparse
+import io
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
 from pathlib import Path
 
 from pool_aggregation.aggregation.bucketing import available_week_ids
+from pool_aggregation.aggregation.capacity import capacity_files
 from pool_aggregation.aggregation.current import build_current_occupancy
+from pool_aggregation.aggregation.incremental import refresh_aggregate
 from pool_aggregation.aggregation.pool_block import build_data_range
-from pool_aggregation.aggregation.overall import build_overall_map
-from pool_aggregation.aggregation.weekly import build_weekly_map
-from pool_aggregation.config import load_pool_config
-from pool_aggregation.io.csv_reader import read_records
-from pool_aggregation.io.json_writer import write_json
+from pool_aggregation.aggregation.overall import OverallRates
+from pool_aggregation.aggregation.weekly import iter_weekly_map, record_slot_stats, weekly_slots
+from pool_aggregation.config import apply_pool_state, load_pool_config, load_pool_state
+from pool_aggregation.io.capacity_reader import prime_cache, snapshot
+from pool_aggregation.io.json_writer import StreamedMap, write_json
+from pool_aggregation.io.storage import open_storage
+from pool_aggregation.io.variants import VariantWriter, remove_variants, variants_outdated
+from pool_aggregation.io.weekly_shards import INDEX_NAME, is_sharded, write_weekly_shards
 from pool_aggregation.models.pool import iter_pools
 from pool_aggregation.utils.timezones import now_prague, to_iso8601
 
 _DATA_DIR = Path(__file__).parent.parent / "data"
+_STATE_DIR = Path(".cache") / "aggregation"
+# Payload keys that change on every run; a file differing only in these is not rewritten
+_VOLATILE_KEYS = ("generatedAt",)
 
 
 def _build_payload(generated_at: str) -> dict:
@@ -23,24 +36,101 @@ def _build_payload(generated_at: str) -> dict:
         "dataRange": None,
     }
 
-def build_and_write_payload(path: Path, payload: dict) -> None:
-    write_json(path, payload)
-    print(f"Wrote {path.relative_to(path.parents[1]) if len(path.parents) > 1 else path.name}")
+def build_and_write_payload(path: Path, payload: dict) -> bool:
+    written = write_json(path, payload, ignore_keys=_VOLATILE_KEYS)
+    _report_written(path, written)
+    return written
 
-def process_pool(pool_name: str, pool_cfg: dict, data_dir: Path, output_dir: Path, generated_at: str, now) -> None:
+
+def _report_written(path: Path, written: bool) -> None:
+    name = path.relative_to(path.parents[1]) if len(path.parents) > 1 else path.name
+    print(f"{'Wrote' if written else 'Unchanged'} {name}")
+
+
+def process_pool(
+    pool_name: str,
+    pool_cfg: dict,
+    data_dir: Path,
+    output_dir: Path,
+    generated_at: str,
+    now,
+    incremental: bool = False,
+) -> tuple[list[Path], list[Path]]:
+    """Aggregate one pool and write its output; return (paths written, paths left unchanged)."""
     csv_file = pool_cfg.get("data", {}).get("occupancy", {}).get("raw", "")
     if not csv_file:
         print(f"Skipping {pool_name}: no occupancy data configured")
-        return
+        return [], []
 
     csv_path = data_dir / csv_file
-    records = read_records(csv_path)
+    storage = open_storage(data_dir)
+    if incremental:
+        # Only rows appended since the last run are read; see aggregation.incremental
+        agg = refresh_aggregate(csv_path, data_dir / _STATE_DIR, storage)
+        data_range = build_data_range(agg.edge_records())
+        weeks = weekly_slots(agg.slots, pool_cfg)
+        available_weeks = available_week_ids([], weeks.keys())
+        latest_records = list(agg.latest_by_date.values())
+        cache = agg.rendered
+        # Only weeks that changed since the last run are folded into the overall
+        # rates; taken off agg until the pass completes, so a failed one is not kept
+        rates, agg.overall = agg.overall, None
+    else:
+        records = storage.read_occupancy(csv_file)
+        data_range = build_data_range(records)
+        weeks = weekly_slots(record_slot_stats(records), pool_cfg)
+        available_weeks = available_week_ids(records, weeks.keys())
+        latest_records = records
+        cache = None
+        rates = None
+
+    # The weekly map is streamed to its file one week at a time while the
+    # overall rates are collected, so it never exists as a whole
+    percentiles = tuple(pool_cfg.get("overallPercentiles", ()))
+    if rates is None or rates.percentiles != percentiles:
+        rates = OverallRates(percentiles, keep_weeks=incremental)
 
-    data_range = build_data_range(records)
-    weekly_map = build_weekly_map(records, pool_cfg)
-    available_weeks = available_week_ids(records, weekly_map.keys())
-    overall_map = build_overall_map(weekly_map)
-    current_occ = build_current_occupancy(records, pool_cfg, overall_map, now)
+    week_ids: list[str] = []
+
+    def weekly_items():
+        for wid, week in iter_weekly_map(weeks, pool_cfg, cache):
+            rates.set_week(wid, week)
+            week_ids.append(wid)
+            yield wid, week
+
+    weekly_file = pool_cfg.get("data", {}).get("occupancy", {}).get("weekly", "")
+    weekly_path = output_dir / weekly_file if weekly_file else None
+    shards_written = weekly_written = None
+    if weekly_path is not None and is_sharded(weekly_file):
+        index_payload = _build_payload(generated_at)
+        index_payload.update({
+            "poolName": pool_name,
+            "dataRange": data_range,
+            "availableWeekIds": available_weeks,
+        })
+        shard_payload = {"schemaVersion": 1, "timezone": "Europe/Prague", "poolName": pool_name}
+        shards_written = write_weekly_shards(
+            weekly_path, index_payload, shard_payload, weekly_items(), ignore_keys=_VOLATILE_KEYS
+        )
+    elif weekly_path is not None:
+        weekly_payload = _build_payload(generated_at)
+        weekly_payload.update({
+            "poolName": pool_name,
+            "dataRange": data_range,
+            "availableWeekIds": available_weeks,
+            "weeklyOccupancyMap": StreamedMap(weekly_items()),
+        })
+        weekly_written = write_json(weekly_path, weekly_payload, ignore_keys=_VOLATILE_KEYS)
+    else:
+        for _ in weekly_items():
+            pass
+    overall_map = rates.build()
+    if incremental:
+        agg.overall = rates
+    current_occ = build_current_occupancy(latest_records, pool_cfg, overall_map, now)
+
+    written: list[Path] = []
+    unchanged: list[Path] = []
 
     # overall
     overall_file = pool_cfg.get("data", {}).get("occupancy", {}).get("overall", "")
@@ -55,29 +145,148 @@ def process_pool(pool_name: str, pool_cfg: dict, data_dir: Path, output_dir: Pat
             "overallOccupancyMap": overall_map,
         })
         overall_path = output_dir / overall_file
-        build_and_write_payload(overall_path, overall_payload)
+        if build_and_write_payload(overall_path, overall_payload):
+            written.append(overall_path)
+        else:
+            unchanged.append(overall_path)
 
-    # weekly
-    weekly_file = pool_cfg.get("data", {}).get("occupancy", {}).get("weekly", "")
-    if not weekly_file:
+    # weekly, written above
+    if weekly_path is None:
         print(f"Skipping {pool_name}: no occupancy weekly file defined")
+    elif shards_written is not None:
+        shards, total, index_written = shards_written
+        status = "Wrote" if shards or index_written else "Unchanged"
+        print(f"{status} {weekly_file} ({len(shards)} of {total} week shards changed)")
+        written += shards
+        unchanged += sorted({weekly_path / f"{wid}.json" for wid in week_ids} - set(shards))
+        (written if index_written else unchanged).append(weekly_path / INDEX_NAME)
     else:
-        weekly_payload = _build_payload(generated_at)
-        weekly_payload.update({
-            "poolName": pool_name,
-            "dataRange": data_range,
-            "availableWeekIds": available_weeks,
-            "weeklyOccupancyMap": weekly_map,
-        })
-        weekly_path = output_dir / weekly_file
-        build_and_write_payload(weekly_path, weekly_payload)
+        _report_written(weekly_path, weekly_written)
+        (written if weekly_written else unchanged).append(weekly_path)
+    return written, unchanged
+
+
+def _update_variants(variants: VariantWriter | None, written: list[Path], unchanged: list[Path]) -> None:
+    """Queue variants of the written files and of unchanged ones whose variants are missing or older.
+
+    Without --variants, variants of the written files are removed instead,
+    so a static server never serves a stale .gz next to a newer JSON.
+    """
+    if variants is None:
+        for path in written:
+            remove_variants(path)
+        return
+    for path in written:
+        variants.submit(path)
+    for path in unchanged:
+        if variants_outdated(path):
+            variants.submit(path)
+
+
+def _process_pool_captured(args: tuple) -> tuple[tuple[list[Path], list[Path]], str, str]:
+    """Run process_pool(*args) in a worker; return its result and (stdout, stderr) output."""
+    out, err = io.StringIO(), io.StringIO()
+    with redirect_stdout(out), redirect_stderr(err):
+        counts = process_pool(*args)
+    return counts, out.getvalue(), err.getvalue()
 
-def main(clock=None, data_dir: Path = _DATA_DIR, output_dir: Path = _DATA_DIR) -> int:
+
+def _process_pools_parallel(
+    pools: list[tuple[str, dict]], jobs: int, variants: VariantWriter | None, *args
+) -> list[tuple[list[Path], list[Path]]]:
+    """Run process_pool for *pools* in up to *jobs* worker processes.
+
+    Capacity CSVs are loaded once here and handed to each worker when it
+    starts.  Pools are submitted largest CSV first so the slowest one is
+    not left for last, but their output is printed in config order.
+    """
+    data_dir = args[0]
+    shared_capacity = {}
+    if open_storage(data_dir).name == "csv":
+        shared_capacity = snapshot(sorted({path for _, pool_cfg in pools for path in capacity_files(pool_cfg)}))
+
+    def csv_size(pool: tuple[str, dict]) -> int:
+        csv_path = data_dir / pool[1].get("data", {}).get("occupancy", {}).get("raw", "")
+        return csv_path.stat().st_size if csv_path.is_file() else 0
+
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(pools)), initializer=prime_cache, initargs=(shared_capacity,)
+    ) as executor:
+        futures = {
+            pool[0]: executor.submit(_process_pool_captured, (*pool, *args))
+            for pool in sorted(pools, key=csv_size, reverse=True)
+        }
+        results = []
+        for pool_name, _ in pools:
+            counts, out, err = futures[pool_name].result()
+            sys.stdout.write(out)
+            sys.stderr.write(err)
+            results.append(counts)
+            _update_variants(variants, *counts)
+    return results
+
+
+def main(
+    clock=None,
+    data_dir: Path = _DATA_DIR,
+    output_dir: Path = _DATA_DIR,
+    incremental: bool = False,
+    jobs: int = 1,
+    variants: bool = False,
+) -> int:
     now = now_prague(clock)
     generated_at = to_iso8601(now)
     cfg = load_pool_config(data_dir / "pool_occupancy_config.json")
+    state = load_pool_state(data_dir / "pool_state.json")
+    pools = [(pool_name, apply_pool_state(pool_cfg, state.get(pool_name))) for pool_name, pool_cfg in iter_pools(cfg)]
 
-    for pool_name, pool_cfg in iter_pools(cfg):
-        process_pool(pool_name, pool_cfg, data_dir, output_dir, generated_at, now)
+    # Minified/compressed variants are made in the background while the next pools run
+    variant_writer = VariantWriter() if variants else None
+    if jobs > 1 and len(pools) > 1:
+        results = _process_pools_parallel(
+            pools, jobs, variant_writer, data_dir, output_dir, generated_at, now, incremental
+        )
+    else:
+        results = []
+        for pool_name, pool_cfg in pools:
+            results.append(process_pool(pool_name, pool_cfg, data_dir, output_dir, generated_at, now, incremental))
+            _update_variants(variant_writer, *results[-1])
 
+    written = sum(len(paths) for paths, _ in results)
+    unchanged = sum(len(paths) for _, paths in results)
+    print(f"Output files: {written} written, {unchanged} unchanged")
+    if variant_writer is not None:
+        for path, report in variant_writer.close():
+            print(f"Variants of {path.relative_to(output_dir)}: {report}")
     return 0
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def entrypoint(argv: list[str] | None = None) -> int:
+    """Command-line entry point of `python -m pool_aggregation`."""
+    parser = argparse.ArgumentParser(prog="python -m pool_aggregation", description="Aggregate pool occupancy data.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="fold in only rows appended since the last run (state in data/.cache/aggregation)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=_positive_int,
+        default=1,
+        metavar="N",
+        help="aggregate up to N pools in parallel worker processes (default: 1)",
+    )
+    parser.add_argument(
+        "--variants",
+        action="store_true",
+        help="also write .min.json and precompressed .gz (and .br, with brotli) files next to each output",
+    )
+    args = parser.parse_args(argv)
+    return main(incremental=args.incremental, jobs=args.jobs, variants=args.variants)
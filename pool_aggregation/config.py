@@ -1,10 +1,66 @@
 import json
 from pathlib import Path
 
+from pool_aggregation.io.json_writer import write_bytes_atomic
+
 _DEFAULT_PATH = Path(__file__).parent.parent / "data" / "pool_occupancy_config.json"
+_DEFAULT_STATE_PATH = Path(__file__).parent.parent / "data" / "pool_state.json"
+
+# path -> (mtime_ns, size, parsed config)
+_config_cache: dict[Path, tuple[int, int, list[dict]]] = {}
 
 
 def load_pool_config(path: Path | str | None = None) -> list[dict]:
+    """Load the pool config; parsed once and reused until the file changes.
+
+    The config is read-only at runtime, so the returned list is shared
+    between callers and must not be modified.
+    """
     resolved = Path(path) if path is not None else _DEFAULT_PATH
+    stat = resolved.stat()
+    cached = _config_cache.get(resolved)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
     with resolved.open(encoding="utf-8") as f:
-        return json.load(f)
+        cfg = json.load(f)
+    _config_cache[resolved] = (stat.st_mtime_ns, stat.st_size, cfg)
+    return cfg
+
+
+def load_pool_state(path: Path | str | None = None) -> dict[str, dict]:
+    """Load the runtime pool state as {pool_name: {key: value}}.
+
+    A missing file means nothing has been observed yet.
+    """
+    resolved = Path(path) if path is not None else _DEFAULT_STATE_PATH
+    try:
+        with resolved.open(encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_pool_state(state: dict[str, dict], previous: dict[str, dict], path: Path | str | None = None) -> bool:
+    """Write *state* atomically unless it equals *previous*; return True if written."""
+    if state == previous:
+        return False
+    resolved = Path(path) if path is not None else _DEFAULT_STATE_PATH
+    # Through write_bytes_atomic, so the file keeps a plain open()'s mode
+    write_bytes_atomic(resolved, (json.dumps(state, ensure_ascii=False, indent=2) + "\n").encode("utf-8"))
+    return True
+
+
+def apply_pool_state(pool_cfg: dict, pool_state: dict | None) -> dict:
+    """Return *pool_cfg* with the observed runtime state laid over it.
+
+    The config dict itself is left untouched.  maximumCapacity only ever
+    grows: the larger of the configured and the observed value wins.
+    """
+    if not pool_state:
+        return pool_cfg
+    merged = dict(pool_cfg)
+    if "todayClosed" in pool_state:
+        merged["todayClosed"] = pool_state["todayClosed"]
+    if "maximumCapacity" in pool_state:
+        merged["maximumCapacity"] = max(pool_cfg.get("maximumCapacity", 0), pool_state["maximumCapacity"])
+    return merged
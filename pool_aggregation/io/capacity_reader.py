@@ -1,38 +1,75 @@
 from __future__ import annotations
 import csv
+import os
 from pathlib import Path
 
-_cache: dict[str, dict[tuple[str, str], int]] = {}
+# resolved path -> (mtime_ns, size, lookup); (-1, -1) for a missing file
+_cache: dict[str, tuple[int, int, dict[tuple[str, str], int]]] = {}
+
+
+def _signature(path: Path) -> tuple[int, int]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return -1, -1
+    return stat.st_mtime_ns, stat.st_size
 
 
 def load_hourly_capacity(path: Path) -> dict[tuple[str, str], int]:
     """Return {(date_str, 'HH:00'): max_occupancy} from a capacity CSV.
 
     Accepts both 'HH:00:00' and 'HH:00' in the Hour column.
-    Result is cached by resolved path string.
+    Result is cached by resolved path string and reused until the file's
+    mtime or size changes, e.g. when capacity.py rewrites it.
     """
-    key = str(path.resolve())
-    if key in _cache:
-        return _cache[key]
+    key = os.path.realpath(path)
+    signature = _signature(path)
+    cached = _cache.get(key)
+    if cached is not None and cached[:2] == signature:
+        return cached[2]
 
     lookup: dict[tuple[str, str], int] = {}
-    if path.exists():
+    if signature != (-1, -1):
         try:
-            with path.open(newline="", encoding="utf-8") as f:
-                for row in csv.DictReader(f):
-                    date = row.get("Date", "").strip()
-                    raw_hour = row.get("Hour", "").strip()
-                    hour_key = raw_hour[:5] if len(raw_hour) >= 5 else raw_hour
-                    try:
-                        lookup[(date, hour_key)] = int(row.get("Maximum Occupancy", "").strip())
-                    except (ValueError, AttributeError):
-                        continue
+            for date, _, hour, capacity in read_capacity_rows(path):
+                lookup[(date, hour_key(hour))] = capacity
         except Exception as e:
             print(f"Warning: could not read capacity file {path}: {e}")
 
-    _cache[key] = lookup
+    _cache[key] = (*signature, lookup)
     return lookup
 
 
+def hour_key(raw_hour: str) -> str:
+    """'HH:00' of an Hour column value, which may also be 'HH:00:00'."""
+    return raw_hour[:5] if len(raw_hour) >= 5 else raw_hour
+
+
+def read_capacity_rows(path: Path) -> list[tuple[str, str, str, int]]:
+    """(date, day, hour, maximum occupancy) of every valid row of a capacity CSV."""
+    rows = []
+    with path.open(newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                capacity = int(row.get("Maximum Occupancy", "").strip())
+            except (ValueError, AttributeError):
+                continue
+            rows.append((row.get("Date", "").strip(), row.get("Day", "").strip(), row.get("Hour", "").strip(), capacity))
+    return rows
+
+
+def snapshot(paths: list[Path]) -> dict[str, tuple[int, int, dict[tuple[str, str], int]]]:
+    """Load *paths* and return their cache entries, to hand to prime_cache() elsewhere."""
+    for path in paths:
+        load_hourly_capacity(path)
+    keys = {os.path.realpath(path) for path in paths}
+    return {key: entry for key, entry in _cache.items() if key in keys}
+
+
+def prime_cache(entries: dict[str, tuple[int, int, dict[tuple[str, str], int]]]) -> None:
+    """Seed the cache with already loaded files, e.g. in a worker process."""
+    _cache.update(entries)
+
+
 def clear_cache() -> None:
     _cache.clear()
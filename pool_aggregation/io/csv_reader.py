@@ -1,32 +1,268 @@
 from __future__ import annotations
 import csv
+import hashlib
+import io
+import json
 import logging
+import os
+import struct
+import tempfile
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass
 from pathlib import Path
 
-from pool_aggregation.models.records import OccupancyRecord
+from pool_aggregation.models.records import RecordStore
 
 logger = logging.getLogger(__name__)
 
+# Columns read from an occupancy CSV; header names are matched case-insensitively.
+_COLUMNS = ("date", "day", "time", "occupancy")
+# Bytes covered by each digest of CsvCheckpoint.blocks
+_BLOCK = 1 << 14
+# Sidecar file: magic, length of the JSON checkpoint, the checkpoint, then RecordStore.to_bytes()
+_SIDECAR_MAGIC = b"OCCSIDE3"
+_SIDECAR_HEADER = struct.Struct("<8sI")
 
-def read_records(path: Path | str) -> list[OccupancyRecord]:
-    """Parse a pool occupancy CSV and return valid records; skip bad rows."""
-    records: list[OccupancyRecord] = []
+
+@dataclass(frozen=True)
+class CsvCheckpoint:
+    """How far a CSV has been read, and what the file looked like then."""
+    offset: int                 # bytes consumed, always at a line boundary
+    next_row: int               # number of the next row, for log messages
+    header: tuple[str, ...]
+    inode: int
+    size: int
+    mtime_ns: int
+    blocks: tuple[str, ...]     # SHA-1 of each whole _BLOCK before offset, to notice edits in them
+    tail: str                   # SHA-1 of the bytes after the last whole block, up to offset
+    rotation: int               # resumes so far; picks the middle block that is checked
+
+
+def read_records(path: Path | str, cache_dir: Path | str | None = None) -> RecordStore:
+    """Parse a pool occupancy CSV and return valid records; skip bad rows.
+
+    With *cache_dir*, the parsed rows are kept in a binary sidecar file
+    there.  Later calls load the sidecar and parse only the rows appended
+    since; a replaced or rewritten CSV is parsed from scratch.  The
+    records are the same either way, but bad rows are only logged the
+    first time they are parsed.
+    """
     path = Path(path)
+    if cache_dir is not None:
+        records = _read_with_sidecar(path, Path(cache_dir) / f"{path.name}.rec")
+        if records is not None:
+            return records
     if not path.exists():
-        return records
+        return RecordStore()
     with path.open(newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for lineno, row in enumerate(reader, start=2):
-            try:
-                norm = {k.lower(): v for k, v in row.items()}
-                time_str = norm["time"].strip()
-                records.append(OccupancyRecord(
-                    date_str=norm["date"].strip(),
-                    day=norm["day"].strip(),
-                    time_str=time_str,
-                    occupancy=int(norm["occupancy"]),
-                    hour=int(time_str.split(":")[0]),
-                ))
-            except (KeyError, ValueError, AttributeError) as exc:
-                logger.warning("Skipping row %d in %s: %s", lineno, path.name, exc)
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return RecordStore()
+        records, _ = _parse_rows(reader, header, path, first_row=2)
+    return records
+
+
+def _read_with_sidecar(path: Path, sidecar: Path) -> RecordStore | None:
+    """read_records() through *sidecar*; None if the CSV has no complete header line."""
+    records, checkpoint = _load_sidecar(sidecar)
+    new_records, new_checkpoint, restarted = read_new_records(path, checkpoint)
+    if new_checkpoint is None:
+        return None
+    if records is None or restarted:
+        records = new_records
+    elif new_records:
+        records.extend(new_records)
+    if new_checkpoint != checkpoint:
+        try:
+            _save_sidecar(sidecar, records, new_checkpoint)
+        except OSError as exc:
+            logger.warning("Could not write %s: %s", sidecar, exc)
+    if new_checkpoint.offset < new_checkpoint.size:
+        # A last line without its newline: a full read parses it, so do the same,
+        # but keep it out of the sidecar until it is complete
+        with path.open("rb") as f:
+            f.seek(new_checkpoint.offset)
+            rest = f.read(new_checkpoint.size - new_checkpoint.offset).decode("utf-8")
+        tail, _ = _parse_rows(csv.reader(io.StringIO(rest, newline="")), new_checkpoint.header, path, new_checkpoint.next_row)
+        records.extend(tail)
     return records
+
+
+def _load_sidecar(sidecar: Path) -> tuple[RecordStore | None, CsvCheckpoint | None]:
+    """Records and checkpoint stored in *sidecar*; (None, None) if it is missing or unreadable."""
+    try:
+        data = sidecar.read_bytes()
+        magic, size = _SIDECAR_HEADER.unpack_from(data)
+        if magic != _SIDECAR_MAGIC:
+            raise ValueError("bad magic")
+        start = _SIDECAR_HEADER.size
+        fields = json.loads(data[start:start + size])
+        fields.update(header=tuple(fields["header"]), blocks=tuple(fields["blocks"]))
+        checkpoint = CsvCheckpoint(**fields)
+        return RecordStore.from_bytes(data[start + size:]), checkpoint
+    except FileNotFoundError:
+        return None, None
+    except (OSError, ValueError, TypeError, KeyError, struct.error) as exc:
+        logger.warning("Ignoring unreadable %s: %s", sidecar, exc)
+        return None, None
+
+
+def _save_sidecar(sidecar: Path, records: RecordStore, checkpoint: CsvCheckpoint) -> None:
+    """Write *records* and *checkpoint* to *sidecar* atomically."""
+    sidecar.parent.mkdir(parents=True, exist_ok=True)
+    fields = json.dumps(asdict(checkpoint), separators=(",", ":")).encode("utf-8")
+    fd, tmp = tempfile.mkstemp(dir=sidecar.parent, prefix=sidecar.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_SIDECAR_HEADER.pack(_SIDECAR_MAGIC, len(fields)))
+            f.write(fields)
+            f.write(records.to_bytes())
+        os.replace(tmp, sidecar)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def read_new_records(
+    path: Path | str,
+    checkpoint: CsvCheckpoint | None = None,
+) -> tuple[RecordStore, CsvCheckpoint | None, bool]:
+    """Return the records appended to *path* since *checkpoint*.
+
+    Returns (records, new checkpoint, restarted).  *restarted* is True when
+    the file was read from the beginning again because it was replaced
+    (new inode), truncated or rewritten before the checkpoint; the caller
+    must then discard whatever it built from earlier records.  A trailing
+    line without its newline is still being written and is left for the
+    next call.  The checkpoint is None if the file does not exist.
+    """
+    path = Path(path)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return RecordStore(), None, checkpoint is not None
+    if checkpoint is not None and (checkpoint.inode, checkpoint.size, checkpoint.mtime_ns) == (
+        stat.st_ino, stat.st_size, stat.st_mtime_ns
+    ):
+        return RecordStore(), checkpoint, False
+
+    with path.open("rb") as f:
+        tail = _continued_tail(f, stat, checkpoint) if checkpoint is not None else None
+        if tail is not None:
+            restarted = False
+            header, offset, next_row = checkpoint.header, checkpoint.offset, checkpoint.next_row
+            blocks, rotation = list(checkpoint.blocks), checkpoint.rotation + 1
+        else:
+            restarted = checkpoint is not None
+            f.seek(0)
+            first_line = f.readline()
+            if not first_line.endswith(b"\n"):
+                return RecordStore(), None, restarted
+            header = tuple(next(csv.reader([first_line.decode("utf-8")]), ()))
+            offset, next_row = len(first_line), 2
+            blocks, rotation = [], 0
+            tail = _extend_blocks(blocks, hashlib.sha1(), 0, memoryview(first_line))
+        f.seek(offset)
+        data = f.read(stat.st_size - offset)
+        end = data.rfind(b"\n") + 1
+        if end:
+            rows = csv.reader(io.StringIO(data[:end].decode("utf-8"), newline=""))
+            records, next_row = _parse_rows(rows, header, path, next_row)
+        else:
+            records = RecordStore()
+        tail = _extend_blocks(blocks, tail, offset - len(blocks) * _BLOCK, memoryview(data)[:end])
+        offset += end
+
+    checkpoint = CsvCheckpoint(
+        offset, next_row, header, stat.st_ino, stat.st_size, stat.st_mtime_ns,
+        tuple(blocks), tail.hexdigest(), rotation,
+    )
+    return records, checkpoint, restarted
+
+
+def _continued_tail(f, stat: os.stat_result, checkpoint: CsvCheckpoint):
+    """SHA-1 of checkpoint.tail's bytes, or None unless the file looks like it was only appended to.
+
+    The bytes after the last whole block are hashed again, and of the
+    whole blocks the first, the last and one in between that moves on
+    with every resume.  That bounds the work however long the file gets;
+    an edit that keeps the size and misses the sample is still noticed
+    within as many resumes as the file has blocks.
+    """
+    if stat.st_ino != checkpoint.inode or stat.st_size < checkpoint.offset:
+        return None
+    blocks = checkpoint.blocks
+    sample = {0, len(blocks) - 1} if blocks else set()
+    if len(blocks) > 2:
+        sample.add(1 + checkpoint.rotation % (len(blocks) - 2))
+    for i in sorted(sample):
+        f.seek(i * _BLOCK)
+        if hashlib.sha1(f.read(_BLOCK)).hexdigest() != blocks[i]:
+            return None
+    f.seek(len(blocks) * _BLOCK)
+    tail = hashlib.sha1(f.read(checkpoint.offset - len(blocks) * _BLOCK))
+    return tail if tail.hexdigest() == checkpoint.tail else None
+
+
+def _extend_blocks(blocks: list[str], digest, filled: int, data: memoryview):
+    """Feed *data* to *digest*, which has seen *filled* bytes after the last of *blocks*.
+
+    Each block completed on the way is appended to *blocks*; the digest of
+    the bytes after the new last block is returned.
+    """
+    while data:
+        take = min(len(data), _BLOCK - filled)
+        digest.update(data[:take])
+        filled += take
+        data = data[take:]
+        if filled == _BLOCK:
+            blocks.append(digest.hexdigest())
+            digest, filled = hashlib.sha1(), 0
+    return digest
+
+
+def _column_indices(header: Iterable[str]) -> tuple[int, ...] | None:
+    """Indices of _COLUMNS in *header* (last one wins on duplicates), None if one is missing."""
+    positions = {name.lower(): i for i, name in enumerate(header)}
+    try:
+        return tuple(positions[name] for name in _COLUMNS)
+    except KeyError:
+        return None
+
+
+def _parse_rows(
+    rows: Iterable[list[str]],
+    header: tuple[str, ...] | list[str],
+    path: Path,
+    first_row: int,
+) -> tuple[RecordStore, int]:
+    """Parse CSV rows against *header*; return (records, number of the next row)."""
+    records = RecordStore()
+    indices = _column_indices(header)
+    width = len(header)
+    needed = max(indices) + 1 if indices is not None else 0
+    next_row = first_row
+    for row in rows:
+        if not row:
+            continue    # blank line
+        row_no, next_row = next_row, next_row + 1
+        if indices is None:
+            logger.warning("Skipping row %d in %s: header lacks one of %s", row_no, path.name, _COLUMNS)
+            continue
+        if len(row) > width or len(row) < needed:
+            logger.warning("Skipping row %d in %s: %d fields, header has %d", row_no, path.name, len(row), width)
+            continue
+        date_idx, day_idx, time_idx, occupancy_idx = indices
+        try:
+            time_str = row[time_idx].strip()
+            records.append(
+                row[date_idx].strip(),
+                row[day_idx].strip(),
+                time_str,
+                int(row[occupancy_idx]),
+                int(time_str.split(":")[0]),
+            )
+        except (ValueError, OverflowError) as exc:
+            logger.warning("Skipping row %d in %s: %s", row_no, path.name, exc)
+    return records, next_row
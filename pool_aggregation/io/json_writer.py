@@ -1,12 +1,135 @@
 from __future__ import annotations
+import hashlib
 import json
+import os
+import secrets
+from collections.abc import Collection, Iterable
 from pathlib import Path
+from typing import Any, TextIO
 
+_INDENT = "  "
+_TEMP_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
 
-def write_json(path: Path | str, payload: dict) -> None:
-    """Write payload as deterministic, pretty-printed UTF-8 JSON."""
+
+
+class StreamedMap:
+    """A JSON object produced by an iterable of (key, value) pairs.
+
+    write_json() writes it one pair at a time, so only the current value
+    has to exist in memory.  The iterable is consumed by the write.
+    """
+    __slots__ = ("items",)
+
+    def __init__(self, items: Iterable[tuple[str, Any]]) -> None:
+        self.items = items
+
+
+def write_json(path: Path | str, payload: dict, ignore_keys: Collection[str] = ()) -> bool:
+    """Write payload as deterministic, pretty-printed UTF-8 JSON, if it changed.
+
+    The JSON goes to a temp file next to *path* that is renamed over it,
+    so readers never see a partial file.  If *path* already holds the
+    same bytes -- apart from the values of the top-level *ignore_keys*,
+    which must be scalars -- it is left untouched.  Top-level values may
+    be StreamedMaps; the bytes are the same as for the equivalent dict.
+    Returns True if the file was written.
+
+    The new bytes are hashed as they are written and compared with a
+    hash of the old file read in chunks, so neither file is ever held in
+    memory as a whole.
+    """
     path = Path(path)
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2, ensure_ascii=False, sort_keys=False)
-        f.write("\n")
+    fd, tmp = _create_temp(path)
+    try:
+        digest = hashlib.sha256()
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            _write_object(f, payload.items(), 0, digest, frozenset(ignore_keys))
+            _put(f, digest, "\n")
+        if _same_content(digest, Path(tmp), path, ignore_keys):
+            os.unlink(tmp)
+            return False
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return True
+
+
+def write_bytes_atomic(path: Path, data: bytes) -> None:
+    """Replace *path* with *data* through a temp file and rename."""
+    fd, tmp = _create_temp(path)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _create_temp(path: Path) -> tuple[int, str]:
+    """Create a new temp file next to *path*; return (fd, its path).
+
+    Unlike mkstemp's 0600, the file gets the mode a plain open() would
+    give it: the kernel applies the umask to 0o666.
+    """
+    while True:
+        tmp = str(path.with_name(f"{path.name}.{secrets.token_hex(6)}.tmp"))
+        try:
+            return os.open(tmp, _TEMP_FLAGS, 0o666), tmp
+        except FileExistsError:
+            continue
+
+
+def _same_content(digest, new: Path, old: Path, ignore_keys: Collection[str]) -> bool:
+    """True if *old* hashes to *digest*, the hash of *new* with the *ignore_keys* values left out."""
+    try:
+        if not ignore_keys and new.stat().st_size != old.stat().st_size:
+            return False
+        old_digest = hashlib.sha256()
+        # Top-level keys are the only lines indented by exactly one level; their
+        # value is left out of the hash, but not the comma that may follow it
+        prefixes = tuple(f"{_INDENT}{_encode(key, 0)}: ".encode("utf-8") for key in ignore_keys)
+        with old.open("rb") as f:
+            for line in f:
+                if prefixes and line.startswith(prefixes):
+                    prefix = next(p for p in prefixes if line.startswith(p))
+                    line = prefix + (b",\n" if line.endswith(b",\n") else b"\n" if line.endswith(b"\n") else b"")
+                old_digest.update(line)
+    except FileNotFoundError:
+        return False
+    return old_digest.digest() == digest.digest()
+
+
+def _encode(value: Any, level: int) -> str:
+    # JSON strings never contain a raw newline, so every "\n" starts an indented line
+    return json.dumps(value, indent=2, ensure_ascii=False).replace("\n", "\n" + _INDENT * level)
+
+
+def _put(f: TextIO, digest, text: str) -> None:
+    f.write(text)
+    digest.update(text.encode("utf-8"))
+
+
+def _write_object(
+    f: TextIO, items: Iterable[tuple[str, Any]], level: int, digest, masked: Collection[str] = ()
+) -> None:
+    """Write items the way json.dump(indent=2) writes a dict nested *level* deep.
+
+    Everything written is fed to *digest* except the values of the keys
+    in *masked*, which is only given for the top level.
+    """
+    separator = "{\n"
+    inner = _INDENT * (level + 1)
+    for key, value in items:
+        _put(f, digest, f"{separator}{inner}{_encode(key, 0)}: ")
+        if isinstance(value, StreamedMap):
+            _write_object(f, value.items, level + 1, digest)
+        elif key in masked:
+            f.write(_encode(value, level + 1))
+        else:
+            _put(f, digest, _encode(value, level + 1))
+        separator = ",\n"
+    _put(f, digest, "{}" if separator == "{\n" else f"\n{_INDENT * level}}}")
@@ -0,0 +1,358 @@
+"""Where occupancy samples and capacity rows are kept.
+
+The scrapers and the aggregation read and write through a storage object
+instead of opening the CSVs themselves.  The backend is chosen with the
+POOL_STORAGE environment variable:
+
+- "csv" (default): one CSV per pool and per capacity source in the data
+  directory, as before.
+- "sqlite": a single SQLite database in the data directory, in WAL mode,
+  with occupancy and capacity rows indexed by (pool, timestamp), so a
+  date range is read without parsing the whole history.
+
+In both, a pool is named by its occupancy CSV file name from the config
+and a capacity source by its CSV file name.  Existing CSVs are copied
+into the database with ``python -m pool_aggregation.io.storage``.
+"""
+from __future__ import annotations
+import argparse
+import csv
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from pool_aggregation.io.capacity_reader import hour_key, load_hourly_capacity, read_capacity_rows
+from pool_aggregation.io.csv_reader import CsvCheckpoint, read_new_records, read_records
+from pool_aggregation.models.records import RecordStore
+
+STORAGE_ENV = "POOL_STORAGE"
+DATABASE_NAME = "pool_data.sqlite3"
+
+_OCCUPANCY_HEADER = ["Date", "Day", "Time", "Occupancy"]
+_CAPACITY_HEADER = ["Date", "Day", "Hour", "Maximum Occupancy"]
+_RECORDS_DIR = Path(".cache") / "records"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS occupancy (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pool TEXT NOT NULL,
+    ts TEXT,
+    date TEXT NOT NULL,
+    day TEXT NOT NULL,
+    time TEXT NOT NULL,
+    occupancy INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS occupancy_pool_ts ON occupancy (pool, ts);
+CREATE INDEX IF NOT EXISTS occupancy_pool_id ON occupancy (pool, id);
+CREATE TABLE IF NOT EXISTS capacity (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    ts TEXT,
+    date TEXT NOT NULL,
+    day TEXT NOT NULL,
+    hour TEXT NOT NULL,
+    max_occupancy INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS capacity_source_ts ON capacity (source, ts);
+"""
+
+# (backend, absolute data directory) -> storage
+_storages: dict[tuple[str, Path], "CsvStorage | SqliteStorage"] = {}
+
+
+def open_storage(data_dir: Path | str, backend: str | None = None) -> "CsvStorage | SqliteStorage":
+    """The storage of *data_dir*; *backend* defaults to $POOL_STORAGE, else "csv"."""
+    backend = backend or os.environ.get(STORAGE_ENV) or "csv"
+    key = (backend, Path(os.path.abspath(data_dir)))
+    storage = _storages.get(key)
+    if storage is None:
+        if backend == "csv":
+            storage = CsvStorage(key[1])
+        elif backend == "sqlite":
+            storage = SqliteStorage(key[1] / DATABASE_NAME)
+        else:
+            raise ValueError(f"unknown {STORAGE_ENV} backend {backend!r}, expected 'csv' or 'sqlite'")
+        _storages[key] = storage
+    return storage
+
+
+def timestamp(date_str: str, time_str: str) -> str | None:
+    """'YYYY-MM-DD HH:MM' of a d.M.yyyy date and an H:MM time; None if either is malformed."""
+    try:
+        day, month, year = (int(part) for part in date_str.split("."))
+        hour, minute = (int(part) for part in time_str.split(":")[:2])
+    except ValueError:
+        return None
+    return f"{year:04d}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}"
+
+
+def _in_range(ts: str | None, start: str | None, end: str | None) -> bool:
+    if start is None and end is None:
+        return True
+    return ts is not None and (start is None or ts >= start) and (end is None or ts < end)
+
+
+class CsvStorage:
+    """Occupancy and capacity rows in the CSV files of a data directory."""
+    __slots__ = ("data_dir",)
+    name = "csv"
+
+    def __init__(self, data_dir: Path) -> None:
+        self.data_dir = data_dir
+
+    def append_occupancy(self, pool: str, row: list) -> None:
+        """Append one [date, day, time, occupancy] row, creating the CSV with its header."""
+        _append_rows(self.data_dir / pool, _OCCUPANCY_HEADER, [row])
+
+    def read_occupancy(self, pool: str, start: str | None = None, end: str | None = None) -> RecordStore:
+        """Records of *pool* in file order, those in [start, end) if either is given.
+
+        *start* and *end* are 'YYYY-MM-DD[ HH:MM]' strings.  The CSV is
+        read through its sidecar cache, so unchanged rows are not parsed
+        again, but a range still visits every record.
+        """
+        records = read_records(self.data_dir / pool, cache_dir=self.data_dir / _RECORDS_DIR)
+        if start is None and end is None:
+            return records
+        return RecordStore(r for r in records if _in_range(timestamp(r.date_str, r.time_str), start, end))
+
+    def read_new_occupancy(self, pool: str, checkpoint) -> tuple[RecordStore, CsvCheckpoint | None, bool]:
+        """read_new_records() of the pool's CSV; a checkpoint of another backend starts over."""
+        if checkpoint is not None and not isinstance(checkpoint, CsvCheckpoint):
+            records, checkpoint, _ = read_new_records(self.data_dir / pool)
+            return records, checkpoint, True
+        return read_new_records(self.data_dir / pool, checkpoint)
+
+    def append_capacity(self, source: str, rows: list[list]) -> None:
+        _append_rows(self.data_dir / source, _CAPACITY_HEADER, rows)
+
+    def replace_capacity(self, source: str, rows: list[list]) -> None:
+        """Replace the whole CSV, through a temp file so readers never see a partial one."""
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        path = self.data_dir / source
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with tmp.open("w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(_CAPACITY_HEADER)
+                writer.writerows(rows)
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    def load_capacity(self, source: str) -> dict[tuple[str, str], int]:
+        return load_hourly_capacity(self.data_dir / source)
+
+
+def _append_rows(path: Path, header: list[str], rows: list[list]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if not path.exists():
+        with path.open("w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerow(header)
+    with path.open("a", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+
+
+@dataclass(frozen=True)
+class RowCheckpoint:
+    """How far a pool's rows in the database have been read."""
+    last_id: int                # highest row id read; ids are never reused
+
+
+class SqliteStorage:
+    """Occupancy and capacity rows in one SQLite database.
+
+    Rows keep their insertion order (the row id), which is the order of
+    the CSV they were imported from, so records read back are the same
+    as read from the CSV.  Each thread and process gets its own
+    connection.
+    """
+    __slots__ = ("path", "_local", "_capacity")
+    name = "sqlite"
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._local = threading.local()
+        # source -> ((max id, rows), lookup), so an unchanged source returns the same dict
+        self._capacity: dict[str, tuple[tuple, dict[tuple[str, str], int]]] = {}
+
+    def _connection(self) -> sqlite3.Connection:
+        conn, pid = getattr(self._local, "conn", None), getattr(self._local, "pid", None)
+        if conn is None or pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+    def append_occupancy(self, pool: str, row: list) -> None:
+        conn = self._connection()
+        with conn:
+            _insert_occupancy(conn, pool, [row])
+
+    def read_occupancy(self, pool: str, start: str | None = None, end: str | None = None) -> RecordStore:
+        """Records of *pool* in insertion order, those in [start, end) if either is given.
+
+        *start* and *end* are 'YYYY-MM-DD[ HH:MM]' strings; a range is
+        answered from the (pool, ts) index.
+        """
+        query, params = "SELECT date, day, time, occupancy FROM occupancy WHERE pool = ?", [pool]
+        if start is not None:
+            query += " AND ts >= ?"
+            params.append(start)
+        if end is not None:
+            query += " AND ts < ?"
+            params.append(end)
+        return _to_records(self._connection().execute(query + " ORDER BY id", params))
+
+    def read_new_occupancy(self, pool: str, checkpoint) -> tuple[RecordStore, RowCheckpoint | None, bool]:
+        """Records of *pool* added since *checkpoint*; see read_new_records() for the result.
+
+        The pool is read from the start again (restarted) when the last
+        row read is gone, as after the importer replaced the pool's rows.
+        """
+        conn = self._connection()
+        if isinstance(checkpoint, RowCheckpoint):
+            restarted = conn.execute(
+                "SELECT 1 FROM occupancy WHERE id = ? AND pool = ?", (checkpoint.last_id, pool)
+            ).fetchone() is None
+        else:
+            restarted = checkpoint is not None
+        last_id = checkpoint.last_id if isinstance(checkpoint, RowCheckpoint) and not restarted else 0
+        cursor = conn.execute(
+            "SELECT id, date, day, time, occupancy FROM occupancy WHERE pool = ? AND id > ? ORDER BY id",
+            (pool, last_id),
+        )
+        records = RecordStore()
+        for row_id, date, day, time, occupancy in cursor:
+            records.append(date, day, time, occupancy, int(time.split(":")[0]))
+            last_id = row_id
+        if not last_id:
+            return records, None, restarted
+        if not records:
+            return records, checkpoint, restarted
+        return records, RowCheckpoint(last_id), restarted
+
+    def append_capacity(self, source: str, rows: list[list]) -> None:
+        conn = self._connection()
+        with conn:
+            _insert_capacity(conn, source, rows)
+
+    def replace_capacity(self, source: str, rows: list[list]) -> None:
+        """Replace all rows of *source* in one transaction."""
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM capacity WHERE source = ?", (source,))
+            _insert_capacity(conn, source, rows)
+
+    def load_capacity(self, source: str) -> dict[tuple[str, str], int]:
+        """(date, 'HH:00') -> maximum occupancy of *source*, later rows winning, as from its CSV."""
+        conn = self._connection()
+        signature = conn.execute("SELECT max(id), count(*) FROM capacity WHERE source = ?", (source,)).fetchone()
+        cached = self._capacity.get(source)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        lookup = {
+            (date, hour_key(hour)): capacity
+            for date, hour, capacity in conn.execute(
+                "SELECT date, hour, max_occupancy FROM capacity WHERE source = ? ORDER BY id", (source,)
+            )
+        }
+        self._capacity[source] = (signature, lookup)
+        return lookup
+
+    def import_csv_files(self, data_dir: Path, pools: list[str], capacity_sources: list[str]) -> dict[str, int]:
+        """Copy the CSVs of *pools* and *capacity_sources* in *data_dir*; return rows per file.
+
+        Each file replaces what the database held for it, in one
+        transaction, so importing again is safe.  Only the rows the CSV
+        readers accept are copied.
+        """
+        conn = self._connection()
+        counts: dict[str, int] = {}
+        for pool in pools:
+            records = read_records(data_dir / pool)
+            with conn:
+                conn.execute("DELETE FROM occupancy WHERE pool = ?", (pool,))
+                _insert_occupancy(conn, pool, ((r.date_str, r.day, r.time_str, r.occupancy) for r in records))
+            counts[pool] = len(records)
+        for source in capacity_sources:
+            path = data_dir / source
+            rows = read_capacity_rows(path) if path.exists() else []
+            self.replace_capacity(source, rows)
+            counts[source] = len(rows)
+        # Move the imported pages from the write-ahead log into the database file
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return counts
+
+
+def _insert_occupancy(conn: sqlite3.Connection, pool: str, rows) -> None:
+    conn.executemany(
+        "INSERT INTO occupancy (pool, ts, date, day, time, occupancy) VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (pool, timestamp(str(date), str(time)), str(date), str(day), str(time), int(occupancy))
+            for date, day, time, occupancy in rows
+        ),
+    )
+
+
+def _insert_capacity(conn: sqlite3.Connection, source: str, rows) -> None:
+    conn.executemany(
+        "INSERT INTO capacity (source, ts, date, day, hour, max_occupancy) VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (source, timestamp(str(date), str(hour)), str(date), str(day), str(hour), int(capacity))
+            for date, day, hour, capacity in rows
+        ),
+    )
+
+
+def _to_records(rows) -> RecordStore:
+    records = RecordStore()
+    for date, day, time, occupancy in rows:
+        records.append(date, day, time, occupancy, int(time.split(":")[0]))
+    return records
+
+
+def _configured_files(config_path: Path) -> tuple[list[str], list[str]]:
+    """Occupancy CSVs and capacity CSVs named in the pool config."""
+    from pool_aggregation.config import load_pool_config
+    from pool_aggregation.models.pool import iter_pools
+
+    pools, sources = [], []
+    for _, pool_cfg in iter_pools(load_pool_config(config_path)):
+        data = pool_cfg.get("data", {})
+        raw = data.get("occupancy", {}).get("raw")
+        if raw and raw not in pools:
+            pools.append(raw)
+        for key in ("raw", "forecast"):
+            source = data.get("capacity", {}).get(key)
+            if source and source not in sources:
+                sources.append(source)
+    return pools, sources
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Import the occupancy and capacity CSVs into the SQLite database.")
+    parser.add_argument("--data-dir", type=Path, default=Path(__file__).parent.parent.parent / "data")
+    args = parser.parse_args(argv)
+    pools, sources = _configured_files(args.data_dir / "pool_occupancy_config.json")
+    storage = open_storage(args.data_dir, "sqlite")
+    for name, rows in storage.import_csv_files(args.data_dir, pools, sources).items():
+        print(f"Imported {rows} rows from {name}")
+    print(f"Wrote {storage.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,112 @@
+"""Minified and precompressed variants of the JSON outputs.
+
+For an output ``<name>.json`` this produces
+
+- ``<name>.json.gz``: the file itself, gzip-compressed,
+- ``<name>.min.json``: the same JSON without whitespace,
+- ``<name>.min.json.gz``: the minified file, gzip-compressed,
+
+and ``.br`` counterparts of both ``.gz`` files if the optional brotli
+package is installed.  A static host can then serve the precompressed
+files directly (e.g. nginx ``gzip_static``/``brotli_static``) without
+compressing anything per request.  gzip output is stored with mtime 0,
+so unchanged JSON gives byte-identical archives.  Variants older than
+their JSON (or missing) are outdated and are made again.
+
+The work runs in a background thread while the aggregation goes on;
+close() waits for it and reports on each file, in the order the files
+were submitted.
+"""
+from __future__ import annotations
+import gzip
+import json
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+from pool_aggregation.io.json_writer import write_bytes_atomic
+
+
+_ENCODINGS = ("gz", "br") if brotli is not None else ("gz",)
+
+
+def _compressed(data: bytes) -> dict[str, bytes]:
+    encoded = {"gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded["br"] = brotli.compress(data)
+    return encoded
+
+
+def minified_path(path: Path) -> Path:
+    return path.with_name(f"{path.stem}.min{path.suffix}")
+
+
+def variant_paths(path: Path, encodings: tuple[str, ...] = ("gz", "br")) -> list[Path]:
+    """The variants of *path* with the given compressions."""
+    minified = minified_path(path)
+    return [minified] + [
+        target.with_name(f"{target.name}.{encoding}") for target in (path, minified) for encoding in encodings
+    ]
+
+
+def variants_outdated(path: Path) -> bool:
+    """True if a variant of *path* is missing or older than *path*."""
+    source = path.stat().st_mtime_ns
+    for variant in variant_paths(path, _ENCODINGS):
+        try:
+            if variant.stat().st_mtime_ns < source:
+                return True
+        except FileNotFoundError:
+            return True
+    return False
+
+
+def remove_variants(path: Path) -> None:
+    """Delete any variants of *path*."""
+    for variant in variant_paths(path):
+        variant.unlink(missing_ok=True)
+
+
+def _kib(size: int) -> str:
+    return f"{size / 1024:.1f} KiB"
+
+
+def write_variants(path: Path) -> str:
+    """Write the variants of the JSON file *path*; return their sizes and the time taken."""
+    start = time.perf_counter()
+    pretty = path.read_bytes()
+    minified = json.dumps(json.loads(pretty), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    sizes = [_kib(len(pretty))]
+    for target, data in ((path, pretty), (minified_path(path), minified)):
+        if target is not path:
+            write_bytes_atomic(target, data)
+            sizes.append(f"min {_kib(len(data))}")
+        for encoding, compressed in _compressed(data).items():
+            write_bytes_atomic(target.with_name(f"{target.name}.{encoding}"), compressed)
+            sizes.append(f"{'min.' if target is not path else ''}{encoding} {_kib(len(compressed))}")
+    elapsed = time.perf_counter() - start
+    return f"{', '.join(sizes)} in {elapsed * 1e3:.0f} ms"
+
+
+class VariantWriter:
+    """Writes variants of submitted files in a background thread."""
+
+    def __init__(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="variants")
+        self._pending: list[tuple[Path, Future]] = []
+
+    def submit(self, path: Path) -> None:
+        self._pending.append((path, self._executor.submit(write_variants, path)))
+
+    def close(self) -> list[tuple[Path, str]]:
+        """Wait for all submitted files; return (path, report) pairs in submission order."""
+        try:
+            return [(path, future.result()) for path, future in self._pending]
+        finally:
+            self._executor.shutdown()
+            self._pending.clear()
@@ -0,0 +1,77 @@
+"""Sharded weekly output: one JSON file per week plus an index.
+
+Used when a pool's ``data.occupancy.weekly`` entry names a directory
+(ends with "/").  The directory holds ``<weekId>.json`` per week and
+``index.json`` listing every shard with the SHA-256 of its bytes, so a
+client fetches the index and then only the weeks it shows or whose hash
+changed.  Shards carry no generation time: a week whose data did not
+change keeps its bytes and its file is not rewritten.
+"""
+from __future__ import annotations
+import glob
+import hashlib
+import json
+from collections.abc import Collection, Iterable
+from pathlib import Path
+
+from pool_aggregation.io.json_writer import write_bytes_atomic, write_json
+
+INDEX_NAME = "index.json"
+
+
+def is_sharded(weekly_file: str) -> bool:
+    """True if the configured weekly output is a shard directory."""
+    return weekly_file.endswith("/")
+
+
+def _encode(payload: dict) -> bytes:
+    return (json.dumps(payload, indent=2, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _previous_hashes(directory: Path) -> dict[str, str]:
+    """{file name: sha256} from the index of the last run; empty if there is none."""
+    try:
+        with (directory / INDEX_NAME).open(encoding="utf-8") as f:
+            weeks = json.load(f)["weeks"]
+        return {entry["file"]: entry["sha256"] for entry in weeks.values()}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return {}
+
+
+def write_weekly_shards(
+    directory: Path,
+    index_payload: dict,
+    shard_payload: dict,
+    weeks: Iterable[tuple[str, dict]],
+    ignore_keys: Collection[str] = (),
+) -> tuple[list[Path], int, bool]:
+    """Write one shard per week and the index.
+
+    Each shard is *shard_payload* plus "weekId" and the week's fields;
+    the index is *index_payload* plus "weeks": {weekId: {file, sha256}},
+    written by write_json() with *ignore_keys*.  Shards whose bytes match
+    the previous index are left alone, and shards of weeks that are gone
+    are removed.  Returns (paths of the shards written, shards total,
+    whether the index was written).
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    previous = _previous_hashes(directory)
+    index_weeks: dict[str, dict] = {}
+    written: list[Path] = []
+    for wid, week in weeks:
+        data = _encode({**shard_payload, "weekId": wid, **week})
+        digest = hashlib.sha256(data).hexdigest()
+        name = f"{wid}.json"
+        if previous.get(name) != digest or not (directory / name).exists():
+            write_bytes_atomic(directory / name, data)
+            written.append(directory / name)
+        index_weeks[wid] = {"file": name, "sha256": digest}
+
+    index_written = write_json(directory / INDEX_NAME, {**index_payload, "weeks": index_weeks}, ignore_keys)
+    current = {entry["file"] for entry in index_weeks.values()}
+    for name in previous.keys() - current:
+        if Path(name).name == name and name.endswith(".json") and name != INDEX_NAME:
+            # with any minified/compressed variants (see io.variants)
+            for path in directory.glob(f"{glob.escape(name[:-len('.json')])}.*"):
+                path.unlink(missing_ok=True)
+    return written, len(index_weeks), index_written
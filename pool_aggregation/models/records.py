@@ -1,11 +1,212 @@
 from __future__ import annotations
+import json
+import struct
+import sys
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
 from dataclasses import dataclass
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class OccupancyRecord:
     date_str: str   # d.M.yyyy
     day: str        # English weekday name
     time_str: str   # HH:mm
     occupancy: int
     hour: int       # 0-23
+
+
+class _Interned:
+    """String table handing out a small integer code per distinct value."""
+    __slots__ = ("values", "_codes")
+
+    def __init__(self) -> None:
+        self.values: list[str] = []
+        self._codes: dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def find(self, value: str) -> int | None:
+        return self._codes.get(value)
+
+    @classmethod
+    def from_values(cls, values: list[str]) -> "_Interned":
+        table = cls()
+        table.values = values
+        table._codes = {value: code for code, value in enumerate(values)}
+        return table
+
+
+# to_bytes() layout: header, JSON string tables, then the raw column arrays
+_HEADER = struct.Struct("<4scII")           # magic, byte order, rows, table bytes
+_MAGIC = b"RST1"
+_BYTE_ORDER = b"<" if sys.byteorder == "little" else b">"
+
+
+class RecordStore(Sequence):
+    """Columnar, array-backed sequence of OccupancyRecords.
+
+    Each row takes a date, day and time code into interned string tables
+    plus the occupancy and hour in typed arrays -- 11 bytes instead
+    of a record object and three strings.  The original strings are kept
+    exactly, so bucket keys and capacity lookups see the same values.
+
+    Indexing and iteration build OccupancyRecord objects on demand, so
+    code written for list[OccupancyRecord] works unchanged; the hot paths
+    use rows(), on_date() and edge_records() instead.
+    """
+
+    def __init__(self, records: Iterable[OccupancyRecord] = ()) -> None:
+        self._dates = _Interned()
+        self._days = _Interned()
+        self._times = _Interned()
+        self._date_codes = array("H")
+        self._day_codes = array("B")
+        self._time_codes = array("H")
+        self._occupancy = array("i")
+        self._hours = array("h")
+        for r in records:
+            self.append(r.date_str, r.day, r.time_str, r.occupancy, r.hour)
+
+    def append(self, date_str: str, day: str, time_str: str, occupancy: int, hour: int) -> None:
+        # Any column can overflow its array type (the codes too, with enough
+        # distinct strings); a failed row is cut off all of them
+        rows = len(self._occupancy)
+        try:
+            self._date_codes.append(self._dates.code(date_str))
+            self._day_codes.append(self._days.code(day))
+            self._time_codes.append(self._times.code(time_str))
+            self._occupancy.append(occupancy)
+            self._hours.append(hour)
+        except BaseException:
+            for column in self._arrays():
+                del column[rows:]
+            raise
+
+    def extend(self, records: Iterable[OccupancyRecord]) -> None:
+        for r in records:
+            self.append(r.date_str, r.day, r.time_str, r.occupancy, r.hour)
+
+    def __len__(self) -> int:
+        return len(self._occupancy)
+
+    def _arrays(self) -> tuple[array, ...]:
+        return self._date_codes, self._day_codes, self._time_codes, self._occupancy, self._hours
+
+    def to_bytes(self) -> bytes:
+        """Serialize the store; from_bytes() restores it without re-parsing any text."""
+        tables = json.dumps(
+            [self._dates.values, self._days.values, self._times.values], ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        header = _HEADER.pack(_MAGIC, _BYTE_ORDER, len(self), len(tables))
+        return b"".join([header, tables, *(a.tobytes() for a in self._arrays())])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "RecordStore":
+        """Inverse of to_bytes(); raises ValueError on data it did not write."""
+        try:
+            magic, byte_order, rows, table_size = _HEADER.unpack_from(data)
+        except struct.error as exc:
+            raise ValueError(f"truncated record store: {exc}") from None
+        if magic != _MAGIC or byte_order != _BYTE_ORDER:
+            raise ValueError("not a record store written on this platform")
+        data = memoryview(data)
+        offset = _HEADER.size + table_size
+        dates, days, times = json.loads(bytes(data[_HEADER.size:offset]))
+        store = cls()
+        store._dates, store._days, store._times = (_Interned.from_values(v) for v in (dates, days, times))
+        for column in store._arrays():
+            end = offset + rows * column.itemsize
+            column.frombytes(data[offset:end])
+            offset = end
+        if offset != len(data):
+            raise ValueError(f"record store holds {len(data)} bytes, expected {offset}")
+        return store
+
+    def _record(self, i: int) -> OccupancyRecord:
+        return OccupancyRecord(
+            self._dates.values[self._date_codes[i]],
+            self._days.values[self._day_codes[i]],
+            self._times.values[self._time_codes[i]],
+            self._occupancy[i],
+            self._hours[i],
+        )
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._record(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("record index out of range")
+        return self._record(index)
+
+    def __iter__(self) -> Iterator[OccupancyRecord]:
+        for i in range(len(self)):
+            yield self._record(i)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, (RecordStore, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"<RecordStore of {len(self)} records>"
+
+    @property
+    def dates(self) -> list[str]:
+        """Distinct date strings, in first-seen order."""
+        return self._dates.values
+
+    @property
+    def days(self) -> list[str]:
+        """Distinct day names, in first-seen order."""
+        return self._days.values
+
+    def columns(self) -> tuple[array, array, array, array]:
+        """The raw (date code, day code, hour, occupancy) arrays, for bulk processing.
+
+        Date and day codes index into dates and days.  The arrays are the
+        store's own and must not be modified.
+        """
+        return self._date_codes, self._day_codes, self._hours, self._occupancy
+
+    def rows(self) -> Iterator[tuple[str, str, int, int]]:
+        """Yield (date_str, day, hour, occupancy) of every record, without building records."""
+        dates, days = self._dates.values, self._days.values
+        for date_code, day_code, hour, occupancy in zip(self._date_codes, self._day_codes, self._hours, self._occupancy):
+            yield dates[date_code], days[day_code], hour, occupancy
+
+    def on_date(self, date_str: str) -> list[OccupancyRecord]:
+        """Records whose date_str equals *date_str*, in order."""
+        code = self._dates.find(date_str)
+        if code is None:
+            return []
+        return [self._record(i) for i, c in enumerate(self._date_codes) if c == code]
+
+    def edge_records(self) -> list[OccupancyRecord]:
+        """[first, last] record in (reversed date parts, time_str) order.
+
+        Same order and tie-breaking as min()/max() over the records with
+        that key, but each distinct date and time is ranked only once.
+        """
+        if not len(self):
+            return []
+        date_rank = _ranks([tuple(d.split(".")[::-1]) for d in self._dates.values])
+        time_rank = _ranks(self._times.values)
+        width = len(time_rank)
+        keys = [date_rank[d] * width + time_rank[t] for d, t in zip(self._date_codes, self._time_codes)]
+        return [self._record(keys.index(min(keys))), self._record(keys.index(max(keys)))]
+
+
+def _ranks(keys: list) -> list[int]:
+    """Dense rank of every key; equal keys share a rank."""
+    rank = {k: i for i, k in enumerate(sorted(set(keys)))}
+    return [rank[k] for k in keys]
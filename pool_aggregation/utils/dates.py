@@ -0,0 +1,57 @@
+"""Shared, memoized calendar facts about d.M.yyyy date strings.
+
+The aggregation derives the same few things -- week id, weekday name,
+the ISO8601 start of an hour -- from the same few hundred date strings
+tens of thousands of times.  date_info() parses each distinct string
+once and keeps the results; the per-hour ISO strings are built on first
+use, through the same hour_start()/to_iso8601() as before, so DST
+offsets are exactly what those give.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from functools import lru_cache
+
+from pool_aggregation.utils.timezones import hour_start, to_iso8601
+
+DAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+# Distinct date strings kept; a pool CSV holds a few hundred, plus capacity forecasts
+_MAX_DATES = 8192
+
+
+@dataclass(frozen=True, slots=True)
+class DateInfo:
+    """What the aggregation needs to know about one date string."""
+    date_str: str
+    ordinal: int        # date.toordinal()
+    week_id: str        # ISO Monday of the week, yyyy-MM-dd
+    weekday: str        # English weekday name
+    _hour_iso: list = field(default_factory=lambda: [None] * 24, repr=False, compare=False)
+
+    def hour_iso(self, hour: int) -> str:
+        """ISO8601 start of *hour* on this date, with its Prague UTC offset."""
+        if not 0 <= hour < 24:
+            return to_iso8601(hour_start(self.date_str, hour))     # raises like before
+        iso = self._hour_iso[hour]
+        if iso is None:
+            iso = self._hour_iso[hour] = to_iso8601(hour_start(self.date_str, hour))
+        return iso
+
+
+@lru_cache(maxsize=_MAX_DATES)
+def date_info(date_str: str) -> DateInfo:
+    """DateInfo of a d.M.yyyy string; raises ValueError if it is not a valid date."""
+    day, month, year = date_str.split(".")
+    d = date(int(year), int(month), int(day))
+    monday = d - timedelta(days=d.weekday())
+    return DateInfo(date_str, d.toordinal(), monday.isoformat(), DAY_NAMES[d.weekday()])
+
+
+def cache_info():
+    """Hits, misses, maximum and current size of the date cache."""
+    return date_info.cache_info()
+
+
+def clear_cache() -> None:
+    date_info.cache_clear()
@@ -0,0 +1,97 @@
+from __future__ import annotations
+from collections.abc import Iterable
+from fractions import Fraction
+from functools import lru_cache
+
+
+class RateHistogram:
+    """Counts of utilization rates, for exact medians and percentiles.
+
+    Rates take few distinct values (whole percents, plus two-decimal
+    values below 0.5), so the histogram keeps one count per distinct
+    value: its size does not grow with the number of rates added, and
+    order statistics come out exactly as from the sorted list of rates.
+    Histograms can be merged with update(), and rates taken out again.
+    """
+    __slots__ = ("counts", "total")
+
+    def __init__(self, rates: Iterable[float] = ()) -> None:
+        self.counts: dict[float, int] = {}
+        self.total = 0
+        for rate in rates:
+            self.add(rate)
+
+    def add(self, rate: float, count: int = 1) -> None:
+        """Count *rate* in; a negative *count* takes it out again."""
+        left = self.counts.get(rate, 0) + count
+        if left < 0:
+            raise ValueError(f"rate {rate} was not added {-count} times")
+        if left:
+            self.counts[rate] = left
+        else:
+            del self.counts[rate]
+        self.total += count
+
+    def update(self, other: RateHistogram) -> None:
+        for rate, count in other.counts.items():
+            self.add(rate, count)
+
+    def median(self) -> float:
+        """The same value statistics.median() gives for the rates."""
+        return self.percentiles((50,))[0]
+
+    def percentile(self, p: float) -> float:
+        return self.percentiles((p,))[0]
+
+    def percentiles(self, ps: Iterable[float]) -> list[float]:
+        """The *p*-th percentile for each p in *ps*, in one pass over the histogram.
+
+        Values are interpolated linearly between the closest ranks (the
+        inclusive definition, numpy's default), so the 50th percentile
+        equals the median.  Positions are computed exactly; only the
+        final interpolation is done in floating point.
+        """
+        if not self.total:
+            raise ValueError("no percentile for an empty histogram")
+        positions = []
+        for p in ps:
+            numerator, denominator = _ratio(p)
+            # position = p / 100 * (total - 1) = below + remainder / denominator
+            below, remainder = divmod(numerator * (self.total - 1), denominator)
+            positions.append((below, remainder, denominator))
+        ranks = sorted({rank for below, remainder, _ in positions for rank in (below, below + (remainder > 0))})
+        ranked = dict(zip(ranks, self._ranked(ranks)))
+        result = []
+        for below, remainder, denominator in positions:
+            low = ranked[below]
+            if not remainder:
+                result.append(low)
+            elif 2 * remainder == denominator:
+                result.append((low + ranked[below + 1]) / 2)
+            else:
+                result.append(low + (ranked[below + 1] - low) * (remainder / denominator))
+        return result
+
+    def _ranked(self, ranks: list[int]) -> list[float]:
+        """Values at the given 0-based *ranks* (ascending) of the sorted rates."""
+        values: list[float] = []
+        seen = 0
+        pending = iter(ranks)
+        rank = next(pending, None)
+        for rate in sorted(self.counts):
+            seen += self.counts[rate]
+            while rank is not None and rank < seen:
+                values.append(rate)
+                rank = next(pending, None)
+            if rank is None:
+                break
+        return values
+
+
+@lru_cache(maxsize=None)
+def _ratio(p: float) -> tuple[int, int]:
+    """p / 100 as an exact (numerator, denominator) pair."""
+    if not 0 <= p <= 100:
+        raise ValueError(f"percentile must be between 0 and 100, got {p}")
+    ratio = Fraction(str(p)) / 100
+    return ratio.numerator, ratio.denominator
@@ -15,7 +15,8 @@ def py_round(x: float) -> int:
         return math.floor(x + 0.5)
 
 
-def _weight(r: float) -> float:
+def rate_weight(r: float) -> float:
+    """Weight of rate r in weighted_average()."""
     if r == 0:
         return 0.0
     if r < 1:
@@ -27,10 +28,10 @@ def _weight(r: float) -> float:
 
 def weighted_average(values: list[float]) -> int:
     """Weighted average with four weight tiers; returns 0 when sum of weights is 0."""
-    total_w = sum(_weight(r) for r in values)
+    total_w = sum(rate_weight(r) for r in values)
     if total_w == 0:
         return 0
-    return py_round(sum(_weight(r) * r for r in values) / total_w)
+    return py_round(sum(rate_weight(r) * r for r in values) / total_w)
 
 
 def median_round(values: list[float]) -> int:
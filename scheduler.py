@@ -2,13 +2,21 @@
 every 10 minutes during operating hours (6–22 Prague time, first run 6:10)
 and capacity analysis once daily at 4:00 AM Prague time.
 
+Jobs run inside a long-lived worker process rather than a new Python
+process per tick, so imports, parsed robots.txt files, open connections
+and aggregation caches stay warm between ticks.  The worker is supervised:
+a job that crashes it or exceeds its timeout gets it killed and replaced.
+
 Intended for Docker deployments.  For scheduled CI runs, see
 .github/workflows/schedule.yml.
 """
 
 import logging
-import subprocess
+import multiprocessing
+import sys
+import threading
 import time
+import traceback
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
@@ -16,6 +24,12 @@ import schedule
 
 PRAGUE = ZoneInfo("Europe/Prague")
 
+# Longest a job may run before its worker is killed (seconds).
+JOB_TIMEOUTS = {
+    "occupancy": 5 * 60,
+    "capacity": 10 * 60,
+}
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
@@ -23,12 +37,97 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def run(cmd: str) -> None:
-    """Run a shell command and log the result."""
-    logger.info("Running: %s", cmd)
-    result = subprocess.run(cmd, shell=True)  # noqa: S602
-    if result.returncode != 0:
-        logger.error("Command failed: %s (exit %d)", cmd, result.returncode)
+def _worker_main(conn) -> None:
+    """Worker process loop: receive a job name, run it, report timings."""
+    import capacity
+    import occupancy
+    from pool_aggregation import cli
+    from pool_aggregation.io.capacity_reader import clear_cache
+
+    # Steps of each job; a failing step doesn't stop the following ones.
+    jobs = {
+        "occupancy": (occupancy.main, lambda: cli.main(incremental=True)),
+        # capacity.csv / week_capacity.csv are rewritten, drop the cached copies
+        "capacity": (lambda: capacity.main([]), clear_cache),
+    }
+
+    while True:
+        try:
+            name = conn.recv()
+        except EOFError:
+            return
+        wall, cpu = time.perf_counter(), time.process_time()
+        ok = True
+        for step in jobs[name]:
+            try:
+                step()
+            except Exception:
+                traceback.print_exc()
+                ok = False
+        sys.stdout.flush()
+        conn.send((ok, time.perf_counter() - wall, time.process_time() - cpu))
+
+
+class Worker:
+    """Supervised worker process that runs jobs one at a time."""
+
+    def __init__(self):
+        self._process = None
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def run(self, name: str) -> bool:
+        """Run job *name* in the worker; return True if it succeeded.
+
+        Skips the job if another one is still running, so ticks never
+        overlap.
+        """
+        if not self._lock.acquire(blocking=False):
+            logger.warning("Previous job still running, skipping %s", name)
+            return False
+        try:
+            return self._run(name, JOB_TIMEOUTS[name])
+        finally:
+            self._lock.release()
+
+    def _run(self, name: str, timeout: float) -> bool:
+        if self._process is None or not self._process.is_alive():
+            self._start()
+        logger.info("Running: %s", name)
+        self._conn.send(name)
+
+        if not self._conn.poll(timeout):
+            logger.error("Job %s timed out after %d s, restarting worker", name, timeout)
+            self._stop()
+            return False
+        try:
+            ok, wall, cpu = self._conn.recv()
+        except EOFError:
+            logger.error("Worker crashed during %s (exit %s), restarting", name, self._process.exitcode)
+            self._stop()
+            return False
+
+        log = logger.info if ok else logger.error
+        log("Job %s %s in %.2f s (%.2f s CPU)", name, "finished" if ok else "failed", wall, cpu)
+        return ok
+
+    def _start(self) -> None:
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_worker_main, args=(child_conn,), name="pool-tracker-worker", daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+
+    def _stop(self) -> None:
+        self._process.kill()
+        self._process.join()
+        self._conn.close()
+        self._process = None
+        self._conn = None
+
+
+worker = Worker()
 
 
 def _is_operating_hours(now: datetime) -> bool:
@@ -51,24 +150,28 @@ def run_occupancy() -> None:
     if not _is_operating_hours(now):
         logger.info("Outside operating hours (%s), skipping", now.strftime("%H:%M"))
         return
-    run("python occupancy.py")
-    run("python -m pool_aggregation")
+    worker.run("occupancy")
 
 
 def run_capacity() -> None:
     """Run capacity tracker."""
-    run("python capacity.py")
+    worker.run("capacity")
+
+
+def main() -> None:
+    # ── Schedule ──────────────────────────────────────────────────────
+    schedule.every(10).minutes.do(run_occupancy)
+    schedule.every().day.at("04:00").do(run_capacity)
 
+    # Run occupancy immediately on startup (if within operating hours)
+    run_occupancy()
 
-# ── Schedule ──────────────────────────────────────────────────────────
-schedule.every(10).minutes.do(run_occupancy)
-schedule.every().day.at("04:00").do(run_capacity)
+    logger.info("Scheduler started — occupancy every 10 min (6–22, first run 6:10), capacity daily at 04:00")
 
-# Run occupancy immediately on startup (if within operating hours)
-run_occupancy()
+    while True:
+        schedule.run_pending()
+        time.sleep(1)
 
-logger.info("Scheduler started — occupancy every 10 min (6–22, first run 6:10), capacity daily at 04:00")
 
-while True:
-    schedule.run_pending()
-    time.sleep(1)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,18 @@
+import os
+
 import pytest
 from pool_aggregation.models.records import OccupancyRecord
 
+# http_utils refuses to import without a bot identity; give the scraper
+# modules a dummy one so their parsing code can be tested offline.
+for _var, _value in (
+    ("BOT_NAME", "TestBot"),
+    ("BOT_VERSION", "0.0"),
+    ("BOT_URL", "https://example.com"),
+    ("BOT_EMAIL", "test@example.com"),
+):
+    os.environ.setdefault(_var, _value)
+
 
 @pytest.fixture
 def sample_records():
@@ -0,0 +1,92 @@
+import csv
+from datetime import datetime
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+import capacity
+from capacity import available_lane_hours, parse_capacity_html
+
+FIXTURES = Path(__file__).parent / "fixtures"
+PAGE = FIXTURES / "pages" / "kravi_hora_rozpis.html"
+EXPECTED = FIXTURES / "expected_rozpis_capacity.csv"
+
+
+def _expected_rows():
+    with EXPECTED.open(newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader)
+        return [[date, day, hour, int(cap)] for date, day, hour, cap in reader]
+
+
+def _row(html):
+    return BeautifulSoup(f"<table><tr>{html}</tr></table>", "html.parser").find("tr")
+
+
+def test_week_page_matches_recorded_output():
+    rows = parse_capacity_html(PAGE.read_text(encoding="utf-8"))
+    assert rows == _expected_rows()
+
+
+def test_tables_without_date_or_lanes_are_skipped():
+    rows = parse_capacity_html(PAGE.read_text(encoding="utf-8"))
+    assert {r[0] for r in rows} == {f"{d}.07.2024" for d in range(15, 22)}
+
+
+def test_full_hour_cell():
+    row = _row('<td>Dráha 1</td><td class="col-06-00 free" colspan="2"></td>'
+               '<td class="col-07-00 reserved" colspan="2"></td>')
+    assert list(available_lane_hours(row)) == [6]
+
+
+def test_half_hour_cells_must_both_be_free():
+    row = _row('<td>Dráha 1</td>'
+               '<td class="col-06-00 free"></td><td class="col-06-30 free"></td>'
+               '<td class="col-07-00 free"></td><td class="col-07-30 closed"></td>')
+    assert list(available_lane_hours(row)) == [6]
+
+
+def test_last_half_hour_cell_without_successor_is_unavailable():
+    row = _row('<td>Dráha 1</td><td class="col-21-00 free"></td>')
+    assert list(available_lane_hours(row)) == []
+
+
+def test_forecast_merges_week_pages(monkeypatch):
+    html = PAGE.read_text(encoding="utf-8")
+    requested = []
+
+    def fake_fetch_urls(urls):
+        requested.extend(urls)
+        return {url: (None if url.endswith("2024-07-29") else html) for url in urls}
+
+    monkeypatch.setattr(capacity, "fetch_urls", fake_fetch_urls)
+    rows = capacity.get_forecast_data(datetime(2024, 7, 15), 3)
+    assert requested == [capacity.schedule_url(d) for d in ("2024-07-15", "2024-07-22", "2024-07-29")]
+    # Both fetched pages repeat the same week; rows are merged, not duplicated.
+    assert rows == _expected_rows()
+
+
+def test_forecast_parses_in_a_daemonic_worker(monkeypatch):
+    html = PAGE.read_text(encoding="utf-8")
+    weeks = capacity.MIN_PARALLEL_PAGES
+    monkeypatch.setattr(capacity, "fetch_urls", lambda urls: {url: html for url in urls})
+
+    def no_children(*args, **kwargs):
+        raise AssertionError("daemonic processes are not allowed to have children")
+
+    monkeypatch.setattr(capacity, "ProcessPoolExecutor", no_children)
+    monkeypatch.setattr(capacity.multiprocessing.current_process(), "daemon", True)
+    assert capacity.get_forecast_data(datetime(2024, 7, 15), weeks) == _expected_rows()
+    monkeypatch.setattr(capacity.multiprocessing.current_process(), "daemon", False)
+    assert capacity.get_forecast_data(datetime(2024, 7, 15), weeks - 1) == _expected_rows()
+
+
+def test_save_week_capacity_replaces_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    capacity.save_week_capacity_to_csv([["15.07.2024", "Monday", "06:00:00", 90]])
+    capacity.save_week_capacity_to_csv([["16.07.2024", "Tuesday", "06:00:00", 45]])
+    assert (tmp_path / "data" / "week_capacity.csv").read_text(encoding="utf-8").splitlines() == [
+        "Date,Day,Hour,Maximum Occupancy",
+        "16.07.2024,Tuesday,06:00:00,45",
+    ]
+    assert [p.name for p in (tmp_path / "data").iterdir()] == ["week_capacity.csv"]
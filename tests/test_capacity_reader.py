@@ -37,3 +37,11 @@ def test_result_is_cached():
     first = load_hourly_capacity(FIXTURE)
     second = load_hourly_capacity(FIXTURE)
     assert first is second
+
+
+def test_rewritten_file_is_reloaded(tmp_path):
+    path = tmp_path / "cap.csv"
+    path.write_text("Date,Day,Hour,Maximum Occupancy\n15.07.2024,Monday,14:00:00,90\n")
+    assert load_hourly_capacity(path) == {("15.07.2024", "14:00"): 90}
+    path.write_text("Date,Day,Hour,Maximum Occupancy\n15.07.2024,Monday,14:00:00,120\n")
+    assert load_hourly_capacity(path) == {("15.07.2024", "14:00"): 120}
@@ -147,3 +147,45 @@ def test_no_capacity_files_uses_static(monkeypatch, tmp_path):
     cfg = {"maximumCapacity": 300, "data": {"capacity": {}}}
     # Should use static value (300) since no capacity files are configured
     assert resolve_max_capacity(cfg, "15.07.2024", 14) == 300
+
+
+def test_raw_overrides_forecast(monkeypatch, tmp_path):
+    (tmp_path / "raw.csv").write_text("Date,Day,Hour,Maximum Occupancy\n15.07.2024,Monday,14:00:00,90\n")
+    (tmp_path / "forecast.csv").write_text(
+        "Date,Day,Hour,Maximum Occupancy\n15.07.2024,Monday,14:00:00,80\n15.07.2024,Monday,15:00:00,70\n"
+    )
+
+    import pool_aggregation.aggregation.capacity as cap_mod
+    monkeypatch.setattr(cap_mod, "_DATA_DIR", tmp_path)
+
+    cfg = {"maximumCapacity": 135, "data": {"capacity": {"raw": "raw.csv", "forecast": "forecast.csv"}}}
+    assert resolve_max_capacity(cfg, "15.07.2024", 14) == 90
+    assert resolve_max_capacity(cfg, "15.07.2024", 15) == 70
+
+
+def test_table_bulk_lookup_matches_single(monkeypatch, tmp_path):
+    csv_path = tmp_path / "cap.csv"
+    csv_path.write_text(
+        "Date,Day,Hour,Maximum Occupancy\n15.07.2024,Monday,06:00:00,45\n16.07.2024,Tuesday,14:00,90\n"
+    )
+
+    import pool_aggregation.aggregation.capacity as cap_mod
+    monkeypatch.setattr(cap_mod, "_DATA_DIR", tmp_path)
+
+    table = cap_mod.capacity_table(_cfg(135, "cap.csv"))
+    slots = [("15.07.2024", 6), ("15.07.2024", 7), ("16.07.2024", 14), ("not a date", 14)]
+    assert table.get_many(slots) == [table.get(*slot) for slot in slots] == [45, 135, 90, 135]
+
+
+def test_table_is_rebuilt_when_csv_changes(monkeypatch, tmp_path):
+    csv_path = tmp_path / "cap.csv"
+    csv_path.write_text("Date,Day,Hour,Maximum Occupancy\n15.07.2024,Monday,14:00:00,90\n")
+
+    import pool_aggregation.aggregation.capacity as cap_mod
+    monkeypatch.setattr(cap_mod, "_DATA_DIR", tmp_path)
+
+    cfg = _cfg(135, "cap.csv")
+    table = cap_mod.capacity_table(cfg)
+    assert cap_mod.capacity_table(cfg) is table
+    csv_path.write_text("Date,Day,Hour,Maximum Occupancy\n15.07.2024,Monday,14:00:00,100\n")
+    assert resolve_max_capacity(cfg, "15.07.2024", 14) == 100
@@ -1,14 +1,19 @@
 """End-to-end: CSV fixtures -> CLI -> JSON on disk."""
 from __future__ import annotations
 import json
+import os
+import random
 import shutil
-from datetime import datetime
+import tracemalloc
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
 import pytest
 
-from pool_aggregation.cli import main
+from pool_aggregation.cli import entrypoint, main, process_pool
+from pool_aggregation.config import load_pool_config
+from pool_aggregation.models.pool import iter_pools
 from pool_aggregation.io.capacity_reader import clear_cache
 
 PRAGUE = ZoneInfo("Europe/Prague")
@@ -156,3 +161,96 @@ def test_available_week_ids_ascending(data_dir, output_dir):
     ids = data["availableWeekIds"]
     assert ids == sorted(ids)
     assert "2024-07-15" in ids
+
+
+# --- parallel pools ---
+
+def test_parallel_jobs_match_serial_run(data_dir, tmp_path, capsys):
+    main(clock=lambda: _PINNED, data_dir=data_dir, output_dir=tmp_path / "serial")
+    serial_console = capsys.readouterr().out
+    main(clock=lambda: _PINNED, data_dir=data_dir, output_dir=tmp_path / "parallel", jobs=2)
+    assert capsys.readouterr().out == serial_console
+    files = sorted((tmp_path / "serial").rglob("*.json"))
+    assert files
+    for path in files:
+        assert path.read_bytes() == (tmp_path / "parallel" / path.relative_to(tmp_path / "serial")).read_bytes()
+
+
+def test_quiet_tick_leaves_outputs_untouched(data_dir, output_dir, capsys):
+    _run(data_dir, output_dir)
+    assert "Output files: 6 written, 0 unchanged" in capsys.readouterr().out
+    mtimes = {p: p.stat().st_mtime_ns for p in output_dir.rglob("*.json")}
+    main(clock=lambda: _PINNED.replace(minute=40), data_dir=data_dir, output_dir=output_dir)
+    assert "Output files: 0 written, 6 unchanged" in capsys.readouterr().out
+    assert {p: p.stat().st_mtime_ns for p in output_dir.rglob("*.json")} == mtimes
+
+
+def test_variants_are_made_on_a_quiet_tick(data_dir, output_dir, capsys):
+    _run(data_dir, output_dir)
+    main(clock=lambda: _PINNED, data_dir=data_dir, output_dir=output_dir, variants=True)
+    out = capsys.readouterr().out
+    assert "Output files: 0 written, 6 unchanged" in out
+    assert out.count("Variants of ") == 6
+    overall = output_dir / "overall" / "alpha_inside_occupancy.json"
+    assert (output_dir / "overall" / "alpha_inside_occupancy.min.json.gz").exists()
+    # Up to date now, so the next quiet tick leaves them alone
+    main(clock=lambda: _PINNED, data_dir=data_dir, output_dir=output_dir, variants=True)
+    assert "Variants of " not in capsys.readouterr().out
+
+    os.utime(overall.with_name(f"{overall.name}.gz"), ns=(0, 0))
+    main(clock=lambda: _PINNED, data_dir=data_dir, output_dir=output_dir, variants=True)
+    out = capsys.readouterr().out
+    assert out.count("Variants of ") == 1
+    assert "Variants of overall/alpha_inside_occupancy.json: " in out
+
+
+def test_run_without_variants_removes_stale_ones(data_dir, output_dir, capsys):
+    main(clock=lambda: _PINNED, data_dir=data_dir, output_dir=output_dir, variants=True)
+    with (data_dir / "alpha_inside.csv").open("a", encoding="utf-8") as f:
+        f.write("16.07.2024,Tuesday,10:00,20\n")
+    _run(data_dir, output_dir)
+    overall = output_dir / "overall" / "alpha_inside_occupancy.json"
+    assert not overall.with_name(f"{overall.name}.gz").exists()
+    assert not (output_dir / "overall" / "alpha_inside_occupancy.min.json").exists()
+    # Variants of the outputs that did not change are still current and kept
+    assert (output_dir / "overall" / "beta_outside_occupancy.json.gz").exists()
+
+
+# --- memory ---
+
+def _write_history(path, weeks):
+    rng = random.Random(17)
+    start = date(2024, 7, 15) - timedelta(weeks=weeks)
+    with path.open("w", encoding="utf-8") as f:
+        f.write("Date,Day,Time,Occupancy\n")
+        for n in range(7 * weeks):
+            day = start + timedelta(days=n)
+            for hour in range(8, 21):
+                f.write(f"{day:%d.%m.%Y},{day:%A},{hour:02d}:15,{rng.randrange(100)}\n")
+
+
+def _process_pool_peak(tmp_path, weeks):
+    directory = tmp_path / str(weeks)
+    directory.mkdir()
+    _write_history(directory / "alpha_inside.csv", weeks)
+    pool_name, pool_cfg = next(iter_pools(load_pool_config(_FIXTURES / "config_snippet.json")))
+    tracemalloc.start()
+    try:
+        process_pool(pool_name, pool_cfg, directory, directory, "2024-07-15T14:30:00+02:00", _PINNED)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, (directory / "weekly" / "alpha_inside_occupancy.json").stat().st_size
+
+
+def test_weekly_map_is_not_held_in_memory(tmp_path, capsys):
+    # Weeks are streamed to disk, so the peak grows by less than the weekly
+    # file does; keeping every week object made it grow by over twice that
+    short_peak, short_size = _process_pool_peak(tmp_path, 10)
+    long_peak, long_size = _process_pool_peak(tmp_path, 50)
+    assert long_peak - short_peak < long_size - short_size
+
+
+def test_jobs_must_be_positive():
+    with pytest.raises(SystemExit):
+        entrypoint(["--jobs", "0"])
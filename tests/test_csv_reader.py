@@ -1,5 +1,6 @@
 from pathlib import Path
-from pool_aggregation.io.csv_reader import read_records
+from pool_aggregation.io import csv_reader
+from pool_aggregation.io.csv_reader import read_new_records, read_records
 from pool_aggregation.models.records import OccupancyRecord
 
 FIXTURE = Path(__file__).parent / "fixtures" / "sample_occupancy.csv"
@@ -29,3 +30,178 @@ def test_bad_row_skipped():
     records = read_records(FIXTURE)
     # "bad-line-missing-fields" should be silently skipped
     assert all(isinstance(r, OccupancyRecord) for r in records)
+
+
+# --- read_new_records ---
+
+def _write(path, data):
+    path.write_bytes(data)
+    return path
+
+
+def _append(path, data):
+    with path.open("ab") as f:
+        f.write(data)
+
+
+HEADER = b"Date,Day,Time,Occupancy\r\n"
+
+
+def test_first_read_matches_full_read():
+    records, checkpoint, restarted = read_new_records(FIXTURE)
+    assert records == read_records(FIXTURE)
+    assert checkpoint.offset == FIXTURE.stat().st_size
+    assert checkpoint.next_row == 6
+    assert not restarted
+
+
+def test_resume_returns_only_appended_rows(tmp_path):
+    path = _write(tmp_path / "pool.csv", HEADER + b"15.07.2024,Monday,14:15,42\r\n")
+    _, checkpoint, _ = read_new_records(path)
+    _append(path, b"15.07.2024,Monday,14:25,47\r\n")
+    records, checkpoint, restarted = read_new_records(path, checkpoint)
+    assert [r.occupancy for r in records] == [47]
+    assert checkpoint.offset == path.stat().st_size
+    assert checkpoint.next_row == 4
+    assert not restarted
+
+
+def test_unchanged_file_is_not_read(tmp_path):
+    path = _write(tmp_path / "pool.csv", HEADER + b"15.07.2024,Monday,14:15,42\r\n")
+    _, checkpoint, _ = read_new_records(path)
+    assert read_new_records(path, checkpoint) == ([], checkpoint, False)
+
+
+def test_unterminated_last_line_is_held_back(tmp_path):
+    path = _write(tmp_path / "pool.csv", HEADER + b"15.07.2024,Monday,14:15,42\r\n15.07.2024,Mon")
+    records, checkpoint, _ = read_new_records(path)
+    assert [r.occupancy for r in records] == [42]
+    _append(path, b"day,14:25,47\r\n")
+    records, _, _ = read_new_records(path, checkpoint)
+    assert [r.occupancy for r in records] == [47]
+
+
+def test_truncated_file_is_read_again(tmp_path):
+    path = _write(tmp_path / "pool.csv", HEADER + b"15.07.2024,Monday,14:15,42\r\n15.07.2024,Monday,14:25,47\r\n")
+    _, checkpoint, _ = read_new_records(path)
+    with path.open("r+b") as f:
+        f.truncate(len(HEADER) + 28)
+    records, _, restarted = read_new_records(path, checkpoint)
+    assert restarted
+    assert [r.occupancy for r in records] == [42]
+
+
+def test_rewritten_file_is_read_again(tmp_path):
+    path = _write(tmp_path / "pool.csv", HEADER + b"15.07.2024,Monday,14:15,42\r\n")
+    _, checkpoint, _ = read_new_records(path)
+    with path.open("r+b") as f:   # same inode, edited in place and grown
+        f.write(HEADER + b"15.07.2024,Monday,14:15,24\r\n15.07.2024,Monday,14:25,47\r\n")
+    records, _, restarted = read_new_records(path, checkpoint)
+    assert restarted
+    assert [r.occupancy for r in records] == [24, 47]
+
+
+def test_header_is_mapped_by_name(tmp_path):
+    path = _write(tmp_path / "pool.csv", b"occupancy,TIME,Day,date\n42,14:15,Monday,15.07.2024\n")
+    [record] = read_records(path)
+    assert (record.date_str, record.time_str, record.occupancy) == ("15.07.2024", "14:15", 42)
+
+
+def test_sidecar_matches_full_read(tmp_path):
+    path = _write(tmp_path / "pool.csv", FIXTURE.read_bytes())
+    cache = tmp_path / "cache"
+    assert read_records(path, cache_dir=cache) == read_records(path)
+    assert (cache / "pool.csv.rec").exists()
+    assert read_records(path, cache_dir=cache) == read_records(path)
+
+
+def test_sidecar_is_extended_when_csv_grows(tmp_path):
+    path = _write(tmp_path / "pool.csv", HEADER + b"15.07.2024,Monday,14:15,42\r\n15.07.2024,Mon")
+    cache = tmp_path / "cache"
+    assert [r.occupancy for r in read_records(path, cache_dir=cache)] == [42]
+    _append(path, b"day,14:25,47\r\n")
+    assert [r.occupancy for r in read_records(path, cache_dir=cache)] == [42, 47]
+
+
+def test_sidecar_ignored_after_out_of_band_edit(tmp_path):
+    path = _write(tmp_path / "pool.csv", HEADER + b"15.07.2024,Monday,14:15,42\r\n")
+    cache = tmp_path / "cache"
+    read_records(path, cache_dir=cache)
+    with path.open("r+b") as f:
+        f.write(HEADER + b"15.07.2024,Monday,14:15,24\r\n")
+    assert [r.occupancy for r in read_records(path, cache_dir=cache)] == [24]
+
+
+def test_corrupt_sidecar_is_rebuilt(tmp_path):
+    path = _write(tmp_path / "pool.csv", HEADER + b"15.07.2024,Monday,14:15,42\r\n")
+    cache = tmp_path / "cache"
+    cache.mkdir()
+    (cache / "pool.csv.rec").write_bytes(b"garbage")
+    assert [r.occupancy for r in read_records(path, cache_dir=cache)] == [42]
+    assert read_records(path, cache_dir=cache) == read_records(path)
+
+
+def test_same_size_edit_past_the_head_is_noticed(tmp_path):
+    rows = b"".join(b"15.07.2024,Monday,%02d:%02d,10\r\n" % (6 + i // 60, i % 60) for i in range(960))
+    path = _write(tmp_path / "pool.csv", HEADER + rows)
+    _, checkpoint, _ = read_new_records(path)
+    data = path.read_bytes()
+    edit = data.index(b"15.07.2024,Monday,14:00,10")
+    assert 4096 < edit < len(data) - 256
+    with path.open("r+b") as f:     # same inode and size, only the mtime moves
+        f.seek(edit)
+        f.write(b"15.07.2024,Monday,14:00,99")
+    records, _, restarted = read_new_records(path, checkpoint)
+    assert restarted
+    assert [r.occupancy for r in records if r.time_str == "14:00"] == [99]
+
+
+def test_sidecar_ignored_after_same_size_edit_mid_file(tmp_path):
+    rows = b"".join(b"15.07.2024,Monday,%02d:%02d,10\r\n" % (6 + i // 60, i % 60) for i in range(960))
+    path = _write(tmp_path / "pool.csv", HEADER + rows)
+    cache = tmp_path / "cache"
+    read_records(path, cache_dir=cache)
+    data = path.read_bytes()
+    edit = data.index(b"15.07.2024,Monday,14:00,10")
+    with path.open("r+b") as f:
+        f.seek(edit)
+        f.write(b"15.07.2024,Monday,14:00,99")
+    records = read_records(path, cache_dir=cache)
+    assert records == read_records(path)
+    assert [r.occupancy for r in records if r.time_str == "14:00"] == [99]
+
+
+def _rows(start, count, occupancy=10):
+    return b"".join(b"15.07.2024,Monday,%02d:%02d,%02d\r\n" % (6 + i // 60, i % 60, occupancy)
+                    for i in range(start, start + count))
+
+
+def test_block_digests_of_a_resume_match_a_full_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(csv_reader, "_BLOCK", 16)     # shorter than the header line
+    path = _write(tmp_path / "pool.csv", HEADER + _rows(0, 20))
+    _, checkpoint, _ = read_new_records(path)
+    for start in range(20, 100, 7):
+        _append(path, _rows(start, 7))
+        _, checkpoint, _ = read_new_records(path, checkpoint)
+    _, full, _ = read_new_records(path)
+    assert len(full.blocks) == path.stat().st_size // 16
+    assert (checkpoint.blocks, checkpoint.tail) == (full.blocks, full.tail)
+
+
+def test_same_size_edit_in_an_unsampled_block_is_noticed_on_a_later_resume(tmp_path, monkeypatch):
+    monkeypatch.setattr(csv_reader, "_BLOCK", 256)
+    path = _write(tmp_path / "pool.csv", HEADER + _rows(0, 100))
+    _, checkpoint, _ = read_new_records(path)
+    data = path.read_bytes()
+    edit = data.index(b"15.07.2024,Monday,06:40,10")
+    assert 256 < edit < (len(checkpoint.blocks) - 1) * 256
+    with path.open("r+b") as f:
+        f.seek(edit)
+        f.write(b"15.07.2024,Monday,06:40,99")
+    for start in range(100, 100 + len(checkpoint.blocks)):
+        _append(path, _rows(start, 1))
+        records, checkpoint, restarted = read_new_records(path, checkpoint)
+        if restarted:
+            break
+    assert restarted
+    assert [r.occupancy for r in records if r.time_str == "06:40"] == [99]
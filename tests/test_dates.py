@@ -0,0 +1,45 @@
+import pytest
+
+from pool_aggregation.utils import dates
+from pool_aggregation.utils.dates import date_info
+from pool_aggregation.utils.timezones import hour_start, to_iso8601
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    dates.clear_cache()
+    yield
+    dates.clear_cache()
+
+
+def test_date_facts():
+    info = date_info("15.7.2024")
+    assert info.week_id == "2024-07-15"
+    assert info.weekday == "Monday"
+    assert date_info("21.7.2024").week_id == "2024-07-15"
+    assert date_info("22.7.2024").ordinal == info.ordinal + 7
+
+
+@pytest.mark.parametrize("date_str", ["31.3.2024", "27.10.2024", "15.1.2024", "15.07.2024"])
+def test_hour_iso_matches_timezone_helpers_across_dst(date_str):
+    info = date_info(date_str)
+    for hour in range(24):
+        assert info.hour_iso(hour) == to_iso8601(hour_start(date_str, hour))
+    assert date_info("27.10.2024").hour_iso(3).endswith("+01:00")
+
+
+def test_each_date_is_parsed_once():
+    date_info("15.7.2024")
+    date_info("15.7.2024")
+    info = dates.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+    assert info.maxsize is not None
+
+
+def test_invalid_dates_raise():
+    with pytest.raises(ValueError):
+        date_info("31.2.2024")
+    with pytest.raises(ValueError):
+        date_info("not a date")
+    with pytest.raises(ValueError):
+        date_info("15.7.2024").hour_iso(24)
@@ -0,0 +1,67 @@
+"""DOM-free page text extraction must find what BeautifulSoup.get_text() finds."""
+import re
+from pathlib import Path
+
+import pytest
+from bs4 import BeautifulSoup
+
+from occupancy import find_matches, find_occupancy, find_today_closed_status, html_to_text
+from pool_aggregation.config import load_pool_config
+
+PAGES = Path(__file__).parent / "fixtures" / "pages"
+_CFG = {c["name"]: c for c in load_pool_config(Path(__file__).parent.parent / "data" / "pool_occupancy_config.json")}
+
+# (fixture page, pool whose patterns apply to it, expected occupancy)
+CASES = [
+    ("kravi_hora_inside.html", "Kraví Hora (vnitřní)", 42),
+    ("kravi_hora_outside.html", "Kraví Hora (venkovní)", 1),
+    ("koupaliste_dobrak.html", "Koupaliště Dobrák", 1536),
+    ("koupaliste_dobrak_closed.html", "Koupaliště Dobrák", 0),
+    ("starez.html", "Koupaliště Riviéra", 875),
+    ("starez.html", "Koupaliště Zábrdovice", 875),
+    ("starez.html", "Aquapark Kohoutovice", 87),
+    ("starez.html", "Bazény Lužánky", 55),
+]
+
+
+def _read(name):
+    return (PAGES / name).read_text(encoding="utf-8")
+
+
+def _patterns(pool_name):
+    cfg = _CFG[pool_name]
+    return [cfg["pattern"], cfg.get("todayClosedPattern")]
+
+
+@pytest.mark.parametrize("page", sorted(p.name for p in PAGES.glob("*.html")))
+def test_text_matches_beautifulsoup(page):
+    html = _read(page)
+    assert html_to_text(html) == BeautifulSoup(html, "html.parser").get_text()
+
+
+@pytest.mark.parametrize("page,pool_name,_", CASES)
+def test_matches_equal_beautifulsoup_search(page, pool_name, _):
+    html = _read(page)
+    reference_text = BeautifulSoup(html, "html.parser").get_text()
+    for pattern, match in zip(_patterns(pool_name), find_matches(html, _patterns(pool_name))):
+        expected = re.search(pattern, reference_text, re.IGNORECASE) if pattern else None
+        assert (match and (match.span(), match.groups())) == (expected and (expected.span(), expected.groups()))
+
+
+@pytest.mark.parametrize("page,pool_name,occupancy", CASES)
+def test_find_occupancy(page, pool_name, occupancy):
+    assert find_occupancy(_read(page), _CFG[pool_name]["pattern"]) == occupancy
+
+
+def test_today_closed_detected():
+    pattern = _CFG["Koupaliště Dobrák"]["todayClosedPattern"]
+    assert find_today_closed_status(_read("koupaliste_dobrak_closed.html"), pattern) is True
+    assert find_today_closed_status(_read("koupaliste_dobrak.html"), pattern) is False
+
+
+def test_no_pattern_never_matches():
+    assert find_matches(_read("starez.html"), [None, ""]) == [None, None]
+
+
+def test_empty_page_has_no_matches():
+    assert find_matches("", [r"(\d+)"]) == [None]
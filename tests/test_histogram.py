@@ -0,0 +1,44 @@
+import statistics
+
+import pytest
+
+from pool_aggregation.utils.histogram import RateHistogram
+
+
+def test_median_matches_statistics():
+    rates = [3.0, 0.25, 40.0, 40.0, 7.0, 112.0]
+    for n in range(1, len(rates) + 1):
+        assert RateHistogram(rates[:n]).median() == statistics.median(rates[:n])
+
+
+def test_percentiles_interpolate_between_ranks():
+    histogram = RateHistogram([10.0, 20.0, 30.0, 40.0, 50.0])
+    assert histogram.percentile(0) == 10
+    assert histogram.percentile(75) == 40
+    assert histogram.percentile(90) == 46
+    assert histogram.percentile(100) == 50
+    assert RateHistogram([10.0, 20.0]).percentile(50) == 15
+
+
+def test_merged_histograms_count_all_rates():
+    merged = RateHistogram([10.0, 20.0])
+    merged.update(RateHistogram([20.0, 90.0, 90.0]))
+    assert merged.counts == {10.0: 1, 20.0: 2, 90.0: 2}
+    assert merged.median() == 20
+
+
+def test_invalid_percentile_rejected():
+    with pytest.raises(ValueError):
+        RateHistogram([1.0]).percentile(101)
+    with pytest.raises(ValueError):
+        RateHistogram().median()
+
+
+def test_rates_can_be_taken_out():
+    histogram = RateHistogram([10.0, 20.0, 20.0])
+    histogram.add(20.0, -1)
+    histogram.add(10.0, -1)
+    assert histogram.counts == {20.0: 1}
+    assert histogram.total == 1
+    with pytest.raises(ValueError):
+        histogram.add(10.0, -1)
@@ -0,0 +1,273 @@
+import http.client
+import http.server
+import logging
+import os
+import threading
+import time
+
+import pytest
+
+import http_utils
+from http_utils import HTTPStatusError, Response
+
+DOMAIN = "https://pool.example"
+PAGE = f"{DOMAIN}/page"
+
+
+class FakeGet:
+    """Stands in for ``_get``; records calls and replays scripted outcomes."""
+
+    def __init__(self, *outcomes, gate=None):
+        self.outcomes = list(outcomes)
+        self.gate = gate
+        self.calls = []
+
+    def __call__(self, url, headers=None):
+        self.calls.append((url, dict(headers or {})))
+        if self.gate is not None:
+            self.gate.wait(5)
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def _response(body: str = "", status: int = 200, **headers) -> Response:
+    message = http.client.HTTPMessage()
+    for name, value in headers.items():
+        message[name.replace("_", "-")] = value
+    data = body.encode("utf-8")
+    return Response(url=PAGE, status=status, reason="OK", headers=message, body=data, wire_bytes=len(data))
+
+
+DISALLOW_PAGE = _response("User-agent: *\nDisallow: /page\n")
+ALLOW_ALL = _response("User-agent: *\nDisallow:\n")
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch, tmp_path):
+    monkeypatch.setattr(http_utils, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(http_utils, "_http_pruned_at", None)
+    http_utils._robots_cache.clear()
+    yield
+    _join_refreshes()
+    http_utils._robots_cache.clear()
+
+
+def _use(monkeypatch, fake):
+    monkeypatch.setattr(http_utils, "_get", fake)
+    return fake
+
+
+def _join_refreshes():
+    for thread in threading.enumerate():
+        if thread.name.startswith("robots-"):
+            thread.join(5)
+
+
+def _cache_robots(lines, age):
+    """Put a robots.txt fetched *age* seconds ago in the disk cache only."""
+    http_utils._write_json_atomic(http_utils._cache_path("robots", DOMAIN), {
+        "domain": DOMAIN,
+        "fetchedAt": time.time() - age,
+        "lines": lines,
+    })
+
+
+def test_robots_is_reused_within_the_ttl(monkeypatch):
+    fake = _use(monkeypatch, FakeGet(DISALLOW_PAGE))
+    assert not http_utils.can_fetch(PAGE)
+    assert http_utils.can_fetch(f"{DOMAIN}/other")
+    # A new process reads it back from the disk cache
+    http_utils._robots_cache.clear()
+    assert not http_utils.can_fetch(PAGE)
+    assert len(fake.calls) == 1
+
+
+def test_stale_robots_is_served_while_refreshed_in_background(monkeypatch):
+    _cache_robots(["User-agent: *", "Disallow: /page"], age=http_utils._ROBOTS_TTL + 60)
+    gate = threading.Event()
+    fake = _use(monkeypatch, FakeGet(ALLOW_ALL, gate=gate))
+    assert not http_utils.can_fetch(PAGE)
+    # Only one refresh runs however many calls see the stale copy
+    assert not http_utils.can_fetch(PAGE)
+    gate.set()
+    _join_refreshes()
+    assert len(fake.calls) == 1
+    assert http_utils.can_fetch(PAGE)
+    assert time.time() - http_utils._robots_cache[DOMAIN].fetched_at < 60
+
+
+def test_failed_refresh_is_retried_on_the_next_call(monkeypatch):
+    _cache_robots(["User-agent: *", "Disallow: /page"], age=http_utils._ROBOTS_TTL + 60)
+    fake = _use(monkeypatch, FakeGet(ConnectionRefusedError("refused"), ALLOW_ALL))
+    assert not http_utils.can_fetch(PAGE)
+    _join_refreshes()
+    assert not http_utils._robots_cache[DOMAIN].refreshing
+    assert not http_utils.can_fetch(PAGE)
+    _join_refreshes()
+    assert len(fake.calls) == 2
+    assert http_utils.can_fetch(PAGE)
+
+
+def test_expired_robots_is_used_when_the_download_fails(monkeypatch, caplog):
+    _cache_robots(["User-agent: *", "Disallow: /page"],
+                  age=http_utils._ROBOTS_TTL + http_utils._ROBOTS_STALE_TTL + 60)
+    _use(monkeypatch, FakeGet(ConnectionRefusedError("refused")))
+    with caplog.at_level(logging.WARNING):
+        assert not http_utils.can_fetch(PAGE)
+    assert "Using expired robots.txt" in caplog.text
+    assert "assuming allowed" not in caplog.text
+
+
+def test_unreachable_robots_without_a_copy_allows(monkeypatch, caplog):
+    _use(monkeypatch, FakeGet(ConnectionRefusedError("refused")))
+    with caplog.at_level(logging.WARNING):
+        assert http_utils.can_fetch(PAGE)
+    assert "assuming allowed" in caplog.text
+
+
+def test_missing_robots_is_cached_as_allow_all(monkeypatch):
+    fake = _use(monkeypatch, FakeGet(HTTPStatusError(f"{DOMAIN}/robots.txt", 404, "Not Found")))
+    assert http_utils.can_fetch(PAGE)
+    assert http_utils.can_fetch(PAGE)
+    assert len(fake.calls) == 1
+
+
+def test_concurrent_checks_share_one_download(monkeypatch):
+    gate = threading.Event()
+    fake = _use(monkeypatch, FakeGet(DISALLOW_PAGE, gate=gate))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(http_utils.can_fetch(PAGE))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [False] * 8
+    assert len(fake.calls) == 1
+
+
+# --- conditional GET ---
+
+@pytest.fixture()
+def allowed(monkeypatch):
+    monkeypatch.setattr(http_utils, "can_fetch", lambda url: True)
+
+
+def test_validators_are_sent_back_and_304_serves_the_cache(monkeypatch, allowed):
+    fake = _use(monkeypatch, FakeGet(
+        _response("<html>v1</html>", ETag='"abc"', Last_Modified="Mon, 15 Jul 2024 12:00:00 GMT"),
+        _response(status=304),
+    ))
+    assert http_utils.fetch_page(PAGE) == http_utils.Page("<html>v1</html>", changed=True)
+    assert http_utils.fetch_page(PAGE) == http_utils.Page("<html>v1</html>", changed=False)
+    assert [headers for _, headers in fake.calls] == [{}, {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Mon, 15 Jul 2024 12:00:00 GMT",
+    }]
+
+
+def test_changed_page_replaces_the_cached_one(monkeypatch, allowed):
+    fake = _use(monkeypatch, FakeGet(
+        _response("v1", Last_Modified="Mon, 15 Jul 2024 12:00:00 GMT"),
+        _response("v2", Last_Modified="Mon, 15 Jul 2024 13:00:00 GMT"),
+        _response(status=304),
+    ))
+    http_utils.fetch_page(PAGE)
+    assert http_utils.fetch_page(PAGE) == http_utils.Page("v2", changed=True)
+    assert http_utils.fetch_page(PAGE) == http_utils.Page("v2", changed=False)
+    assert fake.calls[1][1] == {"If-Modified-Since": "Mon, 15 Jul 2024 12:00:00 GMT"}
+    assert fake.calls[2][1] == {"If-Modified-Since": "Mon, 15 Jul 2024 13:00:00 GMT"}
+
+
+def test_page_without_validators_is_not_cached(monkeypatch, allowed):
+    fake = _use(monkeypatch, FakeGet(_response("v1", ETag='"abc"'), _response("v2"), _response("v3")))
+    http_utils.fetch_page(PAGE)
+    assert http_utils.fetch_page(PAGE) == http_utils.Page("v2", changed=True)
+    assert http_utils.fetch_page(PAGE) == http_utils.Page("v3", changed=True)
+    assert fake.calls[2][1] == {}
+    assert not http_utils._cache_path("http", PAGE).exists()
+
+
+def _cache_page(url, age):
+    """Put a page last used *age* seconds ago in the disk cache."""
+    path = http_utils._cache_path("http", url)
+    http_utils._write_json_atomic(path, {"url": url, "etag": '"old"', "lastModified": None, "body": "old"})
+    os.utime(path, (time.time() - age,) * 2)
+    return path
+
+
+def test_pages_not_used_for_the_ttl_are_pruned(monkeypatch, allowed):
+    _use(monkeypatch, FakeGet(_response("v1", ETag='"abc"')))
+    expired = _cache_page(f"{DOMAIN}/rozpis?from=2024-07-01", http_utils._HTTP_CACHE_TTL + 60)
+    recent = _cache_page(f"{DOMAIN}/rozpis?from=2024-07-15", http_utils._HTTP_CACHE_TTL - 60)
+    http_utils.fetch_page(PAGE)
+    assert not expired.exists()
+    assert recent.exists()
+    assert http_utils._cache_path("http", PAGE).exists()
+
+
+def test_not_modified_page_is_kept_from_pruning(monkeypatch, allowed):
+    path = _cache_page(PAGE, http_utils._HTTP_CACHE_TTL - 60)
+    _use(monkeypatch, FakeGet(_response(status=304)))
+    assert http_utils.fetch_page(PAGE) == http_utils.Page("old", changed=False)
+    assert time.time() - path.stat().st_mtime < 60
+
+
+def test_cache_is_pruned_once_per_interval(monkeypatch, allowed):
+    _use(monkeypatch, FakeGet(_response("v1", ETag='"abc"')))
+    http_utils.fetch_page(PAGE)
+    expired = _cache_page(f"{DOMAIN}/old", http_utils._HTTP_CACHE_TTL + 60)
+    http_utils.fetch_page(PAGE)
+    assert expired.exists()
+    monkeypatch.setattr(http_utils, "_http_pruned_at", time.monotonic() - http_utils._HTTP_PRUNE_INTERVAL)
+    http_utils.fetch_page(PAGE)
+    assert not expired.exists()
+
+
+def test_blocked_or_failed_fetch_returns_none(monkeypatch):
+    _use(monkeypatch, FakeGet(DISALLOW_PAGE))
+    assert http_utils.fetch_page(PAGE) is None
+    monkeypatch.setattr(http_utils, "can_fetch", lambda url: True)
+    _use(monkeypatch, FakeGet(ConnectionRefusedError("refused")))
+    assert http_utils.fetch_page(PAGE) is None
+
+
+class _EtagHandler(http.server.BaseHTTPRequestHandler):
+    """Serves one page with an ETag and answers a matching If-None-Match with 304."""
+
+    seen = []
+
+    def do_GET(self):
+        self.seen.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("ETag", '"v1"')
+            self.end_headers()
+            return
+        body = "<html>pool</html>".encode("utf-8")
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_conditional_get_against_a_server(monkeypatch, allowed):
+    _EtagHandler.seen = []
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _EtagHandler)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    monkeypatch.setattr(http_utils, "_http", http_utils.ConnectionPool())
+    url = f"http://127.0.0.1:{server.server_address[1]}/page"
+    try:
+        assert http_utils.fetch_page(url) == http_utils.Page("<html>pool</html>", changed=True)
+        assert http_utils.fetch_page(url) == http_utils.Page("<html>pool</html>", changed=False)
+    finally:
+        http_utils._http.close()
+        server.shutdown()
+        server.server_close()
+    assert _EtagHandler.seen == [None, '"v1"']
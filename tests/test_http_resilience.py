@@ -0,0 +1,156 @@
+import socket
+import threading
+
+import pytest
+
+import http_utils
+from http_utils import CircuitOpenError, HTTPStatusError
+
+
+class FakePool:
+    """Stands in for the shared ConnectionPool; replays scripted outcomes."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def get(self, url, headers=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch, tmp_path):
+    monkeypatch.setattr(http_utils, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(http_utils.time, "sleep", lambda seconds: None)
+    http_utils._host_health.clear()
+    yield
+    http_utils._host_health.clear()
+
+
+def _use(monkeypatch, pool):
+    monkeypatch.setattr(http_utils, "_http", pool)
+    return pool
+
+
+def test_transient_error_is_retried(monkeypatch):
+    pool = _use(monkeypatch, FakePool(socket.timeout("timed out"), "ok"))
+    assert http_utils._get("https://pool.example/page") == "ok"
+    assert pool.calls == 2
+    assert http_utils.get_host_health("pool.example").consecutive_failures == 0
+
+
+def test_client_error_is_not_retried(monkeypatch):
+    pool = _use(monkeypatch, FakePool(HTTPStatusError("u", 404, "Not Found")))
+    with pytest.raises(HTTPStatusError):
+        http_utils._get("https://pool.example/missing")
+    assert pool.calls == 1
+    assert http_utils.get_host_health("pool.example").failures == 0
+
+
+def test_circuit_opens_after_consecutive_failures(monkeypatch):
+    pool = _use(monkeypatch, FakePool(ConnectionRefusedError("refused")))
+    for _ in range(http_utils._BREAKER_THRESHOLD):
+        with pytest.raises(ConnectionRefusedError):
+            http_utils._get("https://down.example/")
+    calls = pool.calls
+    # Retries are spent on the first request only; the others fail fast
+    assert calls == http_utils._RETRIES_PER_TICK + http_utils._BREAKER_THRESHOLD
+
+    with pytest.raises(CircuitOpenError):
+        http_utils._get("https://down.example/")
+    assert pool.calls == calls
+
+
+def test_circuit_state_survives_a_new_process(monkeypatch):
+    _use(monkeypatch, FakePool(ConnectionRefusedError("refused")))
+    for _ in range(http_utils._BREAKER_THRESHOLD):
+        with pytest.raises(ConnectionRefusedError):
+            http_utils._get("https://down.example/")
+
+    http_utils._host_health.clear()
+    pool = _use(monkeypatch, FakePool("ok"))
+    with pytest.raises(CircuitOpenError):
+        http_utils._get("https://down.example/")
+    assert pool.calls == 0
+
+
+def test_half_open_trial_success_closes_circuit(monkeypatch):
+    health = http_utils.get_host_health("flaky.example")
+    health.consecutive_failures = http_utils._BREAKER_THRESHOLD
+    health.trips = 1
+    pool = _use(monkeypatch, FakePool("ok"))
+    assert http_utils._get("https://flaky.example/") == "ok"
+    assert pool.calls == 1
+    assert not health.is_half_open and health.trips == 0
+
+
+def test_half_open_trial_failure_doubles_cooldown(monkeypatch):
+    health = http_utils.get_host_health("flaky.example")
+    health.consecutive_failures = http_utils._BREAKER_THRESHOLD
+    health.trips = 1
+    pool = _use(monkeypatch, FakePool(ConnectionResetError("reset")))
+    with pytest.raises(ConnectionResetError):
+        http_utils._get("https://flaky.example/")
+    assert pool.calls == 1
+    assert health.trips == 2
+    assert health.open_until - http_utils.time.time() > http_utils._BREAKER_COOLDOWN
+
+
+def test_retries_are_capped_per_tick(monkeypatch):
+    timeout = socket.timeout("timed out")
+    pool = _use(monkeypatch, FakePool(timeout, timeout, "ok", timeout))
+    assert http_utils._get("https://slow.example/a") == "ok"
+    with pytest.raises(socket.timeout):
+        http_utils._get("https://slow.example/b")
+    assert pool.calls == 4
+    # The next tick gets its retries back
+    health = http_utils.get_host_health("slow.example")
+    health.tick_start -= http_utils._TICK
+    pool = _use(monkeypatch, FakePool(socket.timeout("timed out"), "ok"))
+    assert http_utils._get("https://slow.example/c") == "ok"
+    assert pool.calls == 2
+
+
+def test_half_open_allows_a_single_trial(monkeypatch):
+    health = http_utils.get_host_health("flaky.example")
+    health.consecutive_failures = http_utils._BREAKER_THRESHOLD
+    health.trips = 1
+    started, release = threading.Event(), threading.Event()
+
+    class SlowPool(FakePool):
+        def get(self, url, headers=None):
+            started.set()
+            release.wait(5)
+            return super().get(url, headers)
+
+    pool = _use(monkeypatch, SlowPool("ok"))
+    trial = threading.Thread(target=http_utils._get, args=("https://flaky.example/a",))
+    trial.start()
+    assert started.wait(5)
+    with pytest.raises(CircuitOpenError):
+        http_utils._get("https://flaky.example/b")
+    release.set()
+    trial.join(5)
+    assert pool.calls == 1
+    assert http_utils._get("https://flaky.example/b") == "ok"
+
+
+def test_health_is_written_only_when_it_changes(monkeypatch):
+    writes = []
+    monkeypatch.setattr(http_utils, "_write_json_atomic", lambda path, data: writes.append(data))
+    _use(monkeypatch, FakePool("ok"))
+    for _ in range(5):
+        http_utils._get("https://pool.example/page")
+    assert len(writes) == 1
+    _use(monkeypatch, FakePool(HTTPStatusError("u", 503, "Unavailable")))
+    with pytest.raises(HTTPStatusError):
+        http_utils._get("https://pool.example/page")
+    assert writes[-1]["consecutiveFailures"] == 1
+    _use(monkeypatch, FakePool("ok"))
+    http_utils._get("https://pool.example/page")
+    http_utils._get("https://pool.example/page")
+    assert [w["consecutiveFailures"] for w in writes] == [0, 1, 0]
@@ -0,0 +1,111 @@
+"""Incremental aggregation must produce the same bytes as a full rebuild."""
+from __future__ import annotations
+import shutil
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from pool_aggregation.aggregation import incremental
+from pool_aggregation.cli import main
+from pool_aggregation.io.capacity_reader import clear_cache
+
+PRAGUE = ZoneInfo("Europe/Prague")
+_PINNED = datetime(2024, 7, 16, 9, 30, 0, tzinfo=PRAGUE)
+_FIXTURES = Path(__file__).parent / "fixtures"
+_POOLS = ["alpha_inside.csv", "alpha_outside.csv", "beta_outside.csv"]
+
+
+@pytest.fixture()
+def data_dir(tmp_path):
+    (tmp_path / "pool_occupancy_config.json").write_text(
+        (_FIXTURES / "config_snippet.json").read_text(encoding="utf-8"),
+        encoding="utf-8",
+    )
+    for name in _POOLS:
+        shutil.copy(_FIXTURES / "sample_occupancy.csv", tmp_path / name)
+    return tmp_path
+
+
+@pytest.fixture(autouse=True)
+def _fresh_state():
+    clear_cache()
+    incremental.clear_memory()
+    yield
+    clear_cache()
+    incremental.clear_memory()
+
+
+def _append(data_dir, rows):
+    for name in _POOLS:
+        with (data_dir / name).open("a", newline="") as f:
+            f.writelines(row + "\r\n" for row in rows)
+
+
+def _assert_same_as_full(data_dir):
+    main(clock=lambda: _PINNED, data_dir=data_dir, output_dir=data_dir / "full")
+    main(clock=lambda: _PINNED, data_dir=data_dir, output_dir=data_dir / "inc", incremental=True)
+    files = sorted((data_dir / "full").rglob("*.json"))
+    assert files
+    for path in files:
+        assert path.read_bytes() == (data_dir / "inc" / path.relative_to(data_dir / "full")).read_bytes()
+
+
+def test_first_run_matches_full_rebuild(data_dir):
+    _assert_same_as_full(data_dir)
+
+
+def test_appended_rows_are_folded_in(data_dir):
+    _assert_same_as_full(data_dir)
+    _append(data_dir, ["16.07.2024,Tuesday,09:20,30", "22.07.2024,Monday,06:10,3"])
+    _assert_same_as_full(data_dir)
+
+
+def test_state_survives_restart(data_dir):
+    _assert_same_as_full(data_dir)
+    incremental.clear_memory()
+    _append(data_dir, ["16.07.2024,Tuesday,09:05,12"])
+    _assert_same_as_full(data_dir)
+    assert (data_dir / ".cache" / "aggregation" / "alpha_inside.csv.json").exists()
+
+
+def test_rewritten_csv_triggers_rebuild(data_dir):
+    _assert_same_as_full(data_dir)
+    for name in _POOLS:
+        path = data_dir / name
+        path.write_text(path.read_text().replace(",42", ",24"))
+    _assert_same_as_full(data_dir)
+
+
+def test_truncated_csv_triggers_rebuild(data_dir):
+    _append(data_dir, ["16.07.2024,Tuesday,09:20,30"])
+    _assert_same_as_full(data_dir)
+    for name in _POOLS:
+        shutil.copy(_FIXTURES / "sample_occupancy.csv", data_dir / name)
+    _assert_same_as_full(data_dir)
+
+
+def test_unchanged_csv_does_not_rewrite_state(data_dir):
+    main(clock=lambda: _PINNED, data_dir=data_dir, output_dir=data_dir, incremental=True)
+    state = data_dir / ".cache" / "aggregation" / "alpha_inside.csv.json"
+    mtime = state.stat().st_mtime_ns
+    main(clock=lambda: _PINNED, data_dir=data_dir, output_dir=data_dir, incremental=True)
+    assert state.stat().st_mtime_ns == mtime
+
+
+def test_in_place_edit_mid_file_triggers_rebuild(data_dir):
+    rows = [f"17.07.2024,Wednesday,{6 + i // 60:02d}:{i % 60:02d},10" for i in range(960)]
+    _append(data_dir, rows)
+    _assert_same_as_full(data_dir)
+    for name in _POOLS:
+        path = data_dir / name
+        data = path.read_bytes()
+        edit = data.index(b"17.07.2024,Wednesday,14:00,10")
+        assert 4096 < edit < len(data) - 256
+        with path.open("r+b") as f:
+            f.seek(edit)
+            f.write(b"17.07.2024,Wednesday,14:00,99")
+    # The full build must not answer from its own parse cache either
+    shutil.rmtree(data_dir / ".cache" / "records")
+    _assert_same_as_full(data_dir)
@@ -1,6 +1,13 @@
 import json
+import os
+import stat
+import sys
+import tracemalloc
 from pathlib import Path
-from pool_aggregation.io.json_writer import write_json
+
+import pytest
+
+from pool_aggregation.io.json_writer import StreamedMap, write_bytes_atomic, write_json
 
 
 def test_roundtrip(tmp_path):
@@ -32,3 +39,72 @@ def test_creates_parent_dirs(tmp_path):
     out = tmp_path / "nested" / "deep" / "out.json"
     write_json(out, {"x": 1})
     assert out.exists()
+
+
+def test_streamed_map_writes_same_bytes_as_dict(tmp_path):
+    weeks = {"2024-07-15": {"days": {"Monday": {"hours": {"14": {"name": "Kraví Hora"}}}}}, "2024-07-22": {"days": {}}}
+    write_json(tmp_path / "dict.json", {"a": 1, "weeks": weeks, "b": [1, 2]})
+    write_json(tmp_path / "streamed.json", {"a": 1, "weeks": StreamedMap(iter(weeks.items())), "b": [1, 2]})
+    assert (tmp_path / "streamed.json").read_bytes() == (tmp_path / "dict.json").read_bytes()
+
+
+def test_empty_streamed_map(tmp_path):
+    write_json(tmp_path / "dict.json", {"weeks": {}})
+    write_json(tmp_path / "streamed.json", {"weeks": StreamedMap(iter(()))})
+    assert (tmp_path / "streamed.json").read_bytes() == (tmp_path / "dict.json").read_bytes()
+
+
+def test_unchanged_file_is_not_rewritten(tmp_path):
+    out = tmp_path / "out.json"
+    assert write_json(out, {"x": 1})
+    mtime = out.stat().st_mtime_ns
+    assert not write_json(out, {"x": 1})
+    assert out.stat().st_mtime_ns == mtime
+    assert write_json(out, {"x": 2})
+    assert json.loads(out.read_text(encoding="utf-8")) == {"x": 2}
+    assert [p.name for p in tmp_path.iterdir()] == ["out.json"]
+
+
+def test_ignored_keys_do_not_count_as_changes(tmp_path):
+    out = tmp_path / "out.json"
+    write_json(out, {"generatedAt": "2024-07-15T14:30:00+02:00", "data": {"generatedAt": 1}})
+    assert not write_json(out, {"generatedAt": "2024-07-15T14:40:00+02:00", "data": {"generatedAt": 1}}, ["generatedAt"])
+    assert "14:30" in out.read_text(encoding="utf-8")
+    assert write_json(out, {"generatedAt": "2024-07-15T14:40:00+02:00", "data": {"generatedAt": 2}}, ["generatedAt"])
+
+
+def test_ignored_key_last_or_moved(tmp_path):
+    out = tmp_path / "out.json"
+    write_json(out, {"data": [1, 2], "generatedAt": "a"})
+    assert not write_json(out, {"data": [1, 2], "generatedAt": "b, c"}, ["generatedAt"])
+    assert write_json(out, {"generatedAt": "b", "data": [1, 2]}, ["generatedAt"])
+
+
+def test_unchanged_streamed_file_is_compared_without_loading_it(tmp_path):
+    out = tmp_path / "out.json"
+
+    def payload(generated_at):
+        weeks = ((f"w{i}", {"hours": {str(h): {"rate": i * h} for h in range(24)}}) for i in range(1000))
+        return {"generatedAt": generated_at, "weeks": StreamedMap(weeks)}
+
+    write_json(out, payload("a"), ["generatedAt"])
+    tracemalloc.start()
+    try:
+        assert not write_json(out, payload("b"), ["generatedAt"])
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < out.stat().st_size / 4
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX permissions")
+def test_files_get_the_mode_of_the_current_umask(tmp_path):
+    previous = os.umask(0o027)
+    try:
+        write_json(tmp_path / "out.json", {"a": 1})
+        write_bytes_atomic(tmp_path / "out.bin", b"data")
+    finally:
+        os.umask(previous)
+    assert stat.S_IMODE((tmp_path / "out.json").stat().st_mode) == 0o640
+    assert stat.S_IMODE((tmp_path / "out.bin").stat().st_mode) == 0o640
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["out.bin", "out.json"]
@@ -1,4 +1,7 @@
-from pool_aggregation.aggregation.overall import build_overall_map
+import random
+
+from pool_aggregation.aggregation.overall import OverallRates, build_overall_map
+from pool_aggregation.utils.rounding import median_round, py_round, weighted_average
 
 
 def _week(day, hour_key, util):
@@ -250,3 +253,109 @@ def test_max_overall_values_two_weeks():
     # average of [30, 70] = 50; max across all slots = 50
     mov = build_overall_map(wmap)["maxOverallValues"]
     assert mov["averageUtilizationRate"] == 50
+
+
+# --- percentiles ---
+
+def test_percentiles_added_as_metrics():
+    wmap = {f"w{i}": _week("Monday", "14", rate) for i, rate in enumerate([10, 20, 30, 40, 50])}
+    result = build_overall_map(wmap, percentiles=[75, 90])
+    hour = result["days"]["Monday"]["hours"]["14"]
+    assert hour["p75UtilizationRate"] == 40
+    assert hour["p90UtilizationRate"] == 46
+    assert hour["medianUtilizationRate"] == 30
+    assert result["maxOverallValues"]["p90UtilizationRate"] == 46
+
+
+def test_percentiles_leave_other_metrics_unchanged():
+    wmap = _two_week_map(0.25, 66)
+    plain = build_overall_map(wmap)["days"]["Monday"]["hours"]["14"]
+    extended = build_overall_map(wmap, percentiles=[95])["days"]["Monday"]["hours"]["14"]
+    assert {m: extended[m] for m in plain} == plain
+
+
+# --- updating week by week ---
+
+def _pass(rates, wmap):
+    for wid, week in wmap.items():
+        rates.set_week(wid, week)
+    return rates.build()
+
+
+def test_changed_week_replaces_its_rates():
+    rates = OverallRates()
+    wmap = _two_week_map(60, 80)
+    _pass(rates, wmap)
+    wmap["2024-07-22"] = _week("Monday", "14", 20)
+    assert _pass(rates, wmap) == build_overall_map(wmap)
+    assert _pass(rates, wmap)["days"]["Monday"]["hours"]["14"]["averageUtilizationRate"] == 40
+
+
+def test_weeks_missing_from_a_pass_are_dropped():
+    rates = OverallRates()
+    wmap = {
+        "2024-07-15": _week("Monday", "14", 50),
+        "2024-07-22": _week("Tuesday", "9", 70),
+    }
+    _pass(rates, wmap)
+    del wmap["2024-07-15"]
+    assert _pass(rates, wmap) == build_overall_map(wmap)
+    assert list(_pass(rates, {})) == []
+
+
+def test_slot_order_follows_the_weekly_map():
+    rates = OverallRates()
+    wmap = {
+        "2024-07-15": _week("Monday", "14", 50),
+        "2024-07-22": _week("Monday", "9", 70),
+    }
+    _pass(rates, wmap)
+    # hour 9 now appears first, in the earlier week
+    wmap["2024-07-15"] = _week("Monday", "9", 30)
+    wmap["2024-07-29"] = _week("Monday", "14", 50)
+    assert list(_pass(rates, wmap)["days"]["Monday"]["hours"]) == ["9", "14"]
+
+
+def _baseline_hour(rates):
+    """Averages as build_overall_map always computed them: float sums in weekly map order."""
+    float_rates = [float(r) for r in rates]
+    return {
+        "averageUtilizationRate": py_round(sum(float_rates) / len(float_rates)),
+        "weightedAverageUtilizationRate": weighted_average(float_rates),
+        "medianUtilizationRate": median_round(float_rates),
+    }
+
+
+def _slot(rates):
+    wmap = {f"w{i}": _week("Monday", "14", rate) for i, rate in enumerate(rates)}
+    return build_overall_map(wmap)["days"]["Monday"]["hours"]["14"]
+
+
+def test_averages_round_as_float_sums_in_map_order():
+    # Ties in decimal that the float sums round down; the output keeps them
+    for rates in (
+        [67, 3, 50, 67, 5, 99, 0.33, 99, 7, 101, 67, 0.17, 33, 120, 99],
+        [0.29, 0],
+        [0.03, 0.17, 0.41, 0.29],
+        [99, 99, 5, 0.33, 0.17, 67, 7, 50, 2],
+    ):
+        assert _slot(rates) == _baseline_hour(rates)
+    assert _slot([0.29, 0])["averageUtilizationRate"] == 0.14
+
+
+def test_updated_slots_match_the_baseline_averages():
+    rng = random.Random(24)
+    values = [0, 0.03, 0.17, 0.29, 0.33, 0.41, 2, 5, 7, 33, 50, 67, 99, 101]
+    rates = OverallRates()
+    wmap = {}
+    for _ in range(300):
+        wid = f"2024-{rng.randrange(40):02d}"
+        if wid in wmap and rng.random() < 0.2:
+            del wmap[wid]
+        else:
+            wmap[wid] = _week("Monday", "14", rng.choice(values))
+        wmap = dict(sorted(wmap.items()))
+        result = _pass(rates, wmap)
+        if wmap:
+            expected = _baseline_hour([week["days"]["Monday"]["hours"]["14"]["utilizationRate"] for week in wmap.values()])
+            assert result["days"]["Monday"]["hours"]["14"] == expected
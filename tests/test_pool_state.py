@@ -0,0 +1,111 @@
+import json
+import os
+import stat
+import sys
+
+import pytest
+
+import occupancy
+from http_utils import Page
+from pool_aggregation.config import apply_pool_state, load_pool_config, load_pool_state, save_pool_state
+
+POOL = {
+    "name": "Pool Alpha",
+    "url": "https://example.com/alpha",
+    "pattern": r"obsazenost:\s*(\d+)",
+    "maximumCapacity": 100,
+    "weekdaysOpeningHours": "0-24",
+    "weekendOpeningHours": "0-24",
+    "todayClosed": False,
+    "collectStats": True,
+    "data": {"occupancy": {"raw": "alpha.csv"}},
+}
+
+
+def test_apply_pool_state_overlays_without_mutating():
+    cfg = dict(POOL)
+    merged = apply_pool_state(cfg, {"maximumCapacity": 120, "todayClosed": True, "lastFetch": "ok"})
+    assert merged["maximumCapacity"] == 120
+    assert merged["todayClosed"] is True
+    assert "lastFetch" not in merged
+    assert cfg == POOL
+
+
+def test_configured_capacity_above_observed_wins():
+    assert apply_pool_state(POOL, {"maximumCapacity": 80})["maximumCapacity"] == 100
+
+
+def test_apply_without_state_returns_config():
+    assert apply_pool_state(POOL, None) is POOL
+
+
+def test_missing_state_file_is_empty(tmp_path):
+    assert load_pool_state(tmp_path / "pool_state.json") == {}
+
+
+def test_save_only_when_changed(tmp_path):
+    path = tmp_path / "pool_state.json"
+    state = {"Pool Alpha": {"maximumCapacity": 100, "todayClosed": False, "lastFetch": "ok"}}
+    assert save_pool_state(state, {}, path)
+    assert load_pool_state(path) == state
+    mtime = path.stat().st_mtime_ns
+    assert not save_pool_state(state, load_pool_state(path), path)
+    assert path.stat().st_mtime_ns == mtime
+    assert [p.name for p in tmp_path.iterdir()] == ["pool_state.json"]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX permissions")
+def test_saved_state_is_readable_by_others(tmp_path):
+    path = tmp_path / "pool_state.json"
+    previous = os.umask(0o022)
+    try:
+        save_pool_state({"Pool Alpha": {"maximumCapacity": 100}}, {}, path)
+    finally:
+        os.umask(previous)
+    assert stat.S_IMODE(path.stat().st_mode) == 0o644
+
+
+def test_config_parsed_once_until_changed(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps([POOL]), encoding="utf-8")
+    first = load_pool_config(path)
+    assert load_pool_config(path) is first
+    path.write_text(json.dumps([POOL, POOL]), encoding="utf-8")
+    assert len(load_pool_config(path)) == 2
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "pool_occupancy_config.json").write_text(json.dumps([POOL]), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    occupancy._parsed_pages.clear()
+    return tmp_path
+
+
+def _serve(monkeypatch, text):
+    monkeypatch.setattr(occupancy, "prefetch_pages", lambda cfgs: {POOL["url"]: Page(text, True)})
+
+
+def test_occupancy_keeps_config_read_only(workdir, monkeypatch):
+    config_path = workdir / "data" / "pool_occupancy_config.json"
+    before = config_path.read_bytes()
+    _serve(monkeypatch, "obsazenost: 150")
+    assert occupancy.main()
+    assert config_path.read_bytes() == before
+    assert load_pool_state(workdir / "data" / "pool_state.json") == {
+        "Pool Alpha": {"maximumCapacity": 150, "todayClosed": False, "lastFetch": "ok"},
+    }
+
+
+def test_quiet_tick_does_not_rewrite_state(workdir, monkeypatch):
+    state_path = workdir / "data" / "pool_state.json"
+    _serve(monkeypatch, "obsazenost: 50")
+    occupancy.main()
+    mtime = state_path.stat().st_mtime_ns
+    occupancy.main()
+    assert state_path.stat().st_mtime_ns == mtime
+
+    _serve(monkeypatch, "no number here")
+    occupancy.main()
+    assert load_pool_state(state_path)["Pool Alpha"]["lastFetch"] == "no match"
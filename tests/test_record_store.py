@@ -0,0 +1,89 @@
+import pytest
+
+from pool_aggregation.aggregation.pool_block import build_data_range
+from pool_aggregation.models.records import OccupancyRecord, RecordStore
+
+
+def _rec(date_str, time_str, occupancy, day="Monday"):
+    return OccupancyRecord(date_str, day, time_str, occupancy, int(time_str.split(":")[0]))
+
+
+RECORDS = [
+    _rec("15.07.2024", "14:15", 42),
+    _rec("15.07.2024", "15:00", 55),
+    _rec("16.07.2024", "09:00", 10, "Tuesday"),
+    _rec("15.07.2024", "14:15", 43),
+    _rec("16.07.2024", "09:00", 11, "Tuesday"),
+]
+
+
+def test_behaves_like_the_list_it_was_built_from():
+    store = RecordStore(RECORDS)
+    assert len(store) == 5
+    assert store == RECORDS
+    assert list(store) == RECORDS
+    assert store[1] == RECORDS[1]
+    assert store[-1] == RECORDS[-1]
+    assert store[1:3] == RECORDS[1:3]
+    with pytest.raises(IndexError):
+        store[5]
+
+
+def test_empty_store_is_falsy_and_equals_empty_list():
+    assert not RecordStore()
+    assert RecordStore() == []
+
+
+def test_distinct_strings_are_interned():
+    store = RecordStore(RECORDS)
+    assert store.dates == ["15.07.2024", "16.07.2024"]
+    assert store[0].date_str is store[3].date_str
+
+
+def test_rows():
+    assert list(RecordStore(RECORDS).rows()) == [(r.date_str, r.day, r.hour, r.occupancy) for r in RECORDS]
+
+
+def test_on_date():
+    store = RecordStore(RECORDS)
+    assert store.on_date("16.07.2024") == [RECORDS[2], RECORDS[4]]
+    assert store.on_date("17.07.2024") == []
+
+
+def test_edge_records_break_ties_like_min_and_max():
+    store = RecordStore(RECORDS)
+    key = lambda r: (r.date_str.split(".")[::-1], r.time_str)  # noqa: E731
+    assert store.edge_records() == [min(RECORDS, key=key), max(RECORDS, key=key)]
+    assert build_data_range(store) == build_data_range(RECORDS)
+
+
+def test_overflowing_row_leaves_store_consistent():
+    store = RecordStore(RECORDS[:1])
+    with pytest.raises(OverflowError):
+        store.append("15.07.2024", "Monday", "99999:00", 1, 99999)
+    assert store == RECORDS[:1]
+
+
+def test_overflowing_code_leaves_store_consistent():
+    store = RecordStore(RECORDS[:1])
+    for n in range(255):
+        store.append("15.07.2024", f"day {n}", "10:00", 1, 10)
+    with pytest.raises(OverflowError):
+        store.append("15.07.2024", "one day too many", "10:00", 1, 10)
+    assert len({len(column) for column in store._arrays()}) == 1
+    assert len(store) == 256
+    assert store[-1].day == "day 254"
+
+
+def test_bytes_round_trip():
+    store = RecordStore(RECORDS)
+    restored = RecordStore.from_bytes(store.to_bytes())
+    assert restored == RECORDS
+    assert restored.dates == store.dates
+    restored.append("17.07.2024", "Wednesday", "08:00", 5, 8)
+    assert restored[-1] == _rec("17.07.2024", "08:00", 5, "Wednesday")
+
+
+def test_from_bytes_rejects_truncated_data():
+    with pytest.raises(ValueError):
+        RecordStore.from_bytes(RecordStore(RECORDS).to_bytes()[:-1])
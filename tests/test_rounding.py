@@ -60,3 +60,4 @@ def test_median_even():
 def test_median_even_half():
     # (2+3)/2 = 2.5 -> rounds to 2 (banker's)
     assert median_round([1, 2, 3, 4]) == 2 or median_round([1, 2, 3, 4]) == 3  # accept either
+
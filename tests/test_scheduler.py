@@ -0,0 +1,72 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import scheduler
+
+
+def _fake_worker_main(conn):
+    """Worker loop whose jobs are "ok", "fail", "slow" and "crash"."""
+    while True:
+        try:
+            name = conn.recv()
+        except EOFError:
+            return
+        if name == "crash":
+            os._exit(3)
+        if name == "slow":
+            time.sleep(30)
+        conn.send((name != "fail", 0.0, 0.0))
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    monkeypatch.setattr(scheduler, "_worker_main", _fake_worker_main)
+    monkeypatch.setattr(
+        scheduler, "JOB_TIMEOUTS", {"ok": 5, "fail": 5, "slow": 0.5, "crash": 5}
+    )
+    w = scheduler.Worker()
+    yield w
+    if w._process is not None:
+        w._stop()
+
+
+def test_worker_is_reused_between_jobs(worker):
+    assert worker.run("ok")
+    pid = worker._process.pid
+    assert not worker.run("fail")
+    assert worker._process.pid == pid
+
+
+def test_timed_out_job_restarts_worker(worker):
+    assert not worker.run("slow")
+    assert worker._process is None
+    assert worker.run("ok")
+
+
+def test_crashed_worker_is_replaced(worker):
+    assert not worker.run("crash")
+    assert worker.run("ok")
+
+
+def test_overlapping_run_is_skipped(worker):
+    started = threading.Thread(target=worker.run, args=("slow",))
+    started.start()
+    time.sleep(0.1)
+    assert not worker.run("ok")
+    started.join()
+
+
+@pytest.mark.parametrize("hour, minute, expected", [
+    (5, 59, False),
+    (6, 5, False),
+    (6, 10, True),
+    (21, 50, True),
+    (22, 0, False),
+])
+def test_operating_hours(hour, minute, expected):
+    now = datetime(2025, 7, 15, hour, minute, tzinfo=scheduler.PRAGUE)
+    assert scheduler._is_operating_hours(now) is expected
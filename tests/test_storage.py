@@ -0,0 +1,136 @@
+"""Both storage backends must hand the aggregation the same rows."""
+from __future__ import annotations
+import shutil
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from pool_aggregation.aggregation import incremental
+from pool_aggregation.cli import main
+from pool_aggregation.io.capacity_reader import clear_cache, load_hourly_capacity
+from pool_aggregation.io.csv_reader import read_records
+from pool_aggregation.io.storage import RowCheckpoint, open_storage
+from pool_aggregation.models.records import RecordStore
+
+PRAGUE = ZoneInfo("Europe/Prague")
+_PINNED = datetime(2024, 7, 16, 9, 30, 0, tzinfo=PRAGUE)
+_FIXTURES = Path(__file__).parent / "fixtures"
+_POOLS = ["alpha_inside.csv", "alpha_outside.csv", "beta_outside.csv"]
+_CAPACITY_ROWS = [
+    ["15.07.2024", "Monday", "06:00:00", 90],
+    ["15.07.2024", "Monday", "07:00:00", 135],
+]
+
+
+@pytest.fixture()
+def data_dir(tmp_path):
+    (tmp_path / "pool_occupancy_config.json").write_text(
+        (_FIXTURES / "config_snippet.json").read_text(encoding="utf-8"),
+        encoding="utf-8",
+    )
+    for name in _POOLS:
+        shutil.copy(_FIXTURES / "sample_occupancy.csv", tmp_path / name)
+    return tmp_path
+
+
+@pytest.fixture(autouse=True)
+def _fresh_state():
+    clear_cache()
+    incremental.clear_memory()
+    yield
+    clear_cache()
+    incremental.clear_memory()
+
+
+def test_imported_rows_read_back_as_from_the_csv(data_dir):
+    db = open_storage(data_dir, "sqlite")
+    counts = db.import_csv_files(data_dir, _POOLS, [])
+    assert counts == {name: 3 for name in _POOLS}
+    assert db.read_occupancy("alpha_inside.csv") == read_records(data_dir / "alpha_inside.csv")
+    # Importing again replaces the rows instead of doubling them
+    db.import_csv_files(data_dir, _POOLS, [])
+    assert len(db.read_occupancy("alpha_inside.csv")) == 3
+
+
+@pytest.mark.parametrize("backend", ["csv", "sqlite"])
+def test_range_query(data_dir, backend):
+    storage = open_storage(data_dir, backend)
+    if backend == "sqlite":
+        storage.import_csv_files(data_dir, _POOLS, [])
+    records = storage.read_occupancy("alpha_inside.csv", start="2024-07-15 15:00", end="2024-07-16")
+    assert [(r.date_str, r.time_str) for r in records] == [("15.07.2024", "15:00")]
+    assert len(storage.read_occupancy("alpha_inside.csv", start="2024-07-16")) == 1
+
+
+@pytest.mark.parametrize("backend", ["csv", "sqlite"])
+def test_appended_occupancy_creates_the_pool(tmp_path, backend):
+    storage = open_storage(tmp_path, backend)
+    storage.append_occupancy("new.csv", ["17.07.2024", "Wednesday", "10:05", 12])
+    storage.append_occupancy("new.csv", ["17.07.2024", "Wednesday", "10:20", 15])
+    assert [r.occupancy for r in storage.read_occupancy("new.csv")] == [12, 15]
+    if backend == "csv":
+        assert (tmp_path / "new.csv").read_text(encoding="utf-8").splitlines()[0] == "Date,Day,Time,Occupancy"
+
+
+def test_new_rows_follow_a_row_checkpoint(data_dir):
+    db = open_storage(data_dir, "sqlite")
+    db.import_csv_files(data_dir, _POOLS, [])
+    records, checkpoint, restarted = db.read_new_occupancy("alpha_inside.csv", None)
+    assert (len(records), restarted) == (3, False)
+    assert isinstance(checkpoint, RowCheckpoint)
+    assert db.read_new_occupancy("alpha_inside.csv", checkpoint) == (RecordStore(), checkpoint, False)
+
+    db.append_occupancy("alpha_inside.csv", ["16.07.2024", "Tuesday", "10:00", 20])
+    records, checkpoint, restarted = db.read_new_occupancy("alpha_inside.csv", checkpoint)
+    assert [r.time_str for r in records] == ["10:00"] and not restarted
+
+    # A re-import replaces the rows the checkpoint counted
+    db.import_csv_files(data_dir, _POOLS, [])
+    records, _, restarted = db.read_new_occupancy("alpha_inside.csv", checkpoint)
+    assert (len(records), restarted) == (3, True)
+
+
+def test_checkpoint_of_the_other_backend_starts_over(data_dir):
+    db = open_storage(data_dir, "sqlite")
+    db.import_csv_files(data_dir, _POOLS, [])
+    _, row_checkpoint, _ = db.read_new_occupancy("alpha_inside.csv", None)
+    records, csv_checkpoint, restarted = open_storage(data_dir, "csv").read_new_occupancy("alpha_inside.csv", row_checkpoint)
+    assert (len(records), restarted) == (3, True)
+    records, _, restarted = db.read_new_occupancy("alpha_inside.csv", csv_checkpoint)
+    assert (len(records), restarted) == (3, True)
+
+
+@pytest.mark.parametrize("backend", ["csv", "sqlite"])
+def test_capacity_is_loaded_as_from_the_csv(tmp_path, backend):
+    storage = open_storage(tmp_path, backend)
+    storage.replace_capacity("week_capacity.csv", [["14.07.2024", "Sunday", "08:00:00", 10]])
+    storage.replace_capacity("week_capacity.csv", _CAPACITY_ROWS)
+    storage.append_capacity("week_capacity.csv", [["15.07.2024", "Monday", "06:00:00", 45]])
+    reference = open_storage(tmp_path / "reference", "csv")
+    reference.replace_capacity("week_capacity.csv", _CAPACITY_ROWS)
+    reference.append_capacity("week_capacity.csv", [["15.07.2024", "Monday", "06:00:00", 45]])
+    lookup = storage.load_capacity("week_capacity.csv")
+    assert lookup == load_hourly_capacity(tmp_path / "reference" / "week_capacity.csv")
+    assert lookup == {("15.07.2024", "06:00"): 45, ("15.07.2024", "07:00"): 135}
+    assert storage.load_capacity("week_capacity.csv") is lookup
+
+
+def test_sqlite_output_matches_csv_output(data_dir, monkeypatch):
+    main(clock=lambda: _PINNED, data_dir=data_dir, output_dir=data_dir / "csv")
+    open_storage(data_dir, "sqlite").import_csv_files(data_dir, _POOLS, [])
+    monkeypatch.setenv("POOL_STORAGE", "sqlite")
+    main(clock=lambda: _PINNED, data_dir=data_dir, output_dir=data_dir / "sqlite")
+    main(clock=lambda: _PINNED, data_dir=data_dir, output_dir=data_dir / "inc", incremental=True)
+    files = sorted((data_dir / "csv").rglob("*.json"))
+    assert files
+    for path in files:
+        relative = path.relative_to(data_dir / "csv")
+        assert (data_dir / "sqlite" / relative).read_bytes() == path.read_bytes()
+        assert (data_dir / "inc" / relative).read_bytes() == path.read_bytes()
+
+
+def test_unknown_backend_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="POOL_STORAGE"):
+        open_storage(tmp_path, "parquet")
@@ -0,0 +1,52 @@
+import gzip
+import json
+import os
+
+from pool_aggregation.io.json_writer import write_json
+from pool_aggregation.io.variants import VariantWriter, remove_variants, variants_outdated, write_variants
+
+PAYLOAD = {"poolName": "Kraví Hora", "weeks": {"2024-07-15": {"days": {}}}}
+
+
+def test_variants_hold_the_same_json(tmp_path):
+    path = tmp_path / "pool.json"
+    write_json(path, PAYLOAD)
+    write_variants(path)
+    assert gzip.decompress((tmp_path / "pool.json.gz").read_bytes()) == path.read_bytes()
+    minified = (tmp_path / "pool.min.json").read_bytes()
+    assert json.loads(minified) == PAYLOAD
+    assert b" " not in minified.replace("Kraví Hora".encode(), b"")
+    assert gzip.decompress((tmp_path / "pool.min.json.gz").read_bytes()) == minified
+
+
+def test_gzip_output_is_reproducible(tmp_path):
+    path = tmp_path / "pool.json"
+    write_json(path, PAYLOAD)
+    write_variants(path)
+    first = (tmp_path / "pool.json.gz").read_bytes()
+    write_variants(path)
+    assert (tmp_path / "pool.json.gz").read_bytes() == first
+
+
+def test_writer_reports_in_submission_order(tmp_path):
+    paths = [tmp_path / f"{name}.json" for name in ("b", "a", "c")]
+    for path in paths:
+        write_json(path, PAYLOAD)
+    writer = VariantWriter()
+    for path in paths:
+        writer.submit(path)
+    reports = writer.close()
+    assert [path for path, _ in reports] == paths
+    assert all("gz" in report for _, report in reports)
+
+
+def test_missing_or_older_variants_are_outdated(tmp_path):
+    path = tmp_path / "pool.json"
+    write_json(path, PAYLOAD)
+    assert variants_outdated(path)
+    write_variants(path)
+    assert not variants_outdated(path)
+    os.utime(tmp_path / "pool.min.json.gz", ns=(0, 0))
+    assert variants_outdated(path)
+    remove_variants(path)
+    assert [p.name for p in tmp_path.iterdir()] == ["pool.json"]
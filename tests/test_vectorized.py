@@ -0,0 +1,49 @@
+import pytest
+
+from pool_aggregation.aggregation import vectorized
+from pool_aggregation.aggregation.bucketing import slot_stats
+from pool_aggregation.aggregation.weekly import build_weekly_map
+from pool_aggregation.models.records import OccupancyRecord, RecordStore
+
+CFG = {"maximumCapacity": 135, "totalLanes": 6}
+
+
+def _records(n):
+    """Rows over several weeks, out of order, with padded and unpadded dates."""
+    records = []
+    for i in range(n):
+        day = 1 + (i * 7) % 28
+        date_str = f"{day}.7.2024" if i % 3 else f"{day:02d}.07.2024"
+        hour = 6 + (i * 5) % 16
+        records.append(OccupancyRecord(date_str, "Monday" if i % 2 else "Tuesday", f"{hour:02d}:{i % 60:02d}", (i * 37) % 140, hour))
+    return records
+
+
+def test_pure_python_fallback_without_numpy(monkeypatch):
+    monkeypatch.setattr(vectorized, "np", None)
+    store = RecordStore(_records(3000))
+    assert not vectorized.usable(store)
+    assert build_weekly_map(store, CFG) == build_weekly_map(list(store), CFG)
+
+
+def test_lists_and_small_stores_use_pure_python():
+    assert not vectorized.usable(_records(3000))
+    assert not vectorized.usable(RecordStore(_records(10)))
+
+
+def test_matches_pure_python_slot_stats():
+    pytest.importorskip("numpy")
+    store = RecordStore(_records(5000))
+    assert list(vectorized.slot_stats(store).items()) == list(slot_stats(store).items())
+
+
+def test_weekly_map_is_identical():
+    pytest.importorskip("numpy")
+    store = RecordStore(_records(5000))
+    assert vectorized.usable(store)
+    assert build_weekly_map(store, CFG) == build_weekly_map(list(store), CFG)
+
+
+def test_empty_store():
+    pytest.importorskip("numpy")
+    assert vectorized.slot_stats(RecordStore()) == {}
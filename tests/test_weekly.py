@@ -1,7 +1,6 @@
-from pool_aggregation.aggregation.weekly import build_weekly_map
+from pool_aggregation.aggregation.weekly import build_weekly_map, build_weekly_map_from_stats, record_slot_stats
 from pool_aggregation.io.capacity_reader import clear_cache
 from pool_aggregation.models.records import OccupancyRecord
-import pool_aggregation.aggregation.weekly as weekly_mod
 import pytest
 
 
@@ -232,7 +231,6 @@ def test_future_slot_appears_when_no_occupancy(monkeypatch, tmp_path):
     # 18.7.2024 is a Thursday in week 2024-07-15
     csv_path.write_text("Date,Day,Hour,Maximum Occupancy\n18.7.2024,Thursday,10:00:00,120\n")
 
-    monkeypatch.setattr(weekly_mod, "_DATA_DIR", tmp_path)
     import pool_aggregation.aggregation.capacity as cap_mod
     monkeypatch.setattr(cap_mod, "_DATA_DIR", tmp_path)
 
@@ -257,7 +255,6 @@ def test_future_slot_date_iso8601(monkeypatch, tmp_path):
     csv_path = tmp_path / "cap.csv"
     csv_path.write_text("Date,Day,Hour,Maximum Occupancy\n18.7.2024,Thursday,10:00:00,120\n")
 
-    monkeypatch.setattr(weekly_mod, "_DATA_DIR", tmp_path)
     import pool_aggregation.aggregation.capacity as cap_mod
     monkeypatch.setattr(cap_mod, "_DATA_DIR", tmp_path)
 
@@ -273,7 +270,6 @@ def test_future_slot_uses_forecast(monkeypatch, tmp_path):
         "Date,Day,Hour,Maximum Occupancy\n18.7.2024,Thursday,10:00:00,80\n"
     )
 
-    monkeypatch.setattr(weekly_mod, "_DATA_DIR", tmp_path)
     import pool_aggregation.aggregation.capacity as cap_mod
     monkeypatch.setattr(cap_mod, "_DATA_DIR", tmp_path)
 
@@ -287,7 +283,6 @@ def test_occupied_slot_not_replaced_by_future(monkeypatch, tmp_path):
     csv_path = tmp_path / "cap.csv"
     csv_path.write_text("Date,Day,Hour,Maximum Occupancy\n15.7.2024,Monday,14:00:00,90\n")
 
-    monkeypatch.setattr(weekly_mod, "_DATA_DIR", tmp_path)
     import pool_aggregation.aggregation.capacity as cap_mod
     monkeypatch.setattr(cap_mod, "_DATA_DIR", tmp_path)
 
@@ -304,7 +299,6 @@ def test_future_slot_open_lanes_inside_pool(monkeypatch, tmp_path):
     # resolved=90, static=135, lanes=6 → round(90*6/135) = round(4.0) = 4
     csv_path.write_text("Date,Day,Hour,Maximum Occupancy\n18.7.2024,Thursday,10:00:00,90\n")
 
-    monkeypatch.setattr(weekly_mod, "_DATA_DIR", tmp_path)
     import pool_aggregation.aggregation.capacity as cap_mod
     monkeypatch.setattr(cap_mod, "_DATA_DIR", tmp_path)
 
@@ -318,7 +312,6 @@ def test_future_slot_open_lanes_null_outside_pool(monkeypatch, tmp_path):
     csv_path = tmp_path / "cap.csv"
     csv_path.write_text("Date,Day,Hour,Maximum Occupancy\n18.7.2024,Thursday,10:00:00,500\n")
 
-    monkeypatch.setattr(weekly_mod, "_DATA_DIR", tmp_path)
     import pool_aggregation.aggregation.capacity as cap_mod
     monkeypatch.setattr(cap_mod, "_DATA_DIR", tmp_path)
 
@@ -333,7 +326,6 @@ def test_max_day_values_null_when_only_future_slots(monkeypatch, tmp_path):
     csv_path = tmp_path / "cap.csv"
     csv_path.write_text("Date,Day,Hour,Maximum Occupancy\n18.7.2024,Thursday,10:00:00,120\n")
 
-    monkeypatch.setattr(weekly_mod, "_DATA_DIR", tmp_path)
     import pool_aggregation.aggregation.capacity as cap_mod
     monkeypatch.setattr(cap_mod, "_DATA_DIR", tmp_path)
 
@@ -352,7 +344,6 @@ def test_max_week_values_ignores_null_util_from_future(monkeypatch, tmp_path):
         "18.7.2024,Thursday,10:00:00,120\n"
     )
 
-    monkeypatch.setattr(weekly_mod, "_DATA_DIR", tmp_path)
     import pool_aggregation.aggregation.capacity as cap_mod
     monkeypatch.setattr(cap_mod, "_DATA_DIR", tmp_path)
 
@@ -360,3 +351,16 @@ def test_max_week_values_ignores_null_util_from_future(monkeypatch, tmp_path):
     records = [_rec("15.7.2024", "Monday", 14, 90)]  # util = 67
     wmap = build_weekly_map(records, cfg)
     assert wmap["2024-07-15"]["maxWeekValues"]["utilizationRate"] == 67
+
+
+# --- rendering cache ---
+
+def test_cached_weeks_are_reused_until_they_change():
+    stats = record_slot_stats([_rec("15.7.2024", "Monday", 14, 45), _rec("22.7.2024", "Monday", 9, 20)])
+    cache: dict = {}
+    first = build_weekly_map_from_stats(stats, CFG_NO_HOURLY, cache)
+    stats = record_slot_stats([_rec("15.7.2024", "Monday", 14, 45), _rec("22.7.2024", "Monday", 9, 30)])
+    second = build_weekly_map_from_stats(stats, CFG_NO_HOURLY, cache)
+    assert second["2024-07-15"] is first["2024-07-15"]
+    assert second["2024-07-22"] is not first["2024-07-22"]
+    assert second == build_weekly_map_from_stats(stats, CFG_NO_HOURLY)
@@ -0,0 +1,79 @@
+"""Sharded weekly output: one file per week, an index, and no needless rewrites."""
+from __future__ import annotations
+import hashlib
+import json
+import shutil
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from pool_aggregation.cli import main
+from pool_aggregation.io.capacity_reader import clear_cache
+from pool_aggregation.io.weekly_shards import write_weekly_shards
+
+PRAGUE = ZoneInfo("Europe/Prague")
+_PINNED = datetime(2024, 7, 15, 14, 30, 0, tzinfo=PRAGUE)
+_FIXTURES = Path(__file__).parent / "fixtures"
+
+
+@pytest.fixture()
+def data_dir(tmp_path):
+    text = (_FIXTURES / "config_snippet.json").read_text(encoding="utf-8")
+    text = text.replace('"weekly/alpha_inside_occupancy.json"', '"weekly/alpha_inside/"')
+    (tmp_path / "pool_occupancy_config.json").write_text(text, encoding="utf-8")
+    for name in ["alpha_inside.csv", "alpha_outside.csv", "beta_outside.csv"]:
+        shutil.copy(_FIXTURES / "sample_occupancy.csv", tmp_path / name)
+    return tmp_path
+
+
+@pytest.fixture(autouse=True)
+def _clear_capacity_cache():
+    clear_cache()
+    yield
+    clear_cache()
+
+
+def test_shards_hold_the_weekly_map(data_dir, tmp_path):
+    main(clock=lambda: _PINNED, data_dir=data_dir, output_dir=tmp_path / "out")
+    shard_dir = tmp_path / "out" / "weekly" / "alpha_inside"
+    index = json.loads((shard_dir / "index.json").read_text(encoding="utf-8"))
+    assert index["poolName"] == "Pool Alpha (Inside)"
+    assert list(index["weeks"]) == ["2024-07-15"]
+
+    expected = json.loads((_FIXTURES / "expected_alpha_inside_weekly_occupancy.json").read_text(encoding="utf-8"))
+    entry = index["weeks"]["2024-07-15"]
+    shard_bytes = (shard_dir / entry["file"]).read_bytes()
+    assert hashlib.sha256(shard_bytes).hexdigest() == entry["sha256"]
+    shard = json.loads(shard_bytes)
+    assert shard["weekId"] == "2024-07-15"
+    assert shard["days"] == expected["weeklyOccupancyMap"]["2024-07-15"]["days"]
+    assert "generatedAt" not in shard
+
+
+def test_unchanged_weeks_are_not_rewritten(data_dir, tmp_path, capsys):
+    main(clock=lambda: _PINNED, data_dir=data_dir, output_dir=tmp_path / "out")
+    shard = tmp_path / "out" / "weekly" / "alpha_inside" / "2024-07-15.json"
+    mtime = shard.stat().st_mtime_ns
+    capsys.readouterr()
+    main(clock=lambda: _PINNED.replace(minute=40), data_dir=data_dir, output_dir=tmp_path / "out")
+    assert shard.stat().st_mtime_ns == mtime
+    assert "Unchanged weekly/alpha_inside/ (0 of 1 week shards changed)" in capsys.readouterr().out
+
+
+def test_shards_of_vanished_weeks_are_removed(tmp_path):
+    week = {"maxWeekValues": {"utilizationRate": None}, "days": {}}
+    write_weekly_shards(tmp_path, {}, {}, [("2024-07-08", week), ("2024-07-15", week)])
+    assert write_weekly_shards(tmp_path, {}, {}, [("2024-07-15", week)]) == ([], 1, True)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["2024-07-15.json", "index.json"]
+
+
+def test_unchanged_shards_get_their_missing_variants(data_dir, tmp_path, capsys):
+    main(clock=lambda: _PINNED, data_dir=data_dir, output_dir=tmp_path / "out")
+    capsys.readouterr()
+    main(clock=lambda: _PINNED, data_dir=data_dir, output_dir=tmp_path / "out", variants=True)
+    out = capsys.readouterr().out
+    assert "Variants of weekly/alpha_inside/2024-07-15.json: " in out
+    assert "Variants of weekly/alpha_inside/index.json: " in out
+    assert (tmp_path / "out" / "weekly" / "alpha_inside" / "2024-07-15.min.json.gz").exists()